@@ -1,22 +1,41 @@
 # app.py
-from fastapi import FastAPI, HTTPException, Depends, Request
+from fastapi import FastAPI, HTTPException, Depends, Request, Body, Query
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel, Field, ValidationError
 from sqlalchemy.orm import Session
-from typing import Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import insert, tuple_
+from typing import Annotated, Optional, List, Dict, Any
 import uvicorn
+import asyncio
+import base64
 import json
-from datetime import datetime
+import os
+from datetime import date, datetime, timedelta
 
-from database import Base, get_db, engine
-from classifier_tea import TEAClassifier
+from database import get_db, get_async_db, engine, async_engine, pool_stats
+from model_registry import get_classifier, registry
+from inference import run_inference, admission
+import inference
+import rollups
+import dashboard_queries
+import response_cache
+import write_behind
+import dashboard_stream
+import drift_monitor
+from instrumentation import (
+    METRICS_ENABLED, install_query_counter, query_count_middleware, stage, register_gauges, expose_metrics
+)
 from schema import Screening, Result
 from dashboard_endpoints import dashboard_router
+from export_endpoints import export_router
+from dashboard_stream import stream_router
+from monitoring_endpoints import monitoring_router
 from sqlalchemy import text 
 
 
-# Criar tabelas se não existirem
-Base.metadata.create_all(bind=engine)
+# O esquema do banco é gerenciado pelas migrações do Alembic (alembic upgrade head)
 
 # Modelos Pydantic
 class PatientInput(BaseModel):
@@ -36,12 +55,36 @@ class PatientInput(BaseModel):
     autism: str = Field(..., pattern='^(yes|no)$')
     used_app_before: str = Field(..., pattern='^(yes|no)$')
 
+class Explanation(BaseModel):
+    base_value: float
+    contributions: Dict[str, float]
+
 class PredictionOutput(BaseModel):
     id: int
     prediction: str
     confidence: float
     model_type: str
+    model_version: str
     created_at: datetime
+    explanation: Optional[Explanation] = None
+
+class BatchItemOutput(BaseModel):
+    index: int
+    status: str
+    result: Optional[PredictionOutput] = None
+    errors: Optional[List[Dict[str, Any]]] = None
+
+class BatchPredictionOutput(BaseModel):
+    total: int
+    succeeded: int
+    failed: int
+    items: List[BatchItemOutput]
+
+# Tamanho máximo de um lote em /predict/batch
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "10000"))
+
+# Tamanho máximo de uma página de /recent-screenings
+MAX_PAGE_SIZE = int(os.getenv("RECENT_SCREENINGS_MAX_PAGE", "100"))
 
 # Criar aplicação
 app = FastAPI(
@@ -56,12 +99,35 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Permitir todos os métodos (GET, POST, OPTIONS, etc)
     allow_headers=["*"],  # Permitir todos os headers
+    expose_headers=["X-DB-Query-Count", "ETag", "Server-Timing"],
 )
 
-# Carregar modelo
-classifier = TEAClassifier('models/tea_model_optimized.pkl')
+# Contagem (e duração) das consultas ao banco por requisição
+install_query_counter(engine)
+install_query_counter(async_engine.sync_engine)
+app.middleware("http")(query_count_middleware)
 
 app.include_router(dashboard_router)
+app.include_router(export_router)
+app.include_router(stream_router)
+app.include_router(monitoring_router)
+
+@app.on_event("startup")
+def load_model():
+    # Carrega o modelo uma vez por worker antes de aceitar requisições
+    registry.start()
+    write_behind.start()
+    dashboard_stream.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    registry.stop()
+    inference.shutdown()
+    dashboard_stream.stop()
+    # Grava as triagens pendentes antes de fechar as conexões
+    write_behind.stop()
+    await async_engine.dispose()
+    engine.dispose()
 
 @app.get("/")
 def home():
@@ -69,7 +135,7 @@ def home():
         "message": "TEA Screening API",
         "status": "online",
         "database": "connected",
-        "endpoints": ["/docs", "/predict", "/health", "/stats"]
+        "endpoints": ["/docs", "/predict", "/health", "/stats", "/api/export"]
     }
 
 @app.get("/health")
@@ -92,114 +158,399 @@ def health_check(db: Session = Depends(get_db)):
 async def predict(
     patient: PatientInput, 
     request: Request,
+    explain: bool = False,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Realiza predição e salva no banco. Com ?explain=true a resposta traz a
+    contribuição de cada feature para a probabilidade
+    """
+    async with admission():
+        try:
+            # 1. Fazer predição no pool do modelo, fora do event loop
+            patient_data = patient.dict()
+            classifier = get_classifier()
+            result_data = await run_inference(classifier.predict, patient_data, explain)
+            drift_monitor.observe(classifier, [patient_data], [result_data['probability']])
+
+            screening_values = {
+                **{f"a{q}_score": getattr(patient, f"A{q}_Score") for q in range(1, 11)},
+                "age": patient.age,
+                "gender": patient.gender.lower(),
+                "jundice": patient.jundice,
+                "autism": patient.autism,
+                "used_app_before": patient.used_app_before,
+            }
+            result_values = {
+                "prediction": result_data['prediction'],
+                "confidence": result_data['probability'],
+                "model_version": result_data['model_version'],
+            }
+
+            # 2a. Gravação assíncrona: registra no log local e responde sem esperar o banco
+            if write_behind.queue is not None:
+                with stage("persist"):
+                    result_id, created_at = await asyncio.to_thread(
+                        write_behind.queue.submit, screening_values, result_values
+                    )
+                registry.shadow([patient_data], [result_data])
+                dashboard_stream.publish([dashboard_stream.delta(
+                    screening_values, result_values['prediction'], result_values['confidence'], created_at
+                )])
+                return PredictionOutput(
+                    id=result_id,
+                    prediction=result_values['prediction'],
+                    confidence=result_values['confidence'],
+                    model_type=result_data['model_type'],
+                    model_version=result_values['model_version'],
+                    created_at=created_at,
+                    explanation=result_data.get('explanation')
+                )
+
+            # 2b. Salvar entrada e resultado na mesma transação
+            screening = Screening(**screening_values)
+            result = Result(screening=screening, **result_values)
+
+            with stage("persist"):
+                db.add_all([screening, result])
+                if rollups.USE_ROLLUPS:
+                    await db.execute(rollups.upsert_statement([
+                        (rollups.screening_values(screening), result.prediction, result.confidence)
+                    ]))
+                await db.commit()
+            await response_cache.invalidate_async()
+            registry.shadow([patient_data], [result_data])
+            dashboard_stream.publish([dashboard_stream.delta(
+                screening_values, result.prediction, result.confidence, result.created_at
+            )])
+
+            # 3. Retornar resposta
+            return PredictionOutput(
+                id=result.id,
+                prediction=result.prediction,
+                confidence=result.confidence,
+                model_type=result_data['model_type'],
+                model_version=result.model_version,
+                created_at=result.created_at,
+                explanation=result_data.get('explanation')
+            )
+
+        except HTTPException:
+            raise
+        except Exception as e:
+            await db.rollback()
+            raise HTTPException(status_code=400, detail=f"Erro: {str(e)}")
+
+@app.post("/predict/batch", response_model=BatchPredictionOutput)
+def predict_batch(
+    items: List[Dict[str, Any]] = Body(...),
+    explain: bool = False,
     db: Session = Depends(get_db)
 ):
     """
-    Realiza predição e salva no banco
+    Realiza predições em lote e salva tudo em uma única transação. Com
+    ?explain=true cada resultado traz as contribuições das features
     """
-    try:
-        # 1. Salvar dados de entrada no banco
-        screening = Screening(
-            a1_score=patient.A1_Score,
-            a2_score=patient.A2_Score,
-            a3_score=patient.A3_Score,
-            a4_score=patient.A4_Score,
-            a5_score=patient.A5_Score,
-            a6_score=patient.A6_Score,
-            a7_score=patient.A7_Score,
-            a8_score=patient.A8_Score,
-            a9_score=patient.A9_Score,
-            a10_score=patient.A10_Score,
-            age=patient.age,
-            gender=patient.gender.lower(),
-            jundice=patient.jundice,
-            autism=patient.autism,
-            used_app_before=patient.used_app_before,
-        )
-        
-        db.add(screening)
-        db.commit()
-        db.refresh(screening)
-        
-        # 2. Fazer predição
-        result_data = classifier.predict(patient.dict())
-        
-        # 3. Salvar resultado
-        result = Result(
-            screening_id=screening.id,
-            prediction=result_data['prediction'],
-            confidence=result_data['probability'],
-            model_version=result_data['model_type'],
+    if len(items) > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Lote excede o limite de {MAX_BATCH_SIZE} triagens"
         )
-        
-        db.add(result)
-        db.commit()
-        db.refresh(result)
-        
-        # 4. Retornar resposta
-        return PredictionOutput(
-            id=result.id,
-            prediction=result.prediction,
-            confidence=result.confidence,
-            model_type=result.model_version,
-            created_at=result.created_at
-        )
-    
+
+    outputs = [None] * len(items)
+    valid_indices = []
+    patients = []
+
+    # 1. Validar cada item individualmente
+    with stage("validation"):
+        for i, item in enumerate(items):
+            try:
+                patients.append(PatientInput.model_validate(item))
+                valid_indices.append(i)
+            except ValidationError as e:
+                outputs[i] = BatchItemOutput(
+                    index=i, status="error",
+                    errors=e.errors(include_url=False, include_context=False)
+                )
+
+    # 2. Predição vetorizada
+    records = [p.model_dump() for p in patients]
+    classifier = get_classifier()
+    with stage("model"):
+        try:
+            predictions = classifier.predict_batch(records, explain=explain)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    scored = []
+    for i, patient, result_data in zip(valid_indices, patients, predictions):
+        if 'error' in result_data:
+            outputs[i] = BatchItemOutput(
+                index=i, status="error",
+                errors=[{"type": "value_error", "msg": result_data['error']}]
+            )
+        else:
+            scored.append((i, patient, result_data))
+    drift_monitor.observe(
+        classifier,
+        [record for record, result_data in zip(records, predictions) if 'error' not in result_data],
+        [result_data['probability'] for result_data in predictions if 'error' not in result_data],
+    )
+
+    # 3. Inserções em massa na mesma transação
+    try:
+        if scored:
+            screening_rows = [
+                {
+                    **{f"a{q}_score": getattr(patient, f"A{q}_Score") for q in range(1, 11)},
+                    "age": patient.age,
+                    "gender": patient.gender.lower(),
+                    "jundice": patient.jundice,
+                    "autism": patient.autism,
+                    "used_app_before": patient.used_app_before,
+                }
+                for _, patient, _ in scored
+            ]
+            with stage("persist"):
+                screening_ids = db.scalars(
+                    insert(Screening).returning(Screening.id, sort_by_parameter_order=True),
+                    screening_rows
+                ).all()
+
+                results = db.execute(
+                    insert(Result).returning(Result.id, Result.created_at, sort_by_parameter_order=True),
+                    [
+                        {
+                            "screening_id": screening_id,
+                            "prediction": result_data['prediction'],
+                            "confidence": result_data['probability'],
+                            "model_version": result_data['model_version'],
+                        }
+                        for screening_id, (_, _, result_data) in zip(screening_ids, scored)
+                    ]
+                ).all()
+
+                if rollups.USE_ROLLUPS:
+                    db.execute(rollups.upsert_statement([
+                        (values, result_data['prediction'], result_data['probability'])
+                        for values, (_, _, result_data) in zip(screening_rows, scored)
+                    ]))
+
+                db.commit()
+            response_cache.invalidate()
+            registry.shadow(records, predictions)
+            dashboard_stream.publish([
+                dashboard_stream.delta(values, result_data['prediction'], result_data['probability'], row.created_at)
+                for values, (_, _, result_data), row in zip(screening_rows, scored, results)
+            ])
+
+            for (i, _, result_data), row in zip(scored, results):
+                outputs[i] = BatchItemOutput(
+                    index=i, status="ok",
+                    result=PredictionOutput(
+                        id=row.id,
+                        prediction=result_data['prediction'],
+                        confidence=result_data['probability'],
+                        model_type=result_data['model_type'],
+                        model_version=result_data['model_version'],
+                        created_at=row.created_at,
+                        explanation=result_data.get('explanation')
+                    )
+                )
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=400, detail=f"Erro: {str(e)}")
 
+    succeeded = len(scored)
+    return BatchPredictionOutput(
+        total=len(items),
+        succeeded=succeeded,
+        failed=len(items) - succeeded,
+        items=outputs
+    )
+
 @app.get("/stats")
 def get_statistics(db: Session = Depends(get_db)):
     """
     Retorna estatísticas do sistema
     """
     try:
-        total_screenings = db.query(Screening).count()
-        total_positive = db.query(Result).filter(Result.prediction == "TEA").count()
-        total_negative = db.query(Result).filter(Result.prediction == "Sem TEA").count()
+        kpis = dashboard_queries.kpi_summary(db)
         
         return {
-            "total_screenings": total_screenings,
-            "positive_cases": total_positive,
-            "negative_cases": total_negative,
-            "positive_rate": total_positive / total_screenings if total_screenings > 0 else 0
+            "total_screenings": kpis["total_screenings"],
+            "positive_cases": kpis["positive_cases"],
+            "negative_cases": kpis["negative_cases"],
+            "positive_rate": kpis["positive_rate"]
         }
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+@app.get("/model")
+def get_model_status():
+    """
+    Versão do modelo ativo, do modelo sombra e a concordância entre eles
+    """
+    return registry.status()
+
+@app.post("/model/reload")
+def reload_model():
+    """
+    Recarrega o artefato do modelo neste worker (os demais recarregam ao
+    detectar a mudança do arquivo)
+    """
+    try:
+        swapped = registry.reload()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Falha ao carregar o modelo: {str(e)}")
+    return {"reloaded": swapped, **registry.status()}
+
+@app.get("/pool-stats")
+async def get_pool_statistics():
+    """
+    Estado dos pools de conexão deste worker (para dimensionar o pool sob carga)
+    """
+    return {
+        "pid": os.getpid(),
+        "sync": pool_stats(engine),
+        "async": pool_stats(async_engine.sync_engine),
+        "write_behind": write_behind.queue.stats() if write_behind.queue is not None else None,
+    }
+
+def runtime_gauges():
+    """Estado do processo lido a cada coleta de /metrics"""
+    pools = {"sync": pool_stats(engine), "async": pool_stats(async_engine.sync_engine)}
+    gauges = {
+        f"tea_db_pool_{field}": (
+            f"Pool de conexões: {field}",
+            {(("engine", name),): stats.get(field) for name, stats in pools.items()},
+        )
+        for field in ("size", "checked_out", "checked_in", "overflow", "checkouts", "timeouts", "wait_max_ms")
+    }
+    gauges["tea_predictions_available_slots"] = (
+        "Vagas livres para predições simultâneas", {(): inference.available_slots()}
+    )
+    if write_behind.queue is not None:
+        stats = write_behind.queue.stats()
+        gauges["tea_write_behind_pending"] = ("Triagens aguardando gravação", {(): stats["pending"]})
+        gauges["tea_write_behind_reserved_ids"] = ("Ids reservados para a gravação assíncrona", {(): stats["reserved_ids"]})
+        gauges["tea_write_behind_failures"] = ("Falhas de gravação de lotes", {(): stats["failures"]})
+    monitor = get_classifier().drift_monitor
+    if monitor is not None:
+        drift = monitor.report()
+        gauges["tea_drift_psi"] = (
+            "PSI da janela recente em relação ao perfil do modelo",
+            {
+                **{(("feature", name),): item["psi"] for name, item in drift["features"].items()},
+                (("feature", "probability"),): drift["probability"]["psi"],
+            },
+        )
+        gauges["tea_drift_window_samples"] = ("Triagens na janela do monitor de desvio", {(): drift["window"]["samples"]})
+    if dashboard_stream.broadcaster is not None:
+        gauges["tea_dashboard_stream_subscribers"] = (
+            "Dashboards conectados ao stream", {(): dashboard_stream.broadcaster.stats()["subscribers"]}
+        )
+    return gauges
+
+
+register_gauges(runtime_gauges)
+
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    """
+    Métricas deste worker no formato de texto do Prometheus
+    """
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Métricas desativadas (TEA_METRICS=false)")
+    return PlainTextResponse(expose_metrics(), media_type="text/plain; version=0.0.4")
+
+def encode_cursor(created_at, screening_id):
+    """Token opaco com a posição (created_at, id) da última triagem de uma página"""
+    payload = json.dumps([created_at.isoformat(), screening_id]).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        created_at, screening_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return datetime.fromisoformat(created_at), int(screening_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+
 @app.get("/recent-screenings")
 def get_recent_screenings(
-    limit: int = 10,
+    limit: Annotated[int, Query(ge=1, le=MAX_PAGE_SIZE)] = 10,
+    cursor: Optional[str] = None,
+    paginate: bool = False,
+    prediction: Annotated[Optional[str], Query(pattern="^(TEA|Sem TEA)$")] = None,
+    gender: Annotated[Optional[str], Query(pattern="^[mfMF]$")] = None,
+    min_age: Annotated[Optional[int], Query(ge=0)] = None,
+    max_age: Annotated[Optional[int], Query(ge=0)] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
     db: Session = Depends(get_db)
 ):
     """
-    Retorna triagens recentes
+    Retorna triagens recentes, paginadas por cursor (keyset em created_at, id).
+    Com paginate=true ou cursor a resposta é {"items", "next_cursor"}; para a
+    próxima página, repita a consulta com cursor=next_cursor. Sem eles a
+    resposta continua sendo a lista de triagens, como antes da paginação.
     """
-    screenings = db.query(
+    if min_age is not None and max_age is not None and min_age > max_age:
+        raise HTTPException(status_code=422, detail="min_age não pode ser maior que max_age")
+    if start_date is not None and end_date is not None and start_date > end_date:
+        raise HTTPException(status_code=422, detail="start_date não pode ser posterior a end_date")
+
+    query = db.query(
         Screening.id,
         Screening.age,
         Screening.gender,
         Screening.created_at,
         Result.prediction,
-   
     ).join(
         Result, Screening.id == Result.screening_id
-    ).order_by(
-        Screening.created_at.desc()
-    ).limit(limit).all()
-    
-    return [
+    )
+
+    if cursor is not None:
+        # Continua depois da última linha da página anterior, pelo índice (created_at, id)
+        query = query.filter(tuple_(Screening.created_at, Screening.id) < tuple_(*decode_cursor(cursor)))
+    if prediction is not None:
+        query = query.filter(Result.prediction == prediction)
+    if gender is not None:
+        query = query.filter(Screening.gender == gender.lower())
+    if min_age is not None:
+        query = query.filter(Screening.age >= min_age)
+    if max_age is not None:
+        query = query.filter(Screening.age <= max_age)
+    if start_date is not None:
+        query = query.filter(Screening.created_at >= start_date)
+    if end_date is not None:
+        query = query.filter(Screening.created_at < end_date + timedelta(days=1))
+
+    # Uma linha a mais indica se existe próxima página
+    screenings = query.order_by(
+        Screening.created_at.desc(), Screening.id.desc()
+    ).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(screenings) > limit:
+        screenings = screenings[:limit]
+        next_cursor = encode_cursor(screenings[-1].created_at, screenings[-1].id)
+
+    items = [
         {
             "id": s.id,
             "age": s.age,
             "gender": s.gender,
             "created_at": s.created_at,
             "prediction": s.prediction,
-  
         }
         for s in screenings
     ]
+    if not paginate and cursor is None:
+        return items
+    return {"items": items, "next_cursor": next_cursor}
 
 if __name__ == "__main__":
     uvicorn.run("app:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
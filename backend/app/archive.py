@@ -0,0 +1,315 @@
+# archive.py
+import glob
+import logging
+import os
+import time
+from datetime import date, datetime, timezone
+
+from sqlalchemy import delete, exists, func, insert, select, text
+from sqlalchemy.orm import aliased
+
+from database import session_timezone
+import rollups
+from schema import ArchivedRollup, ArchiveSegment, Result, Screening
+
+logger = logging.getLogger("tea.archive")
+
+# Diretório dos arquivos Parquet (caminhos em archive_segments são relativos a ele)
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "archive")
+
+# Triagens mais antigas que isso (em dias, por mês completo) saem das tabelas quentes
+ARCHIVE_HORIZON_DAYS = int(os.getenv("ARCHIVE_HORIZON_DAYS", "365"))
+
+# Linhas por row group: unidade lida de cada vez e alcance das estatísticas min/max
+ARCHIVE_ROW_GROUP = int(os.getenv("ARCHIVE_ROW_GROUP", "100000"))
+
+ARCHIVE_COMPRESSION = os.getenv("ARCHIVE_COMPRESSION", "zstd")
+
+# Chave do advisory lock que impede duas execuções simultâneas do arquivamento
+ARCHIVE_LOCK_KEY = 72022
+
+SCORE_FIELDS = [f"a{q}_score" for q in range(1, 11)]
+
+# Colunas dos arquivos; as de /api/export mais o created_at do resultado
+ARCHIVE_COLUMNS = [
+    Screening.id.label("screening_id"),
+    Screening.created_at,
+    *[getattr(Screening, field) for field in SCORE_FIELDS],
+    Screening.age,
+    Screening.gender,
+    Screening.jundice,
+    Screening.autism,
+    Screening.used_app_before,
+    Result.id.label("result_id"),
+    Result.prediction,
+    Result.confidence,
+    Result.model_version,
+    Result.created_at.label("result_created_at"),
+]
+
+
+def arrow_schema():
+    import pyarrow as pa
+
+    timestamp = pa.timestamp("us", tz="UTC")
+    return pa.schema(
+        [("screening_id", pa.int32()), ("created_at", timestamp)]
+        + [(field, pa.int8()) for field in SCORE_FIELDS]
+        + [("age", pa.int16()), ("gender", pa.string()), ("jundice", pa.string()),
+           ("autism", pa.string()), ("used_app_before", pa.string()),
+           ("result_id", pa.int32()), ("prediction", pa.string()), ("confidence", pa.float64()),
+           ("model_version", pa.string()), ("result_created_at", timestamp)]
+    )
+
+
+def month_range(month):
+    """
+    (início, fim) do mês que contém `month`, no fuso horário das sessões do
+    banco: o mês é o de date(created_at), como nas rollups
+    """
+    tz = session_timezone()
+    start = datetime(month.year, month.month, 1, tzinfo=tz)
+    end = datetime(month.year + month.month // 12, month.month % 12 + 1, 1, tzinfo=tz)
+    return start, end
+
+
+def cutoff(horizon_days=ARCHIVE_HORIZON_DAYS, today=None):
+    """Primeiro dia do mês mais antigo que fica nas tabelas quentes"""
+    tz = session_timezone()
+    today = today or datetime.now(tz).date()
+    oldest = date.fromordinal(today.toordinal() - horizon_days)
+    return datetime(oldest.year, oldest.month, 1, tzinfo=tz)
+
+
+def _archived_where(start, end):
+    # Triagens com diagnóstico confirmado ficam quentes: são rótulos do retreino.
+    # Alias para a subconsulta não se correlacionar com results da consulta externa
+    confirmed = aliased(Result)
+    return (
+        Screening.created_at >= start,
+        Screening.created_at < end,
+        ~exists().where(confirmed.screening_id == Screening.id, confirmed.confirmed_class.isnot(None)),
+    )
+
+
+def segments(db, start=None, end=None):
+    """Arquivos com triagens em [start, end), do mais antigo para o mais novo"""
+    query = select(ArchiveSegment.path).order_by(ArchiveSegment.min_created_at)
+    if start is not None:
+        query = query.where(ArchiveSegment.max_created_at >= start)
+    if end is not None:
+        query = query.where(ArchiveSegment.min_created_at < end)
+    return db.scalars(query).all()
+
+
+def dataset(paths):
+    """
+    Dataset dos arquivos informados, lidos com mmap: só as colunas pedidas e
+    os row groups que passam pelas estatísticas do filtro são decodificados
+    """
+    import pyarrow.dataset as ds
+    from pyarrow import fs
+
+    return ds.dataset(
+        [os.path.abspath(os.path.join(ARCHIVE_DIR, path)) for path in paths],
+        schema=arrow_schema(), format="parquet", filesystem=fs.LocalFileSystem(use_mmap=True),
+    )
+
+
+def _filter(start=None, end=None, prediction=None):
+    import pyarrow.dataset as ds
+
+    # O arquivo guarda também triagens sem resultado (o arquivamento não pode
+    # perdê-las); as leituras seguem o JOIN com results das tabelas quentes
+    expression = ds.field("result_id").is_valid()
+    for condition in (
+        ds.field("created_at") >= start if start is not None else None,
+        ds.field("created_at") < end if end is not None else None,
+        ds.field("prediction") == prediction if prediction is not None else None,
+    ):
+        if condition is not None:
+            expression = expression & condition
+    return expression
+
+
+def _utc(value):
+    return value.astimezone(timezone.utc) if value is not None else None
+
+
+def export_partitions(db, fields, start=None, end=None, prediction=None, batch_size=5000):
+    """
+    Linhas arquivadas em [start, end) como listas de tuplas na ordem de
+    `fields`, em ordem de created_at; nada é lido se o período não alcança o arquivo
+    """
+    start, end = _utc(start), _utc(end)
+    paths = segments(db, start, end)
+    if not paths:
+        return
+    scanner = dataset(paths).scanner(
+        columns=fields, filter=_filter(start, end, prediction), batch_size=batch_size
+    )
+    for batch in scanner.to_batches():
+        if batch.num_rows:
+            yield list(zip(*(batch.column(field).to_pylist() for field in fields)))
+
+
+def _rollup_rows(paths):
+    """
+    Linhas de archived_rollups calculadas a partir dos arquivos, com as
+    chaves de rollups.aggregate_select (dia no fuso horário das sessões do
+    banco, só triagens com resultado)
+    """
+    import numpy as np
+    import pandas as pd
+
+    integers = ["age", *SCORE_FIELDS]
+    sums = {
+        "screenings": ("age", "size"),
+        "confidence_sum": ("confidence", "sum"),
+        "age_sum": ("age", "sum"),
+        **{f"a{q}_sum": (f"a{q}_score", "sum") for q in range(1, 11)},
+    }
+    tz = session_timezone()
+    partial = []
+    # Um arquivo por vez: a memória depende do maior mês, não do arquivo todo
+    for path in paths:
+        frame = dataset([path]).to_table(
+            columns=["created_at", "gender", "jundice", "autism", "prediction", "confidence", *integers],
+            filter=_filter(),
+        ).to_pandas()
+        if frame.empty:
+            continue
+        frame[integers] = frame[integers].astype("int64")
+        frame["day"] = frame["created_at"].dt.tz_convert(tz).dt.date
+        frame["age_bucket"] = frame["age"].map({age: rollups.age_bucket(age) for age in frame["age"].unique()})
+        confidence = frame["confidence"].to_numpy(dtype=np.float64, na_value=np.nan)
+        frame["confidence_bucket"] = np.where(
+            np.isnan(confidence), 0, np.searchsorted(rollups.CONFIDENCE_BOUNDS, confidence, side="right")
+        )
+        partial.append(frame.groupby(rollups.KEY_COLUMNS).agg(**sums))
+    if not partial:
+        return []
+    totals = pd.concat(partial).groupby(level=rollups.KEY_COLUMNS).sum()
+    return totals.reset_index()[rollups.KEY_COLUMNS + rollups.SUM_COLUMNS].to_dict("records")
+
+
+def rebuild_rollups(db, batch_size=1000):
+    """
+    Recalcula archived_rollups a partir dos arquivos registrados, para
+    quando a chave das rollups muda (as linhas já saíram das tabelas
+    quentes). Retorna o número de linhas geradas.
+    """
+    rows = _rollup_rows(segments(db))
+    db.execute(text("SET LOCAL statement_timeout = 0"))
+    db.execute(delete(ArchivedRollup))
+    for start in range(0, len(rows), batch_size):
+        db.execute(insert(ArchivedRollup), rows[start:start + batch_size])
+    db.commit()
+    return len(rows)
+
+
+def _write_parquet(rows_by_chunk, path):
+    """Grava as linhas (blocos de tuplas em ordem de ARCHIVE_COLUMNS); retorna (linhas, min, max)"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = arrow_schema()
+    total, first, last = 0, None, None
+    with pq.ParquetWriter(path, schema, compression=ARCHIVE_COMPRESSION) as writer:
+        for rows in rows_by_chunk:
+            columns = list(zip(*rows))
+            batch = pa.RecordBatch.from_arrays(
+                [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+                schema=schema,
+            )
+            writer.write_batch(batch, row_group_size=ARCHIVE_ROW_GROUP)
+            total += len(rows)
+            first = first or rows[0][1]
+            last = rows[-1][1]
+    with open(path, "rb") as f:
+        os.fsync(f.fileno())
+    return total, first, last
+
+
+def archive_month(db, month):
+    """
+    Move as triagens do mês de `month` (e seus resultados) para um arquivo
+    Parquet, em uma transação REPEATABLE READ: o arquivo contém exatamente
+    as linhas do snapshot da transação, e os DELETEs não alcançam linhas
+    gravadas depois dele. O arquivo só passa a ser lido quando o commit
+    registra o segmento; se a transação falhar, ele é um órfão removido por
+    remove_orphans(). Retorna o número de triagens arquivadas.
+    """
+    start, end = month_range(month)
+    where = _archived_where(start, end)
+
+    db.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+    db.execute(text("SET LOCAL statement_timeout = 0"))
+
+    relative = os.path.join("screenings", f"month={start:%Y-%m}", f"part-{time.time_ns()}.parquet")
+    path = os.path.join(ARCHIVE_DIR, relative)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    query = (
+        select(*ARCHIVE_COLUMNS)
+        .outerjoin(Result, Screening.id == Result.screening_id)
+        .where(*where)
+        .order_by(Screening.created_at, Screening.id)
+        .execution_options(yield_per=ARCHIVE_ROW_GROUP)
+    )
+    rows, first, last = _write_parquet(db.execute(query).partitions(), path + ".tmp")
+    if not rows:
+        os.unlink(path + ".tmp")
+        db.rollback()
+        return 0
+    os.replace(path + ".tmp", path)
+
+    # Os contadores do dashboard continuam nas rollups; archived_rollups os
+    # preserva para o recálculo
+    db.execute(rollups.archive_statement(*where))
+    db.execute(
+        delete(Result)
+        .where(Result.screening_id == Screening.id, *where)
+        .execution_options(synchronize_session=False)
+    )
+    db.execute(
+        delete(Screening)
+        .where(*where, ~exists().where(Result.screening_id == Screening.id))
+        .execution_options(synchronize_session=False)
+    )
+    db.add(ArchiveSegment(
+        path=relative, month=start.date(), rows=rows, min_created_at=first, max_created_at=last
+    ))
+    db.commit()
+    return rows
+
+
+def months_to_archive(db, horizon_days=ARCHIVE_HORIZON_DAYS):
+    """Meses com triagens anteriores ao corte, do mais antigo ao mais novo"""
+    limit = cutoff(horizon_days)
+    oldest = db.scalar(select(func.min(Screening.created_at)).where(Screening.created_at < limit))
+    months = []
+    if oldest is None:
+        return months
+    month = oldest.astimezone(session_timezone()).date().replace(day=1)
+    while month < limit.date():
+        months.append(month)
+        month = month_range(month)[1].date()
+    return months
+
+
+def try_lock(connection):
+    """Advisory lock de sessão do arquivamento; False se outra execução o detém"""
+    return connection.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": ARCHIVE_LOCK_KEY}).scalar()
+
+
+def remove_orphans(db):
+    """Apaga arquivos sem segmento registrado (transações que não chegaram ao commit)"""
+    registered = set(db.scalars(select(ArchiveSegment.path)).all())
+    removed = 0
+    for path in glob.glob(os.path.join(ARCHIVE_DIR, "screenings", "*", "*.parquet*")):
+        if os.path.relpath(path, ARCHIVE_DIR) not in registered:
+            logger.info("Removendo arquivo órfão %s", path)
+            os.unlink(path)
+            removed += 1
+    return removed
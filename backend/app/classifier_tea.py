@@ -1,29 +1,111 @@
-import pandas as pd
 import numpy as np
-from sklearn.model_selection import train_test_split, cross_val_predict
-from sklearn.preprocessing import LabelEncoder, StandardScaler
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.metrics import classification_report, confusion_matrix, roc_curve, auc
-from sklearn.metrics import (accuracy_score, precision_score, recall_score, f1_score, precision_recall_curve, roc_auc_score)
-from sklearn.utils.class_weight import compute_class_weight
 import joblib
+import hashlib
+import io
+import os
+import threading
+
+import drift_monitor
+
+# Acima deste tamanho de lote o sklearn (Cython) é mais rápido que a floresta
+# achatada em NumPy; os dois produzem as mesmas probabilidades
+FLAT_MAX_BATCH = int(os.getenv('TEA_FLAT_MAX_BATCH', '512'))
+
+# Pré-calcula na carga as tabelas de contribuição por nó (?explain=true)
+EXPLANATIONS = os.getenv('TEA_EXPLANATIONS', 'true').lower() == 'true'
 
 class TEAClassifier:
     """
     Classificador para triagem de TEA
     """
 
-    def __init__(self, model_path='models/tea_model_optmized.pkl'):
+    # Valores aceitos na API -> classes vistas pelos LabelEncoders
+    CATEGORY_ALIASES = {'gender': {'m': 'male', 'f': 'female'}}
+
+    def __init__(self, model_path='models/tea_model_optimized.pkl', engine=None):
+
+        # Versão = hash do conteúdo carregado (o mesmo bytes usado pelo joblib)
+        with open(model_path, 'rb') as f:
+            artifact = f.read()
+        self.model_path = model_path
+        self.version = hashlib.sha256(artifact).hexdigest()[:16]
 
-        self.model_data = joblib.load(model_path)
+        self.model_data = joblib.load(io.BytesIO(artifact))
         self.model = self.model_data['model']
         self.scaler = self.model_data['scaler']
         self.threshold = self.model_data.get('threshold', 0.5)
         self.feature_names = self.model_data['feature_names']
         self.model_type = self.model_data.get('model_type', 'unknown')
         self.label_encoders = self.model_data.get('label_encoders', {})
+        self.category_codes = {
+            col: {str(cls): code for code, cls in enumerate(encoder.classes_)}
+            for col, encoder in self.label_encoders.items()
+        }
+        # Coluna de origem de cada feature codificada (None para numéricas)
+        self.encoded_columns = [
+            name[:-len('_encoded')] if name.endswith('_encoded') else None
+            for name in self.feature_names
+        ]
+
+        # Árvores avaliadas em sequência: a soma das probabilidades fica
+        # determinística e evita o custo de threads para uma única linha
+        if hasattr(self.model, 'n_jobs'):
+            self.model.n_jobs = 1
+
+        # Buffer de entrada pré-alocado por thread para o caminho de uma linha
+        self._local = threading.local()
+
+        # Motor de inferência: 'sklearn', 'flat', 'lookup' ou 'lookup-lazy'
+        self.engine = engine or os.getenv('TEA_INFERENCE_ENGINE', 'sklearn')
+        self.lookup_table = None
+        self.flat_forest = None
+        if self.engine == 'flat':
+            from flat_forest import FlatForest
+            self.flat_forest = FlatForest.from_sklearn(self.model, self.scaler)
+        elif self.engine in ('lookup', 'lookup-lazy'):
+            from lookup_engine import LookupTableEngine
+            self.lookup_table = LookupTableEngine(
+                self,
+                lazy=self.engine == 'lookup-lazy',
+                cache_dir=os.getenv('TEA_LOOKUP_CACHE_DIR') or None,
+            )
+            if os.getenv('TEA_LOOKUP_VERIFY', 'false').lower() == 'true':
+                mismatches = self.lookup_table.verify()
+                if mismatches:
+                    raise RuntimeError(f"Tabela de inferência diverge do modelo em {mismatches} entradas")
+        elif self.engine != 'sklearn':
+            raise ValueError(f"Motor de inferência desconhecido: {self.engine}")
+
+        # Explicações vêm dos arrays da floresta achatada, qualquer que seja o motor
+        self.explainer = None
+        if EXPLANATIONS and hasattr(self.model, 'estimators_'):
+            from flat_forest import FlatForest
+            from tree_explainer import TreeExplainer
+            forest = self.flat_forest or FlatForest.from_sklearn(self.model, self.scaler)
+            self.explainer = TreeExplainer(forest, len(self.feature_names))
+        # Nome de cada feature como campo da API (gender em vez de gender_encoded)
+        self.explanation_names = [
+            column or name for name, column in zip(self.feature_names, self.encoded_columns)
+        ]
+
+        # Histogramas das entradas servidas contra o perfil de referência do artefato
+        self.drift_monitor = drift_monitor.load(self)
+
+    def encode_category(self, column, value):
+        """Código do LabelEncoder para um valor categórico da API"""
+        value = self.CATEGORY_ALIASES.get(column, {}).get(value, value)
+        try:
+            return self.category_codes[column][str(value)]
+        except KeyError:
+            raise ValueError(f"Valor desconhecido para {column}: {value}")
+
+    def decode_category(self, column, code):
+        """Classe original do LabelEncoder para um código"""
+        return str(self.label_encoders[column].classes_[code])
 
     def prepare_input(self, data_dict):
+        # Caminho legado com DataFrame; o pandas só é importado se for usado
+        import pandas as pd
 
         df = pd.DataFrame([data_dict])
         df = df.rename(columns={'austim': 'autism',})
@@ -39,22 +121,129 @@ class TEAClassifier:
                 df[col + '_encoded'] = self.label_encoders[col].transform(df[col].astype(str))
         
         return df[self.feature_names]
-    
-    def predict(self, data_dict):
-        X = self.prepare_input(data_dict)
-        x_scaled = self.scaler.transform(X)
 
-        prediction = self.model.predict(x_scaled)[0]
-        probability = self.model.predict_proba(x_scaled)[0,1]
+    def encode_record(self, data_dict, out):
+        """Escreve em `out` o vetor de features de uma entrada, na ordem de feature_names"""
+        for j, (name, column) in enumerate(zip(self.feature_names, self.encoded_columns)):
+            if column is not None:
+                out[j] = self.encode_category(column, data_dict[column])
+            else:
+                out[j] = data_dict[name]
+        return out
+
+    def scale(self, X):
+        """Mesma aritmética do StandardScaler.transform, sem validação do DataFrame"""
+        X = np.array(X, dtype=np.float64)
+        if self.scaler.with_mean:
+            X -= self.scaler.mean_
+        if self.scaler.with_std:
+            X /= self.scaler.scale_
+        return X
+
+    def score(self, X):
+        """Retorna (predições, probabilidades) para uma matriz de features"""
+        if self.lookup_table is not None:
+            probabilities = self.lookup_table.lookup_matrix(X)
+        elif self.flat_forest is not None and len(X) <= FLAT_MAX_BATCH:
+            probabilities = self.flat_forest.predict_proba(X)
+        else:
+            probabilities = self.model.predict_proba(self.scale(X))[:, 1]
+        return (probabilities >= self.threshold).astype(np.int64), probabilities
+
+    def _row_buffer(self):
+        """Buffer (1, n_features) reutilizado entre chamadas da mesma thread"""
+        row = getattr(self._local, 'row', None)
+        if row is None:
+            row = self._local.row = np.empty((1, len(self.feature_names)), dtype=np.float64)
+        return row
 
+    def predict_proba_one(self, data_dict):
+        """Probabilidade da classe positiva para uma entrada, com uma passada pela floresta"""
+        if self.lookup_table is not None:
+            return self.lookup_table.lookup(data_dict)
+
+        row = self._row_buffer()
+        self.encode_record(data_dict, row[0])
+        if self.flat_forest is not None:
+            # O scaler já está embutido nos limiares da floresta achatada
+            return float(self.flat_forest.predict_proba(row)[0])
+        if self.scaler.with_mean:
+            row -= self.scaler.mean_
+        if self.scaler.with_std:
+            row /= self.scaler.scale_
+        return float(self.model.predict_proba(row)[0, 1])
+
+    def predict(self, data_dict, explain=False):
+        probability = self.predict_proba_one(data_dict)
+        prediction = int(probability >= self.threshold)
+        result = self._format_result(prediction, probability)
+        if explain:
+            result['explanation'] = self.explain(data_dict)
+        return result
+
+    def explain(self, data_dict):
+        """Contribuição de cada feature para a probabilidade de uma entrada"""
+        if self.explainer is None:
+            raise ValueError("Explicações indisponíveis para este modelo (TEA_EXPLANATIONS)")
+        row = self._row_buffer()
+        self.encode_record(data_dict, row[0])
+        return self._format_explanation(self.explainer.contributions(row)[0])
+
+    def explain_matrix(self, X):
+        """Explicações para cada linha de uma matriz de features, em uma passada"""
+        if self.explainer is None:
+            raise ValueError("Explicações indisponíveis para este modelo (TEA_EXPLANATIONS)")
+        return [self._format_explanation(row) for row in self.explainer.contributions(X)]
+
+    def _format_explanation(self, contributions):
+        return {
+            'base_value': self.explainer.base_value,
+            'contributions': {
+                name: float(value) for name, value in zip(self.explanation_names, contributions)
+            },
+        }
+
+    def predict_batch(self, records, explain=False):
+        """
+        Predição vetorizada com uma única chamada ao modelo.
+
+        Retorna uma lista alinhada com `records`; entradas que não puderam
+        ser codificadas trazem {'error': mensagem}. Com `explain`, cada
+        resultado traz também 'explanation'.
+        """
+        X = np.empty((len(records), len(self.feature_names)), dtype=np.float64)
+        results = [None] * len(records)
+        valid = []
+
+        for i, record in enumerate(records):
+            try:
+                self.encode_record(record, X[len(valid)])
+            except (KeyError, ValueError) as e:
+                results[i] = {'error': str(e)}
+            else:
+                valid.append(i)
+
+        if valid:
+            predictions, probabilities = self.score(X[:len(valid)])
+            for i, prediction, probability in zip(valid, predictions, probabilities):
+                results[i] = self._format_result(prediction, probability)
+            if explain:
+                for i, explanation in zip(valid, self.explain_matrix(X[:len(valid)])):
+                    results[i]['explanation'] = explanation
+
+        return results
+
+    def _format_result(self, prediction, probability):
+        """Monta o dicionário de resposta de uma predição"""
         confidence = self._get_confidence_level(probability)
-        
+
         return {
             'prediction': 'TEA' if prediction == 1 else 'Sem TEA',
             'probability': float(probability),
             'confidence': confidence,
             'recommendation': self._get_recommendation(prediction, probability),
-            'model_type': self.model_type
+            'model_type': self.model_type,
+            'model_version': self.version
         }
     
     def _get_confidence_level(self, probability):
@@ -84,6 +273,3 @@ class TEAClassifier:
                 return "Monitoramento recomendado. Reavaliar em 6 meses."
             else:
                 return "Baixo risco. Manter acompanhamento regular."
-
-    
-classifier = TEAClassifier('models/tea_model_optimized.pkl')
\ No newline at end of file
@@ -0,0 +1,102 @@
+# dashboard_queries.py
+from datetime import timedelta
+
+from sqlalchemy import case, func, select, true
+
+import rollups
+from schema import DashboardRollup, Result, Screening
+
+
+def rollup_counts(db, *group_by):
+    """Total e positivos a partir das rollups, agrupados pelas colunas informadas"""
+    return db.query(
+        *group_by,
+        func.sum(DashboardRollup.screenings).label('total'),
+        func.sum(case((DashboardRollup.prediction == "TEA", DashboardRollup.screenings), else_=0)).label('positive')
+    ).group_by(*group_by)
+
+
+def _kpi_row_from_rollups(db, days):
+    R = DashboardRollup
+    return db.query(
+        func.coalesce(func.sum(R.screenings), 0).label('total_screenings'),
+        func.coalesce(func.sum(R.screenings), 0).label('total_results'),
+        func.coalesce(func.sum(R.screenings).filter(R.prediction == "TEA"), 0).label('positive'),
+        func.coalesce(func.sum(R.screenings).filter(R.prediction == "Sem TEA"), 0).label('negative'),
+        func.coalesce(func.sum(R.screenings).filter(R.day >= func.current_date() - days), 0).label('recent'),
+        (func.sum(R.age_sum) / func.nullif(func.sum(R.screenings), 0)).label('avg_age'),
+        (func.sum(R.confidence_sum) / func.nullif(func.sum(R.screenings), 0)).label('avg_confidence'),
+    ).one()
+
+
+def _kpi_row_from_tables(db, days):
+    # Duas subconsultas de uma linha cada, combinadas em um único SELECT
+    screenings = select(
+        func.count().label('total_screenings'),
+        func.count().filter(Screening.created_at >= func.now() - timedelta(days=days)).label('recent'),
+        func.avg(Screening.age).label('avg_age'),
+    ).subquery()
+    results = select(
+        func.count().label('total_results'),
+        func.count().filter(Result.prediction == "TEA").label('positive'),
+        func.count().filter(Result.prediction == "Sem TEA").label('negative'),
+        func.avg(Result.confidence).label('avg_confidence'),
+    ).subquery()
+
+    return db.execute(
+        select(screenings, results).select_from(screenings.join(results, true()))
+    ).one()
+
+
+def kpi_summary(db):
+    """
+    Todos os KPIs do dashboard em uma única consulta. A janela de 7 dias é
+    calculada no banco, no mesmo fuso das rollups; com rollups ela tem
+    granularidade de dia (inclui o dia inteiro de 7 dias atrás).
+    """
+    if rollups.USE_ROLLUPS:
+        row = _kpi_row_from_rollups(db, 7)
+    else:
+        row = _kpi_row_from_tables(db, 7)
+
+    total_screenings = int(row.total_screenings)
+    positive_cases = int(row.positive)
+    return {
+        "total_screenings": total_screenings,
+        "total_results": int(row.total_results),
+        "positive_cases": positive_cases,
+        "negative_cases": int(row.negative),
+        "positive_rate": positive_cases / total_screenings if total_screenings > 0 else 0,
+        "avg_age": round(float(row.avg_age or 0), 1),
+        "recent_screenings_7d": int(row.recent),
+        "avg_confidence": round(float(row.avg_confidence or 0), 3)
+    }
+
+
+def age_histogram(db):
+    """Total e positivos por faixa etária em um único GROUP BY"""
+    if rollups.USE_ROLLUPS:
+        rows = rollup_counts(db, DashboardRollup.age_bucket.label('bucket')).all()
+    else:
+        # Cada triagem tem no máximo um resultado, então o LEFT JOIN não duplica linhas
+        bucket = rollups.age_bucket_expression(Screening.age).label('bucket')
+        rows = db.query(
+            bucket,
+            func.count(Screening.id).label('total'),
+            func.count(Result.id).filter(Result.prediction == "TEA").label('positive')
+        ).outerjoin(Result, Screening.id == Result.screening_id).group_by(bucket).all()
+
+    counts = {r.bucket: r for r in rows}
+    distribution = []
+    for label, _, _ in rollups.AGE_RANGES:
+        r = counts.get(label)
+        total = int(r.total) if r else 0
+        positive = int(r.positive) if r else 0
+        distribution.append({
+            "range": label,
+            "total": total,
+            "positive": positive,
+            "negative": total - positive,
+            "positive_rate": positive / total if total > 0 else 0
+        })
+    return distribution
@@ -0,0 +1,292 @@
+# dashboard_stream.py
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+
+from database import SessionLocal
+import dashboard_endpoints
+from response_cache import REDIS_URL
+import rollups
+
+logger = logging.getLogger("tea.dashboard_stream")
+
+# Entrega das triagens novas ao dashboard: 'memory' (clientes do próprio
+# worker), 'redis' (pub/sub, clientes de todos os workers) ou 'off'
+STREAM_BACKEND = os.getenv("DASHBOARD_STREAM", "memory").lower()
+
+# Intervalo (s) entre snapshots completos. É calculado uma vez por worker e
+# enviado a todos os clientes, independente de quantos estão conectados
+SNAPSHOT_INTERVAL = float(os.getenv("DASHBOARD_STREAM_SNAPSHOT_INTERVAL", "60"))
+
+# Comentário enviado em conexões ociosas para proxies não as encerrarem
+HEARTBEAT_INTERVAL = float(os.getenv("DASHBOARD_STREAM_HEARTBEAT", "15"))
+
+# Eventos pendentes por cliente; um cliente mais lento que isso recebe um novo snapshot
+CLIENT_QUEUE_SIZE = int(os.getenv("DASHBOARD_STREAM_CLIENT_QUEUE", "1000"))
+
+# Deltas guardados desde o último snapshot, reenviados a quem se conecta
+MAX_REPLAY = int(os.getenv("DASHBOARD_STREAM_MAX_REPLAY", "10000"))
+
+TIMELINE_DAYS = 30
+CHANNEL = "tea:dashboard:deltas"
+
+# Marca na fila de um cliente que perdeu eventos
+_RESYNC = object()
+
+
+def delta(values, prediction, confidence, created_at):
+    """
+    Resumo de uma triagem com o necessário para atualizar KPIs, histogramas
+    e a linha do tempo no cliente. `values` está no formato das colunas de
+    Screening; o dia é o mesmo das rollups e do /timeline.
+    """
+    return {
+        "day": rollups.day(created_at).isoformat(),
+        "age": values["age"],
+        "age_bucket": rollups.age_bucket(values["age"]),
+        "gender": values["gender"],
+        "jundice": values["jundice"],
+        "autism": values["autism"],
+        "prediction": prediction,
+        "confidence": confidence,
+        "confidence_range": rollups.confidence_range(confidence),
+        "scores": [values[column] for column in rollups.SCORE_COLUMNS],
+    }
+
+
+def compute_snapshot():
+    """Respostas de todos os endpoints do dashboard em uma sessão"""
+    with SessionLocal() as db:
+        return {
+            "kpis": dashboard_endpoints.get_kpis(db=db),
+            "age_distribution": dashboard_endpoints.get_age_distribution(db=db),
+            "gender_distribution": dashboard_endpoints.get_gender_distribution(db=db),
+            "confidence_distribution": dashboard_endpoints.get_confidence_distribution(db=db),
+            "timeline": dashboard_endpoints.get_timeline(days=TIMELINE_DAYS, db=db),
+            "risk_factors": dashboard_endpoints.get_risk_factors(db=db),
+            "score_analysis": dashboard_endpoints.get_score_analysis(db=db),
+        }
+
+
+def _event(name, data):
+    return f"event: {name}\ndata: {json.dumps(data, separators=(',', ':'), default=str)}\n\n"
+
+
+class Broadcaster:
+    """
+    Distribui as triagens novas aos dashboards conectados por SSE.
+
+    Cada cliente recebe um snapshot ao conectar (o último calculado, mais os
+    deltas publicados desde então) e depois apenas deltas. Os snapshots são
+    compartilhados: o banco é consultado no máximo uma vez por
+    SNAPSHOT_INTERVAL por worker, não por aba aberta. Um delta pode ser
+    contado duas vezes se a triagem for gravada durante o cálculo de um
+    snapshot; o snapshot seguinte corrige.
+
+    Os clientes e os deltas guardados só são acessados na thread do event
+    loop; publish() pode ser chamado de qualquer thread.
+    """
+
+    def __init__(self, client=None):
+        self.client = client
+        self._loop = None
+        self._subscribers = set()
+        self._snapshot = None
+        self._snapshot_at = 0.0
+        self._since_snapshot = []
+        self._snapshot_lock = None
+        self._refresh_task = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self.client is None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._listen, name="tea-dashboard-stream", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def publish(self, items):
+        """Envia deltas a todos os clientes (de todos os workers, com redis)"""
+        if not items:
+            return
+        try:
+            if self.client is not None:
+                self.client.publish(CHANNEL, json.dumps(items, separators=(",", ":")))
+            else:
+                self._dispatch(items)
+        except Exception:
+            # O dashboard se corrige no próximo snapshot; a predição não pode falhar por isso
+            logger.warning("Falha ao publicar %d deltas", len(items), exc_info=True)
+
+    def _listen(self):
+        while not self._stop.is_set():
+            try:
+                pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(CHANNEL)
+                while not self._stop.is_set():
+                    message = pubsub.get_message(timeout=1.0)
+                    if message is not None:
+                        self._dispatch(json.loads(message["data"]))
+                pubsub.close()
+            except Exception:
+                logger.warning("Falha na assinatura de %s; nova tentativa em 1s", CHANNEL, exc_info=True)
+                self._stop.wait(1.0)
+
+    def _dispatch(self, items):
+        loop = self._loop
+        # Nenhum cliente conectou ainda neste worker
+        if loop is None:
+            return
+        try:
+            loop.call_soon_threadsafe(self._deliver, items)
+        except RuntimeError:
+            pass  # event loop encerrado
+
+    def _deliver(self, items):
+        if len(self._since_snapshot) + len(items) > MAX_REPLAY:
+            # Muitos deltas para reenviar: quem conectar recebe um snapshot novo
+            self._snapshot = None
+            self._since_snapshot = []
+        else:
+            self._since_snapshot.extend(items)
+        self._broadcast(_event("delta", items))
+
+    def _broadcast(self, message):
+        for queue in self._subscribers:
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                _drain(queue)
+                queue.put_nowait(_RESYNC)
+
+    async def _current_snapshot(self):
+        """(snapshot, deltas desde ele), recalculando o snapshot se expirou"""
+        if self._snapshot_lock is None:
+            self._snapshot_lock = asyncio.Lock()
+        async with self._snapshot_lock:
+            if self._snapshot is None or time.monotonic() - self._snapshot_at >= SNAPSHOT_INTERVAL:
+                self._since_snapshot = []
+                self._snapshot_at = time.monotonic()
+                self._snapshot = _event("snapshot", await asyncio.to_thread(compute_snapshot))
+            replay = _event("delta", list(self._since_snapshot)) if self._since_snapshot else None
+            return self._snapshot, replay
+
+    async def _refresh(self):
+        while self._subscribers:
+            await asyncio.sleep(SNAPSHOT_INTERVAL)
+            if not self._subscribers:
+                break
+            try:
+                snapshot, _ = await self._current_snapshot()
+            except Exception:
+                logger.exception("Falha ao calcular o snapshot do dashboard")
+                continue
+            self._broadcast(snapshot)
+
+    async def _subscribe(self, queue):
+        # Sem await entre o snapshot e a inscrição: nenhum delta fica de fora
+        # nem chega duas vezes (pelo replay e pela fila)
+        snapshot, replay = await self._current_snapshot()
+        self._subscribers.add(queue)
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._refresh())
+        return [message for message in (snapshot, replay) if message]
+
+    async def stream(self):
+        """Eventos SSE de um cliente até a desconexão"""
+        self._loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(CLIENT_QUEUE_SIZE)
+        try:
+            for message in await self._subscribe(queue):
+                yield message
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), HEARTBEAT_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                if message is _RESYNC:
+                    self._subscribers.discard(queue)
+                    _drain(queue)
+                    for message in await self._subscribe(queue):
+                        yield message
+                    continue
+                yield message
+        finally:
+            self._subscribers.discard(queue)
+
+    def stats(self):
+        return {
+            "subscribers": len(self._subscribers),
+            "snapshot_age_s": round(time.monotonic() - self._snapshot_at, 1) if self._snapshot else None,
+            "pending_replay": len(self._since_snapshot),
+        }
+
+
+def _drain(queue):
+    while not queue.empty():
+        queue.get_nowait()
+
+
+def create_broadcaster():
+    if STREAM_BACKEND == "off":
+        return None
+    if STREAM_BACKEND == "redis":
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("DASHBOARD_STREAM=redis requer o pacote 'redis' (pip install redis)")
+        return Broadcaster(redis.Redis.from_url(REDIS_URL))
+    if STREAM_BACKEND == "memory":
+        return Broadcaster()
+    raise ValueError(f"Backend do stream desconhecido: {STREAM_BACKEND}")
+
+
+broadcaster = create_broadcaster()
+
+
+def start():
+    if broadcaster is not None:
+        broadcaster.start()
+
+
+def stop():
+    if broadcaster is not None:
+        broadcaster.stop()
+
+
+def publish(items):
+    """Chamado após cada gravação (ou aceite, na gravação assíncrona) de triagens"""
+    if broadcaster is not None:
+        broadcaster.publish(items)
+
+
+stream_router = APIRouter(prefix="/api/dashboard", tags=["dashboard"])
+
+
+@stream_router.get("/stream")
+async def stream_dashboard():
+    """
+    Atualizações do dashboard por Server-Sent Events: um evento `snapshot`
+    com todos os painéis e um evento `delta` (lista de triagens) a cada
+    predição; novos snapshots chegam periodicamente para ressincronizar
+    """
+    if broadcaster is None:
+        raise HTTPException(status_code=404, detail="Stream desativado (DASHBOARD_STREAM=off)")
+    return StreamingResponse(
+        broadcaster.stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,8 +1,16 @@
 # database.py
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, exc, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool, NullPool
 import os
+import threading
+import time
+import uuid
+from datetime import timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 from dotenv import load_dotenv
 
 # Carregar variáveis de ambiente
@@ -15,12 +23,217 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 if "options=" not in DATABASE_URL:
     DATABASE_URL += "?options=-csearch_path%3Dtea_screening"
 
+# Configuração do pool (valores por engine e por processo worker)
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "30000"))
+
+# Com PgBouncer em modo transaction o pool fica no PgBouncer: a aplicação
+# abre uma conexão por uso, não envia parâmetros de inicialização (que o
+# PgBouncer rejeita) e não usa prepared statements do asyncpg. Os parâmetros
+# de sessão (search_path, statement_timeout) são aplicados em cada transação
+PGBOUNCER = os.getenv("DB_PGBOUNCER", "false").lower() == "true"
+
+
+class PoolTimingMixin:
+    """Mede quanto tempo as requisições esperam para obter uma conexão"""
+
+    def _init_timing(self):
+        self._timing_lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            with self._timing_lock:
+                self.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            with self._timing_lock:
+                self.checkouts += 1
+                self.wait_total += waited
+                self.wait_max = max(self.wait_max, waited)
+
+
+class TimedQueuePool(PoolTimingMixin, QueuePool):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._init_timing()
+
+
+class TimedAsyncQueuePool(PoolTimingMixin, AsyncAdaptedQueuePool):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._init_timing()
+
+
+def server_options(url):
+    """Lê os `-cchave=valor` do parâmetro libpq `options` da URL"""
+    settings = {}
+    for option in make_url(url).query.get("options", "").split():
+        if option.startswith("-c") and "=" in option:
+            key, value = option[2:].split("=", 1)
+            settings[key] = value
+    if STATEMENT_TIMEOUT_MS > 0:
+        settings.setdefault("statement_timeout", str(STATEMENT_TIMEOUT_MS))
+    return settings
+
+
+def pool_arguments(poolclass):
+    if PGBOUNCER:
+        return {"poolclass": NullPool}
+    return {
+        "poolclass": poolclass,
+        "pool_size": POOL_SIZE,
+        "max_overflow": MAX_OVERFLOW,
+        "pool_timeout": POOL_TIMEOUT,
+        "pool_recycle": POOL_RECYCLE,
+        "pool_pre_ping": POOL_PRE_PING,
+    }
+
+
+def set_per_transaction(bind, settings):
+    """
+    Aplica os parâmetros com SET LOCAL no início de cada transação da engine.
+    No PgBouncer cada transação pode cair em outra conexão do servidor, então
+    parâmetros de sessão não se mantêm. Executado direto no cursor do driver,
+    antes do primeiro comando da transação e fora da contagem de consultas.
+    """
+    statement = "SELECT " + ", ".join(
+        "set_config('{}', '{}', true)".format(key, value.replace("'", "''"))
+        for key, value in settings.items()
+    )
+
+    @event.listens_for(bind, "begin")
+    def _set_local(conn):
+        cursor = conn.connection.cursor()
+        try:
+            cursor.execute(statement)
+        finally:
+            cursor.close()
+
+
+# Parâmetros de sessão enviados na abertura de cada conexão
+_server_settings = server_options(DATABASE_URL)
+
+_connect_args = {}
+if _server_settings and not PGBOUNCER:
+    _connect_args["options"] = " ".join(f"-c{key}={value}" for key, value in _server_settings.items())
+
 # Criar engine
-engine = create_engine(DATABASE_URL)
+engine = create_engine(
+    make_url(DATABASE_URL).difference_update_query(["options"]),
+    connect_args=_connect_args,
+    **pool_arguments(TimedQueuePool),
+)
+
+if PGBOUNCER and _server_settings:
+    set_per_transaction(engine, _server_settings)
 
 # Criar sessão
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+def make_async_url(url):
+    """
+    Converte a URL síncrona para o driver asyncpg.
+    O asyncpg não aceita o parâmetro libpq `options`, então cada `-cchave=valor`
+    vira um server_setting da conexão.
+    """
+    settings = server_options(url)
+    url = make_url(url).set(drivername="postgresql+asyncpg").difference_update_query(["options"])
+    return url, settings
+
+ASYNC_DATABASE_URL, _async_server_settings = make_async_url(DATABASE_URL)
+
+if PGBOUNCER:
+    # Nomes únicos evitam colisão de prepared statements entre clientes
+    # que compartilham a mesma conexão do PgBouncer
+    ASYNC_DATABASE_URL = ASYNC_DATABASE_URL.update_query_dict({"prepared_statement_cache_size": "0"})
+    _async_connect_args = {
+        "statement_cache_size": 0,
+        "prepared_statement_name_func": lambda: f"__asyncpg_{uuid.uuid4()}__",
+    }
+else:
+    _async_connect_args = {"server_settings": _async_server_settings}
+
+# Engine assíncrona usada pelo caminho de /predict
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    connect_args=_async_connect_args,
+    **pool_arguments(TimedAsyncQueuePool),
+)
+
+if PGBOUNCER and _async_server_settings:
+    set_per_transaction(async_engine.sync_engine, _async_server_settings)
+
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, autoflush=False, expire_on_commit=False
+)
+
+
+def _reset_pools_after_fork():
+    """
+    Workers criados por fork (gunicorn --preload) herdam os sockets do
+    processo pai. Descartamos o pool herdado sem fechar as conexões, que
+    continuam pertencendo ao pai, e cada worker abre as suas.
+    """
+    engine.dispose(close=False)
+    async_engine.sync_engine.dispose(close=False)
+
+
+os.register_at_fork(after_in_child=_reset_pools_after_fork)
+
+
+def pool_stats(bind):
+    """Estatísticas do pool de uma engine (síncrona)"""
+    pool = bind.pool
+    stats = {"pool_class": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        stats.update({
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": max(pool.overflow(), 0),
+            "max_overflow": pool._max_overflow,
+        })
+    if isinstance(pool, PoolTimingMixin):
+        with pool._timing_lock:
+            stats.update({
+                "checkouts": pool.checkouts,
+                "timeouts": pool.timeouts,
+                "wait_avg_ms": round(pool.wait_total / pool.checkouts * 1000, 3) if pool.checkouts else 0.0,
+                "wait_max_ms": round(pool.wait_max * 1000, 3),
+            })
+    return stats
+
+_session_timezone = None
+
+
+def session_timezone():
+    """
+    Fuso horário (TimeZone) das sessões da engine, o que define CURRENT_DATE
+    e date(created_at) no banco. Consultado uma vez por processo; um nome
+    que o Python não conhece vira o deslocamento atual em relação ao UTC.
+    """
+    global _session_timezone
+    if _session_timezone is None:
+        with engine.connect() as conn:
+            name, offset = conn.execute(text("SELECT current_setting('TimeZone'), EXTRACT(TIMEZONE FROM now())")).one()
+        try:
+            _session_timezone = ZoneInfo(name)
+        except (ZoneInfoNotFoundError, ValueError):
+            _session_timezone = timezone(timedelta(seconds=int(offset)))
+    return _session_timezone
+
 # Base para modelos
 Base = declarative_base()
 
@@ -30,4 +243,9 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+# Dependency para obter sessão assíncrona
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
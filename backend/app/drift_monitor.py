@@ -0,0 +1,328 @@
+# drift_monitor.py
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_right
+from datetime import datetime, timezone
+
+import numpy as np
+
+logger = logging.getLogger("tea.drift_monitor")
+
+# Monitora as entradas e probabilidades do /predict contra o perfil do modelo
+DRIFT_MONITOR = os.getenv("DRIFT_MONITOR", "true").lower() == "true"
+
+# Janela comparada com o perfil: DRIFT_WINDOW_SLOTS fatias de DRIFT_SLOT_SECONDS
+# (padrão: últimas 24 horas, descartadas hora a hora)
+WINDOW_SLOTS = int(os.getenv("DRIFT_WINDOW_SLOTS", "24"))
+SLOT_SECONDS = float(os.getenv("DRIFT_SLOT_SECONDS", "3600"))
+
+# Triagens mínimas na janela antes de classificar o desvio
+MIN_SAMPLES = int(os.getenv("DRIFT_MIN_SAMPLES", "200"))
+
+# Faixas usuais do PSI: abaixo de WARN estável, acima de ALERT desvio significativo
+PSI_WARN = float(os.getenv("DRIFT_PSI_WARN", "0.1"))
+PSI_ALERT = float(os.getenv("DRIFT_PSI_ALERT", "0.25"))
+
+# Proporção mínima de uma faixa no PSI (evita log de zero)
+_EPSILON = 1e-4
+
+# Coeficiente do valor crítico do KS para duas amostras com alfa = 0,05
+_KS_ALPHA_005 = 1.358
+
+
+def profile_path(model_path):
+    """Perfil de referência gravado ao lado do artefato (modelo.pkl -> modelo.profile.json)"""
+    return os.path.splitext(model_path)[0] + ".profile.json"
+
+
+def _edges(values, bins):
+    """Limites das faixas: um por valor em features discretas, quantis nas demais"""
+    unique = np.unique(values)
+    if len(unique) <= bins:
+        return ((unique[:-1] + unique[1:]) / 2).tolist()
+    return np.unique(np.quantile(values, np.linspace(0, 1, bins + 1)[1:-1])).tolist()
+
+
+def _histogram(values, edges):
+    return np.bincount(np.searchsorted(edges, values, side="right"), minlength=len(edges) + 1)
+
+
+def build_profile(X, probabilities, feature_names, y=None, bins=10, source=None):
+    """
+    Perfil de referência de um modelo: histogramas de cada feature (na
+    codificação do modelo) e das probabilidades, que devem vir de previsões
+    fora da amostra (fora do fold), como o modelo se comporta em dados novos.
+    Com os rótulos `y`, guarda também a taxa observada de TEA por faixa de
+    probabilidade.
+    """
+    X = np.asarray(X, dtype=np.float64)
+    probabilities = np.asarray(probabilities, dtype=np.float64)
+    features = {}
+    for j, name in enumerate(feature_names):
+        edges = _edges(X[:, j], bins)
+        features[name] = {"edges": edges, "counts": _histogram(X[:, j], edges).tolist()}
+
+    edges = _edges(probabilities, bins)
+    buckets = np.searchsorted(edges, probabilities, side="right")
+    probability = {
+        "edges": edges,
+        "counts": np.bincount(buckets, minlength=len(edges) + 1).tolist(),
+        "mean": float(probabilities.mean()),
+    }
+    if y is not None:
+        y = np.asarray(y, dtype=np.float64)
+        counts = np.bincount(buckets, minlength=len(edges) + 1)
+        positives = np.bincount(buckets, weights=y, minlength=len(edges) + 1)
+        probability["observed_rate"] = (positives / np.maximum(counts, 1)).tolist()
+        probability["positive_rate"] = float(y.mean())
+
+    return {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "source": source,
+        "samples": int(len(X)),
+        "features": features,
+        "probability": probability,
+    }
+
+
+def save_profile(profile, model_path):
+    path = profile_path(model_path)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(profile, f, indent=2)
+    os.replace(tmp, path)
+    return path
+
+
+def psi(expected, actual):
+    """Population Stability Index entre dois histogramas com as mesmas faixas"""
+    expected = np.maximum(expected / expected.sum(), _EPSILON)
+    actual = np.maximum(actual / actual.sum(), _EPSILON)
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+
+def ks(expected, actual):
+    """Estatística de Kolmogorov-Smirnov sobre as distribuições acumuladas das faixas"""
+    return float(np.max(np.abs(np.cumsum(expected / expected.sum()) - np.cumsum(actual / actual.sum()))))
+
+
+def status(value, samples):
+    if samples < MIN_SAMPLES:
+        return "insufficient_data"
+    if value >= PSI_ALERT:
+        return "significant"
+    if value >= PSI_WARN:
+        return "moderate"
+    return "stable"
+
+
+class DriftMonitor:
+    """
+    Histogramas das entradas e das probabilidades do /predict, comparados
+    com o perfil de referência do modelo.
+
+    As faixas são as do perfil, então a memória é fixa: uma linha de
+    contadores por fatia de tempo, em um anel de WINDOW_SLOTS fatias.
+    Registrar uma triagem é uma busca binária por feature e alguns
+    incrementos em listas (mais baratos que indexar arrays do NumPy para
+    uma linha); nada é consultado no banco. Os contadores são por processo.
+    """
+
+    def __init__(self, profile, feature_names, threshold=0.5, slots=WINDOW_SLOTS, slot_seconds=SLOT_SECONDS):
+        missing = [name for name in feature_names if name not in profile["features"]]
+        if missing:
+            raise ValueError(f"Perfil sem as features {', '.join(missing)}")
+
+        self.profile = profile
+        self.feature_names = list(feature_names)
+        self.threshold = threshold
+        self.slots = slots
+        self.slot_seconds = slot_seconds
+
+        # A probabilidade é a última "feature" dos contadores
+        sketches = [profile["features"][name] for name in self.feature_names] + [profile["probability"]]
+        self._edges = [sketch["edges"] for sketch in sketches]
+        self._expected = [np.asarray(sketch["counts"], dtype=np.float64) for sketch in sketches]
+        sizes = [len(edges) + 1 for edges in self._edges]
+        self._offsets = np.concatenate([[0], np.cumsum(sizes)]).astype(np.intp)
+        self._starts = self._offsets[:-1].tolist()
+        self._bins = int(self._offsets[-1])
+
+        self._lock = threading.Lock()
+        self._counts = [[0] * self._bins for _ in range(slots)]
+        self._samples = [0] * slots
+        self._positives = [0] * slots
+        self._probability_sum = [0.0] * slots
+        self._epochs = [-1] * slots
+
+    def _slot(self, now):
+        """Fatia do instante `now`, zerada se ainda guarda uma volta anterior do anel"""
+        epoch = int(now // self.slot_seconds)
+        slot = epoch % self.slots
+        if self._epochs[slot] != epoch:
+            self._counts[slot] = [0] * self._bins
+            self._samples[slot] = 0
+            self._positives[slot] = 0
+            self._probability_sum[slot] = 0.0
+            self._epochs[slot] = epoch
+        return slot
+
+    def observe(self, row, probability):
+        """Registra uma triagem (features na ordem de feature_names)"""
+        index = [
+            start + bisect_right(edges, value)
+            for start, edges, value in zip(self._starts, self._edges, (*row, probability))
+        ]
+        with self._lock:
+            slot = self._slot(time.time())
+            counts = self._counts[slot]
+            for i in index:
+                counts[i] += 1
+            self._samples[slot] += 1
+            self._positives[slot] += probability >= self.threshold
+            self._probability_sum[slot] += probability
+
+    def observe_batch(self, X, probabilities):
+        """Registra um lote de triagens com uma contagem vetorizada por feature"""
+        X = np.asarray(X, dtype=np.float64)
+        probabilities = np.asarray(probabilities, dtype=np.float64)
+        columns = [X[:, j] for j in range(X.shape[1])] + [probabilities]
+        index = np.concatenate([
+            start + np.searchsorted(edges, column, side="right")
+            for start, edges, column in zip(self._starts, self._edges, columns)
+        ])
+        counts = np.bincount(index, minlength=self._bins).tolist()
+        with self._lock:
+            slot = self._slot(time.time())
+            self._counts[slot] = [a + b for a, b in zip(self._counts[slot], counts)]
+            self._samples[slot] += len(probabilities)
+            self._positives[slot] += int((probabilities >= self.threshold).sum())
+            self._probability_sum[slot] += float(probabilities.sum())
+
+    def _window(self):
+        """Contadores somados das fatias dentro da janela"""
+        with self._lock:
+            current = int(time.time() // self.slot_seconds)
+            live = [slot for slot in range(self.slots) if self._epochs[slot] > current - self.slots]
+            return (
+                np.array([self._counts[slot] for slot in live], dtype=np.int64).reshape(-1, self._bins).sum(axis=0),
+                sum(self._samples[slot] for slot in live),
+                sum(self._positives[slot] for slot in live),
+                sum(self._probability_sum[slot] for slot in live),
+                min((self._epochs[slot] for slot in live), default=None),
+            )
+
+    def _compare(self, k, counts, samples):
+        actual = counts[self._offsets[k]:self._offsets[k + 1]].astype(np.float64)
+        expected = self._expected[k]
+        result = {
+            "edges": self._edges[k],
+            "baseline": (expected / expected.sum()).round(4).tolist(),
+            "live": (actual / samples).round(4).tolist() if samples else None,
+            "psi": None,
+            "ks": None,
+            "status": "insufficient_data",
+        }
+        if samples:
+            value = psi(expected, actual)
+            result.update(psi=round(value, 4), ks=round(ks(expected, actual), 4), status=status(value, samples))
+        return result
+
+    def report(self):
+        """Desvio por feature e das probabilidades na janela atual"""
+        counts, samples, positives, probability_sum, first_epoch = self._window()
+        features = {name: self._compare(k, counts, samples) for k, name in enumerate(self.feature_names)}
+        probability = self._compare(len(self.feature_names), counts, samples)
+
+        baseline_samples = self.profile["samples"]
+        ks_critical = (
+            _KS_ALPHA_005 * np.sqrt((samples + baseline_samples) / (samples * baseline_samples))
+            if samples and baseline_samples else None
+        )
+
+        reference = self.profile["probability"]
+        calibration = {
+            "mean_probability": round(probability_sum / samples, 4) if samples else None,
+            "baseline_mean_probability": round(reference["mean"], 4),
+            "positive_rate": round(positives / samples, 4) if samples else None,
+            "baseline_positive_rate": (
+                round(reference["positive_rate"], 4) if "positive_rate" in reference else None
+            ),
+            "estimated_rate": None,
+        }
+        if samples and "observed_rate" in reference:
+            # Taxa de TEA esperada se cada faixa de probabilidade mantiver a
+            # taxa observada na referência; longe de mean_probability indica
+            # tráfego concentrado onde o modelo era mal calibrado
+            live = counts[self._offsets[-2]:self._offsets[-1]] / samples
+            calibration["estimated_rate"] = round(float(np.dot(live, reference["observed_rate"])), 4)
+
+        statuses = [item["status"] for item in [*features.values(), probability]]
+        overall = next(
+            (level for level in ("significant", "moderate", "stable") if level in statuses), "insufficient_data"
+        )
+        return {
+            "status": overall,
+            "window": {
+                "seconds": self.slots * self.slot_seconds,
+                "since": (
+                    datetime.fromtimestamp(first_epoch * self.slot_seconds, timezone.utc).isoformat()
+                    if first_epoch is not None else None
+                ),
+                "samples": samples,
+            },
+            "baseline": {
+                "samples": baseline_samples,
+                "created_at": self.profile.get("created_at"),
+                "source": self.profile.get("source"),
+            },
+            "ks_critical": round(float(ks_critical), 4) if ks_critical is not None else None,
+            "features": features,
+            "probability": probability,
+            "calibration": calibration,
+        }
+
+
+def load(classifier):
+    """Monitor do classificador a partir do perfil ao lado do artefato; None sem perfil válido"""
+    if not DRIFT_MONITOR:
+        return None
+    path = profile_path(classifier.model_path)
+    if not os.path.exists(path):
+        logger.info("Sem perfil de referência em %s; monitor de desvio desativado", path)
+        return None
+    try:
+        with open(path) as f:
+            profile = json.load(f)
+        if profile.get("model_version") != classifier.version:
+            logger.warning(
+                "Perfil %s é da versão %s, não de %s; monitor de desvio desativado",
+                path, profile.get("model_version"), classifier.version,
+            )
+            return None
+        return DriftMonitor(profile, classifier.feature_names, classifier.threshold)
+    except (OSError, ValueError, KeyError):
+        logger.warning("Perfil de referência inválido em %s", path, exc_info=True)
+        return None
+
+
+def observe(classifier, records, probabilities):
+    """Registra triagens já pontuadas no monitor do classificador que as pontuou"""
+    monitor = classifier.drift_monitor
+    if monitor is None or not records:
+        return
+    try:
+        if len(records) == 1:
+            row = classifier.encode_record(records[0], [0.0] * len(classifier.feature_names))
+            monitor.observe(row, probabilities[0])
+        else:
+            X = np.empty((len(records), len(classifier.feature_names)), dtype=np.float64)
+            for i, record in enumerate(records):
+                classifier.encode_record(record, X[i])
+            monitor.observe_batch(X, probabilities)
+    except Exception:
+        # O monitoramento não pode derrubar a predição
+        logger.warning("Falha ao registrar %d triagens no monitor de desvio", len(records), exc_info=True)
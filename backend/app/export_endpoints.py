@@ -0,0 +1,135 @@
+import csv
+import io
+import itertools
+import json
+import os
+import zlib
+from datetime import date, datetime, time, timedelta
+from typing import Optional
+
+from fastapi import APIRouter, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+
+import archive
+from database import SessionLocal, session_timezone
+from schema import Screening, Result
+
+# Linhas buscadas por vez no cursor do servidor; a memória do worker
+# depende deste valor, não do tamanho da tabela
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "5000"))
+
+EXPORT_COLUMNS = [
+    Screening.id.label("screening_id"),
+    Screening.created_at,
+    *[getattr(Screening, f"a{q}_score") for q in range(1, 11)],
+    Screening.age,
+    Screening.gender,
+    Screening.jundice,
+    Screening.autism,
+    Screening.used_app_before,
+    Result.id.label("result_id"),
+    Result.prediction,
+    Result.confidence,
+    Result.model_version,
+]
+FIELDS = [column.key for column in EXPORT_COLUMNS]
+
+MEDIA_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+export_router = APIRouter(prefix="/api", tags=["export"])
+
+
+def export_query(start_date=None, end_date=None, prediction=None):
+    """Triagens com resultado em ordem de created_at (percorre ix_screenings_created_at_id)"""
+    query = select(*EXPORT_COLUMNS).join(Result, Screening.id == Result.screening_id)
+    if start_date is not None:
+        query = query.where(Screening.created_at >= start_date)
+    if end_date is not None:
+        query = query.where(Screening.created_at < end_date + timedelta(days=1))
+    if prediction is not None:
+        query = query.where(Result.prediction == prediction)
+    return query.order_by(Screening.created_at, Screening.id)
+
+
+def archive_range(start_date=None, end_date=None):
+    """
+    Datas inclusivas do filtro como o intervalo [início, fim) usado no
+    arquivo. As datas começam à meia-noite no fuso horário das sessões do
+    banco, como na comparação de created_at com uma data em export_query
+    """
+    tz = session_timezone()
+    start = datetime.combine(start_date, time(), tz) if start_date is not None else None
+    end = datetime.combine(end_date + timedelta(days=1), time(), tz) if end_date is not None else None
+    return start, end
+
+
+def _csv_chunks(partitions):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(FIELDS)
+    for rows in partitions:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue().encode()
+
+
+def _ndjson_chunks(partitions):
+    for rows in partitions:
+        yield "".join(
+            json.dumps(dict(zip(FIELDS, row)), default=str, ensure_ascii=False) + "\n"
+            for row in rows
+        ).encode()
+
+
+def _gzip(chunks):
+    compressor = zlib.compressobj(wbits=31)  # formato gzip
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def stream_export(query, fmt, compress, archive_filters=None):
+    """
+    Gera o arquivo em blocos a partir de um cursor do servidor. A sessão é
+    aberta aqui, e não por dependência, para durar até o fim da resposta.
+    Triagens arquivadas no período (archive_filters) vêm antes, lidas dos
+    arquivos Parquet.
+    """
+    db = SessionLocal()
+    try:
+        archived = archive.export_partitions(db, FIELDS, batch_size=EXPORT_CHUNK_SIZE, **(archive_filters or {}))
+        result = db.execute(query.execution_options(yield_per=EXPORT_CHUNK_SIZE))
+        partitions = itertools.chain(archived, result.partitions())
+        chunks = _csv_chunks(partitions) if fmt == "csv" else _ndjson_chunks(partitions)
+        if compress:
+            chunks = _gzip(chunks)
+        yield from chunks
+    finally:
+        db.close()
+
+
+@export_router.get("/export")
+def export_screenings(
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    prediction: Optional[str] = Query(None, pattern="^(TEA|Sem TEA)$"),
+    gzip: bool = False,
+):
+    """
+    Exporta o histórico de triagens e resultados em CSV ou NDJSON, em
+    streaming (datas inclusivas, pela data de criação da triagem)
+    """
+    query = export_query(start_date, end_date, prediction)
+    start, end = archive_range(start_date, end_date)
+    filename = f"triagens.{format}" + (".gz" if gzip else "")
+    return StreamingResponse(
+        stream_export(query, format, gzip, {"start": start, "end": end, "prediction": prediction}),
+        media_type="application/gzip" if gzip else MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
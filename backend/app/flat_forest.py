@@ -0,0 +1,163 @@
+# flat_forest.py
+import numpy as np
+
+# Linhas avaliadas por vez (limita a memória das matrizes linhas x árvores)
+CHUNK_SIZE = 4096
+
+# Mapeamento entre float64 e int64 que preserva a ordem dos valores finitos
+_SIGN = np.int64(-0x8000000000000000)
+
+
+def _to_ordered(x):
+    bits = np.asarray(x, dtype=np.float64).view(np.int64)
+    return np.where(bits < 0, _SIGN - bits, bits)
+
+
+def _from_ordered(keys):
+    bits = np.where(keys < 0, _SIGN - keys, keys)
+    return bits.astype(np.int64).view(np.float64)
+
+
+def fold_thresholds(thresholds, mean, scale):
+    """
+    Leva limiares do espaço padronizado para o espaço original das features.
+
+    O sklearn decide `float32((x - mean) / scale) <= t`. Essa expressão é
+    monótona em x, então existe um maior float64 x* que ainda vai para a
+    esquerda; ele é encontrado por busca binária na ordem dos float64 e a
+    decisão passa a ser `x <= x*`, idêntica para qualquer entrada finita.
+    """
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+    mean = np.asarray(mean, dtype=np.float64)
+    scale = np.asarray(scale, dtype=np.float64)
+
+    def goes_left(keys):
+        x = _from_ordered(keys)
+        with np.errstate(over='ignore', invalid='ignore'):
+            return ((x - mean) / scale).astype(np.float32) <= thresholds
+
+    finfo = np.finfo(np.float64)
+    lo = np.full(thresholds.shape, _to_ordered(-finfo.max), dtype=np.int64)
+    hi = np.full(thresholds.shape, _to_ordered(finfo.max), dtype=np.int64)
+    always = goes_left(hi)
+    never = ~goes_left(lo)
+
+    # Invariante: goes_left(lo) e não goes_left(hi)
+    active = ~(always | never)
+    while True:
+        # hi - lo pode estourar int64; as formas abaixo não estouram
+        searching = active & (hi - 1 > lo)
+        if not searching.any():
+            break
+        mid = (lo >> 1) + (hi >> 1) + (lo & hi & 1)
+        left = goes_left(mid)
+        lo = np.where(searching & left, mid, lo)
+        hi = np.where(searching & ~left, mid, hi)
+
+    folded = _from_ordered(lo)
+    folded[always] = np.inf
+    folded[never] = -np.inf
+    return folded
+
+
+class FlatForest:
+    """
+    RandomForestClassifier compilado em arrays contíguos de nós.
+
+    Todas as árvores ficam concatenadas em feature, threshold, left, right e
+    value (probabilidade da classe positiva em cada nó), com índices
+    absolutos. As folhas apontam para si mesmas, então as linhas percorrem
+    todas as árvores juntas por max_depth passos, sem desvios.
+    """
+
+    ARRAYS = ('feature', 'threshold', 'left', 'right', 'value', 'roots')
+
+    def __init__(self, feature, threshold, left, right, value, roots, max_depth):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.n_trees = len(roots)
+
+    @classmethod
+    def from_sklearn(cls, model, scaler=None):
+        """Exporta a floresta; com scaler, a padronização é embutida nos limiares"""
+        if model.n_outputs_ != 1 or len(model.classes_) != 2:
+            raise ValueError("Somente classificação binária com uma saída é suportada")
+
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            index = np.arange(tree.node_count)
+            is_leaf = tree.children_left == -1
+
+            # Mesma normalização do DecisionTreeClassifier.predict_proba
+            counts = tree.value[:, 0, :]
+            normalizer = counts.sum(axis=1)
+            normalizer[normalizer == 0.0] = 1.0
+
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+            lefts.append(np.where(is_leaf, index, tree.children_left) + offset)
+            rights.append(np.where(is_leaf, index, tree.children_right) + offset)
+            values.append(counts[:, 1] / normalizer)
+            roots.append(offset)
+            offset += tree.node_count
+            max_depth = max(max_depth, tree.max_depth)
+
+        feature = np.concatenate(features).astype(np.intp)
+        n_features = model.n_features_in_
+        mean = np.zeros(n_features)
+        scale = np.ones(n_features)
+        if scaler is not None:
+            if scaler.with_mean:
+                mean = scaler.mean_
+            if scaler.with_std:
+                scale = scaler.scale_
+
+        # Mesmo sem scaler os limiares são ajustados: o sklearn compara a
+        # entrada convertida para float32
+        threshold = fold_thresholds(np.concatenate(thresholds), mean[feature], scale[feature])
+
+        return cls(
+            feature=feature,
+            threshold=threshold,
+            left=np.concatenate(lefts).astype(np.intp),
+            right=np.concatenate(rights).astype(np.intp),
+            value=np.concatenate(values),
+            roots=np.asarray(roots, dtype=np.intp),
+            max_depth=max_depth,
+        )
+
+    def save(self, path):
+        """Grava os arrays em um .npz sem compressão"""
+        np.savez(path, max_depth=self.max_depth, **{name: getattr(self, name) for name in self.ARRAYS})
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(max_depth=int(data['max_depth']), **{name: data[name] for name in cls.ARRAYS})
+
+    def predict_proba(self, X):
+        """Probabilidade da classe positiva para cada linha de X (features originais)"""
+        X = np.atleast_2d(np.asarray(X, dtype=np.float64))
+        probabilities = np.empty(X.shape[0], dtype=np.float64)
+
+        for start in range(0, X.shape[0], CHUNK_SIZE):
+            chunk = X[start:start + CHUNK_SIZE]
+            rows = np.arange(chunk.shape[0])[:, None]
+            nodes = np.repeat(self.roots[None, :], chunk.shape[0], axis=0)
+            for _ in range(self.max_depth):
+                go_left = chunk[rows, self.feature[nodes]] <= self.threshold[nodes]
+                nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+
+            # Soma sequencial na ordem das árvores, como o predict_proba do sklearn
+            totals = np.cumsum(self.value[nodes], axis=1)[:, -1]
+            probabilities[start:start + CHUNK_SIZE] = totals / self.n_trees
+
+        return probabilities
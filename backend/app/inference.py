@@ -0,0 +1,82 @@
+# inference.py
+import asyncio
+import functools
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+from fastapi import HTTPException
+
+from instrumentation import METRICS_ENABLED, record_stage
+
+# Threads dedicadas ao modelo (o sklearn libera o GIL ao percorrer as árvores)
+MODEL_WORKERS = int(os.getenv("MODEL_WORKERS", "4"))
+
+# Predições simultâneas admitidas por worker antes de aplicar backpressure
+MAX_CONCURRENT_PREDICTIONS = int(os.getenv("MAX_CONCURRENT_PREDICTIONS", "64"))
+
+# Tempo máximo (s) que uma requisição espera por uma vaga antes do 503
+ADMISSION_TIMEOUT = float(os.getenv("ADMISSION_TIMEOUT", "2.0"))
+
+executor = ThreadPoolExecutor(max_workers=MODEL_WORKERS, thread_name_prefix="tea-model")
+
+_slots = asyncio.Semaphore(MAX_CONCURRENT_PREDICTIONS)
+
+
+def _timed_call(fn, args, timings):
+    timings.append(time.perf_counter())
+    try:
+        return fn(*args)
+    finally:
+        timings.append(time.perf_counter())
+
+
+async def run_inference(fn, *args):
+    """Executa uma chamada do modelo no pool, sem bloquear o event loop"""
+    loop = asyncio.get_running_loop()
+    if not METRICS_ENABLED:
+        return await loop.run_in_executor(executor, functools.partial(fn, *args))
+
+    # Espera por uma thread do pool e execução do modelo, medidas separadamente
+    submitted = time.perf_counter()
+    timings = []
+    try:
+        return await loop.run_in_executor(executor, _timed_call, fn, args, timings)
+    finally:
+        if len(timings) == 2:
+            record_stage("model_queue", timings[0] - submitted)
+            record_stage("model", timings[1] - timings[0])
+
+
+@asynccontextmanager
+async def admission():
+    """
+    Limita as predições em andamento. Quando não há vaga dentro de
+    ADMISSION_TIMEOUT a requisição é recusada com 503 e Retry-After.
+    """
+    start = time.perf_counter()
+    try:
+        # asyncio.timeout em vez de wait_for: no 3.11 o wait_for pode expirar
+        # depois de o acquire obter a vaga, que nunca mais seria devolvida
+        async with asyncio.timeout(ADMISSION_TIMEOUT):
+            await _slots.acquire()
+    except TimeoutError:
+        raise HTTPException(
+            status_code=503,
+            detail="Servidor sobrecarregado, tente novamente",
+            headers={"Retry-After": "1"},
+        )
+    record_stage("admission", time.perf_counter() - start)
+    try:
+        yield
+    finally:
+        _slots.release()
+
+
+def available_slots():
+    return _slots._value
+
+
+def shutdown():
+    executor.shutdown(wait=True)
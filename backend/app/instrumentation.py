@@ -0,0 +1,259 @@
+# instrumentation.py
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from starlette.routing import Match
+
+logger = logging.getLogger("tea.instrumentation")
+
+# Histogramas, Server-Timing e /metrics. Desligado, resta só a contagem de
+# consultas do X-DB-Query-Count
+METRICS_ENABLED = os.getenv("TEA_METRICS", "true").lower() == "true"
+
+# Limites (s) dos buckets dos histogramas
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Estado da requisição atual; é um objeto mutável para que as threads do
+# threadpool (que recebem uma cópia do contexto) atualizem o mesmo valor
+_query_counter = ContextVar("query_counter", default=None)
+
+
+class QueryCounter:
+    __slots__ = ("count", "db_seconds", "stages", "route")
+
+    def __init__(self):
+        self.count = 0
+        self.db_seconds = 0.0
+        self.stages = []
+        self.route = None
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def expose(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for label_values, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labels, label_values)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, seconds, *label_values):
+        index = bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                # Contagens por bucket (o último é +Inf), soma
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += seconds
+
+    def expose(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((key, (list(counts), total)) for key, (counts, total) in self._series.items())
+        for label_values, (counts, total) in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                labels = _labels(self.labels + ("le",), label_values + (str(bound),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _labels(self.labels, label_values)
+            lines.append(f"{self.name}_sum{labels} {total}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"') for value in values)
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(names, escaped)) + "}"
+
+
+REQUEST_SECONDS = Histogram("tea_http_request_duration_seconds", "Latência das requisições", ("method", "route", "status"))
+STAGE_SECONDS = Histogram("tea_stage_duration_seconds", "Latência de cada etapa de uma requisição", ("route", "stage"))
+DB_QUERY_SECONDS = Histogram("tea_db_query_duration_seconds", "Duração das consultas ao banco", ("route",))
+DB_QUERIES = Counter("tea_db_queries_total", "Consultas executadas no banco", ("route",))
+CACHE_REQUESTS = Counter("tea_dashboard_cache_requests_total", "Consultas ao cache do dashboard", ("result",))
+
+METRICS = [REQUEST_SECONDS, STAGE_SECONDS, DB_QUERY_SECONDS, DB_QUERIES, CACHE_REQUESTS]
+
+# Funções que retornam {nome: (ajuda, {labels: valor})}, lidas a cada coleta
+_gauge_collectors = []
+
+
+def register_gauges(collector):
+    _gauge_collectors.append(collector)
+
+
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    counter = _query_counter.get()
+    if counter is not None:
+        counter.count += 1
+
+
+def _start_query(conn, cursor, statement, parameters, context, executemany):
+    _count_query(conn, cursor, statement, parameters, context, executemany)
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _end_query(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    counter = _query_counter.get()
+    route = counter.route if counter is not None else "background"
+    if counter is not None:
+        counter.db_seconds += elapsed
+    DB_QUERY_SECONDS.observe(elapsed, route)
+    DB_QUERIES.inc(route)
+
+
+def _abandon_query(context):
+    # Consulta com erro: after_cursor_execute não é chamado
+    starts = context.connection.info.get("query_start") if context.connection is not None else None
+    if starts:
+        starts.pop()
+
+
+def install_query_counter(engine):
+    """Registra a contagem (e, com métricas, a duração) das consultas em uma engine síncrona"""
+    if not METRICS_ENABLED:
+        event.listen(engine, "before_cursor_execute", _count_query)
+        return
+    event.listen(engine, "before_cursor_execute", _start_query)
+    event.listen(engine, "after_cursor_execute", _end_query)
+    event.listen(engine, "handle_error", _abandon_query)
+
+
+@contextmanager
+def _timed_stage(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - start)
+
+
+def record_stage(name, seconds):
+    """Registra uma etapa já medida da requisição atual"""
+    if not METRICS_ENABLED:
+        return
+    counter = _query_counter.get()
+    if counter is not None:
+        counter.stages.append((name, seconds))
+    STAGE_SECONDS.observe(seconds, counter.route if counter is not None else "background", name)
+
+
+_no_stage = nullcontext()
+
+
+def stage(name):
+    """Mede um trecho da requisição (histograma por etapa e Server-Timing)"""
+    return _timed_stage(name) if METRICS_ENABLED else _no_stage
+
+
+def _route_label(request):
+    # Caminho declarado da rota (com {parâmetros}), não o da URL, para
+    # não criar uma série por valor
+    for route in request.app.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            return route.path
+    return "other"
+
+
+def _server_timing(counter, total):
+    entries = [f"db;dur={counter.db_seconds * 1000:.3f};desc=\"{counter.count} consultas\""]
+    entries += [f"{name};dur={seconds * 1000:.3f}" for name, seconds in counter.stages]
+    entries.append(f"total;dur={total * 1000:.3f}")
+    return ", ".join(entries)
+
+
+async def _observe_stream(body, request, counter, start, status):
+    """Repassa o corpo em streaming e registra a requisição quando ele termina"""
+    try:
+        async for chunk in body:
+            yield chunk
+    finally:
+        if METRICS_ENABLED:
+            REQUEST_SECONDS.observe(time.perf_counter() - start, request.method, counter.route, status)
+        logger.debug("%s %s: %d consultas (streaming)", request.method, request.url.path, counter.count)
+
+
+async def query_count_middleware(request, call_next):
+    """
+    Informa no header X-DB-Query-Count quantas consultas a requisição
+    executou; com métricas, registra a latência e envia Server-Timing.
+
+    Respostas sem Content-Length (StreamingResponse: /api/export,
+    /api/dashboard/stream) executam consultas depois que os headers já foram
+    enviados, então não recebem X-DB-Query-Count nem Server-Timing. Essas
+    consultas continuam contadas em tea_db_queries_total com a rota, e a
+    latência da requisição é registrada no fim do corpo.
+    """
+    counter = QueryCounter()
+    token = _query_counter.set(counter)
+    start = time.perf_counter()
+    try:
+        if METRICS_ENABLED:
+            counter.route = _route_label(request)
+        response = await call_next(request)
+    finally:
+        _query_counter.reset(token)
+    # 204 e 304 também não têm Content-Length, mas não têm corpo
+    if "content-length" not in response.headers and response.status_code not in (204, 304):
+        response.body_iterator = _observe_stream(
+            response.body_iterator, request, counter, start, str(response.status_code)
+        )
+        return response
+    response.headers["X-DB-Query-Count"] = str(counter.count)
+    if METRICS_ENABLED:
+        total = time.perf_counter() - start
+        REQUEST_SECONDS.observe(total, request.method, counter.route, str(response.status_code))
+        response.headers["Server-Timing"] = _server_timing(counter, total)
+    logger.debug("%s %s: %d consultas", request.method, request.url.path, counter.count)
+    return response
+
+
+def expose_metrics():
+    """Todas as métricas deste processo no formato de texto do Prometheus"""
+    lines = []
+    for metric in METRICS:
+        lines += metric.expose()
+    for collector in _gauge_collectors:
+        try:
+            gauges = collector()
+        except Exception:
+            logger.exception("Falha ao coletar métricas")
+            continue
+        for name, (help, samples) in gauges.items():
+            lines += [f"# HELP {name} {help}", f"# TYPE {name} gauge"]
+            for labels, value in samples.items():
+                if value is not None:
+                    lines.append(f"{name}{_labels(tuple(k for k, _ in labels), tuple(v for _, v in labels))} {value}")
+    return "\n".join(lines) + "\n"
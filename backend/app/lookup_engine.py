@@ -0,0 +1,213 @@
+# lookup_engine.py
+import os
+import re
+import tempfile
+import threading
+
+import numpy as np
+
+# Limites de idade aceitos pelo PatientInput
+AGE_MIN = 1
+AGE_MAX = 100
+
+_SCORE_FEATURE = re.compile(r'^A\d+_Score$')
+
+
+class LookupTableEngine:
+    """
+    Motor de inferência por tabela pré-computada.
+
+    O espaço de entrada do modelo é finito (respostas binárias do AQ-10,
+    idade entre 1 e 100 e variáveis categóricas codificadas), então cada
+    combinação é indexada por um inteiro empacotado em base mista e a
+    probabilidade da classe positiva fica guardada em um array NumPy.
+
+    Com cache_dir, a tabela completa é gravada em um .npy identificado pela
+    versão (hash) do modelo e, nas cargas seguintes, mapeada em memória somente
+    leitura: os workers compartilham as mesmas páginas do page cache.
+    """
+
+    CHUNK_SIZE = 65536
+
+    def __init__(self, classifier, lazy=False, cache_dir=None):
+        self.classifier = classifier
+        self.feature_names = list(classifier.feature_names)
+        self.lazy = lazy
+
+        self._offsets = []
+        self._radices = []
+        for name in self.feature_names:
+            offset, radix = self._feature_domain(name)
+            self._offsets.append(offset)
+            self._radices.append(radix)
+
+        # Strides da base mista: a última feature varia mais rápido
+        self._strides = [1] * len(self._radices)
+        for i in range(len(self._radices) - 2, -1, -1):
+            self._strides[i] = self._strides[i + 1] * self._radices[i + 1]
+        self.size = self._strides[0] * self._radices[0]
+
+        self._lock = threading.Lock()
+
+        cache_path = None
+        if cache_dir and not lazy:
+            cache_path = os.path.join(cache_dir, f"lookup-{classifier.version}-{self.size}.npy")
+        self.probabilities = self._load(cache_path) if cache_path else None
+
+        if self.probabilities is None:
+            # NaN marca entradas ainda não calculadas (modo lazy)
+            self.probabilities = np.full(self.size, np.nan, dtype=np.float64)
+            if not lazy:
+                self.build()
+                if cache_path:
+                    self.save(cache_path)
+
+    def _feature_domain(self, name):
+        """Retorna (offset, cardinalidade) de uma feature do modelo"""
+        if _SCORE_FEATURE.match(name):
+            return 0, 2
+        if name == 'age':
+            return AGE_MIN, AGE_MAX - AGE_MIN + 1
+        if name.endswith('_encoded'):
+            column = name[:-len('_encoded')]
+            encoder = self.classifier.label_encoders.get(column)
+            if encoder is None:
+                raise ValueError(f"Encoder ausente para a feature: {name}")
+            return 0, len(encoder.classes_)
+        raise ValueError(f"Feature não suportada pela tabela: {name}")
+
+    def _feature_value(self, name, data_dict):
+        """Valor numérico da feature, como produzido por prepare_input"""
+        if name.endswith('_encoded'):
+            column = name[:-len('_encoded')]
+            return self.classifier.encode_category(column, data_dict[column])
+        return int(data_dict[name])
+
+    def pack(self, data_dict):
+        """Converte uma entrada no índice inteiro da tabela"""
+        key = 0
+        for name, offset, radix, stride in zip(
+            self.feature_names, self._offsets, self._radices, self._strides
+        ):
+            digit = self._feature_value(name, data_dict) - offset
+            if not 0 <= digit < radix:
+                raise ValueError(f"Valor fora do domínio da tabela: {name}")
+            key += digit * stride
+        return key
+
+    def unpack(self, keys):
+        """Reconstrói a matriz de features a partir dos índices"""
+        keys = np.asarray(keys, dtype=np.int64)
+        X = np.empty((keys.shape[0], len(self.feature_names)), dtype=np.float64)
+        for i, (offset, radix, stride) in enumerate(
+            zip(self._offsets, self._radices, self._strides)
+        ):
+            X[:, i] = (keys // stride) % radix + offset
+        return X
+
+    def _load(self, path):
+        """Mapeia a tabela gravada, se existir e tiver o tamanho esperado"""
+        if not os.path.exists(path):
+            return None
+        table = np.load(path, mmap_mode='r')
+        if table.shape != (self.size,) or table.dtype != np.float64:
+            return None
+        return table
+
+    def save(self, path):
+        """Grava a tabela de forma atômica (workers concorrentes não leem arquivo parcial)"""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.save(f, self.probabilities)
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def _score(self, keys):
+        """Executa o scaler e o modelo sklearn para um conjunto de índices"""
+        import pandas as pd
+
+        X = pd.DataFrame(self.unpack(keys), columns=self.feature_names)
+        return self.classifier.model.predict_proba(self.classifier.scaler.transform(X))[:, 1]
+
+    def build(self):
+        """Enumera todo o espaço de entrada e preenche a tabela"""
+        for start in range(0, self.size, self.CHUNK_SIZE):
+            keys = np.arange(start, min(start + self.CHUNK_SIZE, self.size))
+            self.probabilities[keys] = self._score(keys)
+
+    def lookup(self, data_dict):
+        """Retorna a probabilidade da classe positiva em O(1)"""
+        key = self.pack(data_dict)
+        probability = self.probabilities[key]
+        if np.isnan(probability):
+            with self._lock:
+                probability = self.probabilities[key] = self._score([key])[0]
+        return float(probability)
+
+    def lookup_matrix(self, X):
+        """Versão vetorizada de lookup para uma matriz de features"""
+        digits = np.asarray(X, dtype=np.int64) - np.asarray(self._offsets, dtype=np.int64)
+        if np.any(digits < 0) or np.any(digits >= np.asarray(self._radices)):
+            raise ValueError("Valor fora do domínio da tabela")
+        keys = digits @ np.asarray(self._strides, dtype=np.int64)
+
+        missing = keys[np.isnan(self.probabilities[keys])]
+        if missing.size:
+            missing = np.unique(missing)
+            with self._lock:
+                self.probabilities[missing] = self._score(missing)
+
+        return self.probabilities[keys]
+
+    def verify(self, sample_size=None, seed=0):
+        """
+        Confere a tabela contra um caminho de inferência diferente do que a
+        montou (scaler + predict_proba do sklearn em lote).
+
+        Sem sample_size, todas as entradas preenchidas são recalculadas em lote
+        pela floresta achatada (flat_forest), que percorre os arrays das árvores
+        com os limiares levados ao espaço original, sem o scaler. Com
+        sample_size, uma amostra é recalculada pelo caminho de uma linha por vez
+        (prepare_input e predict_proba do sklearn). Retorna o número de
+        divergências (comparação exata, bit a bit).
+        """
+        filled = np.flatnonzero(~np.isnan(self.probabilities))
+
+        if sample_size is None:
+            from flat_forest import FlatForest
+
+            forest = self.classifier.flat_forest or FlatForest.from_sklearn(
+                self.classifier.model, self.classifier.scaler
+            )
+            mismatches = 0
+            for start in range(0, filled.shape[0], self.CHUNK_SIZE):
+                keys = filled[start:start + self.CHUNK_SIZE]
+                expected = forest.predict_proba(self.unpack(keys))
+                mismatches += int(np.count_nonzero(expected != self.probabilities[keys]))
+            return mismatches
+
+        rng = np.random.default_rng(seed)
+        keys = rng.choice(filled, size=min(sample_size, filled.shape[0]), replace=False)
+        mismatches = 0
+        for key in keys:
+            row = self.classifier.prepare_input(self._to_dict(key))
+            proba = self.classifier.model.predict_proba(self.classifier.scaler.transform(row))[0, 1]
+            if proba != self.probabilities[key]:
+                mismatches += 1
+        return mismatches
+
+    def _to_dict(self, key):
+        """Entrada equivalente ao PatientInput para um índice da tabela"""
+        data = {}
+        for name, value in zip(self.feature_names, self.unpack([key])[0]):
+            if name.endswith('_encoded'):
+                column = name[:-len('_encoded')]
+                data[column] = self.classifier.decode_category(column, int(value))
+            else:
+                data[name] = int(value)
+        return data
@@ -0,0 +1,87 @@
+"""Esquema inicial (tabelas criadas antes das migrações)
+
+Bancos criados pelo antigo Base.metadata.create_all já têm estas tabelas,
+então cada uma só é criada se ainda não existir.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.sql import func
+
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+SCHEMA = "tea_screening"
+
+
+def _score_columns(nullable):
+    return [sa.Column(f"a{i}_score", sa.Integer, nullable=nullable) for i in range(1, 11)]
+
+
+def _create_if_missing(name, *columns):
+    if not sa.inspect(op.get_bind()).has_table(name, schema=SCHEMA):
+        op.create_table(name, *columns, schema=SCHEMA)
+
+
+def upgrade():
+    _create_if_missing(
+        "training_data",
+        sa.Column("id", sa.Integer, primary_key=True, index=True),
+        *_score_columns(nullable=True),
+        sa.Column("age", sa.Integer),
+        sa.Column("gender", sa.String(50)),
+        sa.Column("ethnicity", sa.String(100)),
+        sa.Column("jundice", sa.String(10)),
+        sa.Column("autism", sa.String(10)),
+        sa.Column("country_of_res", sa.String(100)),
+        sa.Column("used_app_before", sa.String(10)),
+        sa.Column("result", sa.Integer),
+        sa.Column("age_desc", sa.String(50)),
+        sa.Column("relation", sa.String(50)),
+        sa.Column("class_asd", sa.String(10)),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=func.now()),
+    )
+    _create_if_missing(
+        "screenings",
+        sa.Column("id", sa.Integer, primary_key=True, index=True),
+        *_score_columns(nullable=False),
+        sa.Column("age", sa.Integer, nullable=False),
+        sa.Column("gender", sa.String(50), nullable=False),
+        sa.Column("jundice", sa.String(10), nullable=False),
+        sa.Column("autism", sa.String(10), nullable=False),
+        sa.Column("used_app_before", sa.String(10), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=func.now()),
+    )
+    _create_if_missing(
+        "results",
+        sa.Column("id", sa.Integer, primary_key=True, index=True),
+        sa.Column("screening_id", sa.Integer, sa.ForeignKey(f"{SCHEMA}.screenings.id"), nullable=False),
+        sa.Column("prediction", sa.String(50), nullable=False),
+        sa.Column("confidence", sa.Float),
+        sa.Column("model_version", sa.String(50)),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=func.now()),
+    )
+    _create_if_missing(
+        "dashboard_rollups",
+        sa.Column("day", sa.Date, primary_key=True),
+        sa.Column("age_bucket", sa.String(10), primary_key=True),
+        sa.Column("gender", sa.String(50), primary_key=True),
+        sa.Column("jundice", sa.String(10), primary_key=True),
+        sa.Column("autism", sa.String(10), primary_key=True),
+        sa.Column("prediction", sa.String(50), primary_key=True),
+        sa.Column("screenings", sa.Integer, nullable=False),
+        sa.Column("confidence_sum", sa.Float, nullable=False),
+        sa.Column("age_sum", sa.BigInteger, nullable=False),
+        *[sa.Column(f"a{i}_sum", sa.Integer, nullable=False) for i in range(1, 11)],
+    )
+
+
+def downgrade():
+    for name in ("dashboard_rollups", "results", "screenings", "training_data"):
+        op.drop_table(name, schema=SCHEMA)
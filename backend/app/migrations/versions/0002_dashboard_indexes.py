@@ -0,0 +1,45 @@
+"""Índices para os padrões de acesso do dashboard e de /recent-screenings
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+SCHEMA = "tea_screening"
+
+
+def upgrade():
+    op.create_index(
+        "ix_screenings_created_at_id", "screenings", ["created_at", "id"],
+        schema=SCHEMA, if_not_exists=True,
+        postgresql_include=["age", "gender", "jundice", "autism"],
+    )
+    op.create_index(
+        "ix_screenings_age_gender", "screenings", ["age", "gender"],
+        schema=SCHEMA, if_not_exists=True,
+        postgresql_include=["id"],
+    )
+    # Falha se já houver mais de um resultado para a mesma triagem
+    op.create_index(
+        "ux_results_screening_id", "results", ["screening_id"],
+        schema=SCHEMA, unique=True, if_not_exists=True,
+        postgresql_include=["prediction", "confidence"],
+    )
+    op.create_index(
+        "ix_results_prediction", "results", ["prediction"],
+        schema=SCHEMA, if_not_exists=True,
+        postgresql_include=["screening_id", "confidence"],
+    )
+
+
+def downgrade():
+    for name in ("ix_results_prediction", "ux_results_screening_id",
+                 "ix_screenings_age_gender", "ix_screenings_created_at_id"):
+        op.drop_index(name, schema=SCHEMA, if_exists=True)
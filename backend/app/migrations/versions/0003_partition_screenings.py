@@ -0,0 +1,127 @@
+"""Particionamento mensal opcional de screenings por created_at
+
+Só é aplicado quando pedido explicitamente:
+
+    alembic -x partition_screenings=true upgrade head
+
+Sem o argumento a revisão é registrada sem alterar nada; para particionar
+depois, voltar para 0002 e subir novamente com o argumento.
+
+Em uma tabela particionada a chave primária precisa incluir created_at e o
+PostgreSQL não permite FK apontando só para screenings.id, então a FK de
+results.screening_id é removida (a relação continua declarada no ORM).
+Novas partições são criadas por tea_screening.ensure_screening_partitions,
+chamada por scripts/ensure_partitions.py; linhas fora das partições
+existentes vão para screenings_default.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17
+
+"""
+from alembic import context, op
+
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+SCHEMA = "tea_screening"
+
+# Meses futuros criados junto com a conversão
+MONTHS_AHEAD = 3
+
+ENSURE_PARTITIONS_FUNCTION = f"""
+CREATE OR REPLACE FUNCTION {SCHEMA}.ensure_screening_partitions(first_month date, months_ahead integer)
+RETURNS integer LANGUAGE plpgsql AS $$
+DECLARE
+    month date := date_trunc('month', first_month)::date;
+    last_month date := (date_trunc('month', now()) + make_interval(months => months_ahead))::date;
+    partition_name text;
+    created integer := 0;
+BEGIN
+    WHILE month <= last_month LOOP
+        partition_name := format('screenings_%s', to_char(month, 'YYYY_MM'));
+        IF to_regclass(format('{SCHEMA}.%I', partition_name)) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE {SCHEMA}.%I PARTITION OF {SCHEMA}.screenings FOR VALUES FROM (%L) TO (%L)',
+                partition_name, month, (month + interval '1 month')::date
+            );
+            created := created + 1;
+        END IF;
+        month := (month + interval '1 month')::date;
+    END LOOP;
+    RETURN created;
+END $$;
+"""
+
+SCREENING_INDEXES = [
+    f"CREATE INDEX ix_screenings_created_at_id ON {SCHEMA}.screenings (created_at, id) "
+    f"INCLUDE (age, gender, jundice, autism)",
+    f"CREATE INDEX ix_screenings_age_gender ON {SCHEMA}.screenings (age, gender) INCLUDE (id)",
+]
+
+
+def _is_partitioned():
+    return op.get_bind().exec_driver_sql(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table "
+        f"WHERE partrelid = to_regclass('{SCHEMA}.screenings'))"
+    ).scalar()
+
+
+def upgrade():
+    enabled = context.get_x_argument(as_dictionary=True).get("partition_screenings", "false")
+    if enabled.lower() != "true" or _is_partitioned():
+        return
+
+    op.execute(f"ALTER TABLE {SCHEMA}.results DROP CONSTRAINT IF EXISTS results_screening_id_fkey")
+
+    # Tabela atual sai do caminho, com constraint e índices renomeados/removidos
+    op.execute(f"ALTER TABLE {SCHEMA}.screenings RENAME TO screenings_unpartitioned")
+    op.execute(f"ALTER TABLE {SCHEMA}.screenings_unpartitioned "
+               f"RENAME CONSTRAINT screenings_pkey TO screenings_unpartitioned_pkey")
+    op.execute(f"DROP INDEX IF EXISTS {SCHEMA}.ix_screenings_created_at_id")
+    op.execute(f"DROP INDEX IF EXISTS {SCHEMA}.ix_screenings_age_gender")
+    op.execute(f"UPDATE {SCHEMA}.screenings_unpartitioned SET created_at = now() WHERE created_at IS NULL")
+
+    op.execute(f"CREATE TABLE {SCHEMA}.screenings "
+               f"(LIKE {SCHEMA}.screenings_unpartitioned INCLUDING DEFAULTS) "
+               f"PARTITION BY RANGE (created_at)")
+    op.execute(f"ALTER TABLE {SCHEMA}.screenings ALTER COLUMN created_at SET NOT NULL")
+    op.execute(f"ALTER TABLE {SCHEMA}.screenings ADD CONSTRAINT screenings_pkey PRIMARY KEY (id, created_at)")
+    op.execute(f"ALTER SEQUENCE {SCHEMA}.screenings_id_seq OWNED BY {SCHEMA}.screenings.id")
+    op.execute(f"CREATE INDEX ix_screenings_id ON {SCHEMA}.screenings (id)")
+    for statement in SCREENING_INDEXES:
+        op.execute(statement)
+
+    op.execute(ENSURE_PARTITIONS_FUNCTION)
+    op.execute(
+        f"SELECT {SCHEMA}.ensure_screening_partitions("
+        f"COALESCE((SELECT min(created_at) FROM {SCHEMA}.screenings_unpartitioned), now())::date, "
+        f"{MONTHS_AHEAD})"
+    )
+    op.execute(f"CREATE TABLE {SCHEMA}.screenings_default PARTITION OF {SCHEMA}.screenings DEFAULT")
+
+    op.execute(f"INSERT INTO {SCHEMA}.screenings SELECT * FROM {SCHEMA}.screenings_unpartitioned")
+    op.execute(f"DROP TABLE {SCHEMA}.screenings_unpartitioned")
+
+
+def downgrade():
+    if not _is_partitioned():
+        return
+
+    op.execute(f"CREATE TABLE {SCHEMA}.screenings_unpartitioned "
+               f"(LIKE {SCHEMA}.screenings INCLUDING DEFAULTS)")
+    op.execute(f"INSERT INTO {SCHEMA}.screenings_unpartitioned SELECT * FROM {SCHEMA}.screenings")
+    op.execute(f"ALTER SEQUENCE {SCHEMA}.screenings_id_seq OWNED BY {SCHEMA}.screenings_unpartitioned.id")
+    op.execute(f"DROP TABLE {SCHEMA}.screenings")
+    op.execute(f"DROP FUNCTION IF EXISTS {SCHEMA}.ensure_screening_partitions(date, integer)")
+
+    op.execute(f"ALTER TABLE {SCHEMA}.screenings_unpartitioned RENAME TO screenings")
+    op.execute(f"ALTER TABLE {SCHEMA}.screenings ALTER COLUMN created_at DROP NOT NULL")
+    op.execute(f"ALTER TABLE {SCHEMA}.screenings ADD CONSTRAINT screenings_pkey PRIMARY KEY (id)")
+    op.execute(f"CREATE INDEX ix_tea_screening_screenings_id ON {SCHEMA}.screenings (id)")
+    for statement in SCREENING_INDEXES:
+        op.execute(statement)
+    op.execute(f"ALTER TABLE {SCHEMA}.results ADD CONSTRAINT results_screening_id_fkey "
+               f"FOREIGN KEY (screening_id) REFERENCES {SCHEMA}.screenings (id)")
@@ -0,0 +1,35 @@
+"""Origem de cada linha de training_data, para cargas idempotentes
+
+Cada linha guarda o arquivo de origem e o número da linha nele; o índice
+único permite que scripts/populate_training_data.py retome uma carga
+interrompida e repita cargas sem duplicar linhas.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+SCHEMA = "tea_screening"
+
+
+def upgrade():
+    op.add_column("training_data", sa.Column("source", sa.String(255)), schema=SCHEMA)
+    op.add_column("training_data", sa.Column("source_row", sa.BigInteger), schema=SCHEMA)
+    op.create_index(
+        "ux_training_data_source_row", "training_data", ["source", "source_row"],
+        schema=SCHEMA, unique=True, if_not_exists=True,
+    )
+
+
+def downgrade():
+    op.drop_index("ux_training_data_source_row", schema=SCHEMA, if_exists=True)
+    op.drop_column("training_data", "source_row", schema=SCHEMA)
+    op.drop_column("training_data", "source", schema=SCHEMA)
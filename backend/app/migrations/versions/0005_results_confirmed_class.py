@@ -0,0 +1,28 @@
+"""Diagnóstico confirmado de uma triagem, usado como rótulo no retreino
+
+results.confirmed_class (YES/NO) é preenchido após a avaliação
+especializada; scripts/train_model.py usa essas triagens junto com
+training_data.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+SCHEMA = "tea_screening"
+
+
+def upgrade():
+    op.add_column("results", sa.Column("confirmed_class", sa.String(10)), schema=SCHEMA)
+
+
+def downgrade():
+    op.drop_column("results", "confirmed_class", schema=SCHEMA)
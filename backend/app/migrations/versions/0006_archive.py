@@ -0,0 +1,59 @@
+"""Arquivo de triagens antigas em Parquet
+
+archive_segments registra os arquivos gravados por
+scripts/archive_screenings.py; archived_rollups guarda os contadores das
+triagens arquivadas, para que o recálculo das rollups não as perca.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.sql import func
+
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+SCHEMA = "tea_screening"
+
+
+def upgrade():
+    op.create_table(
+        "archive_segments",
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("path", sa.String(500), nullable=False, unique=True),
+        sa.Column("month", sa.Date, nullable=False),
+        sa.Column("rows", sa.Integer, nullable=False),
+        sa.Column("min_created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("max_created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("archived_at", sa.DateTime(timezone=True), server_default=func.now()),
+        schema=SCHEMA,
+    )
+    op.create_index(
+        "ix_archive_segments_created_at", "archive_segments", ["min_created_at", "max_created_at"],
+        schema=SCHEMA,
+    )
+    op.create_table(
+        "archived_rollups",
+        sa.Column("day", sa.Date, primary_key=True),
+        sa.Column("age_bucket", sa.String(10), primary_key=True),
+        sa.Column("gender", sa.String(50), primary_key=True),
+        sa.Column("jundice", sa.String(10), primary_key=True),
+        sa.Column("autism", sa.String(10), primary_key=True),
+        sa.Column("prediction", sa.String(50), primary_key=True),
+        sa.Column("screenings", sa.Integer, nullable=False),
+        sa.Column("confidence_sum", sa.Float, nullable=False),
+        sa.Column("age_sum", sa.BigInteger, nullable=False),
+        *[sa.Column(f"a{i}_sum", sa.Integer, nullable=False) for i in range(1, 11)],
+        schema=SCHEMA,
+    )
+
+
+def downgrade():
+    op.drop_table("archived_rollups", schema=SCHEMA)
+    op.drop_index("ix_archive_segments_created_at", "archive_segments", schema=SCHEMA)
+    op.drop_table("archive_segments", schema=SCHEMA)
@@ -0,0 +1,56 @@
+"""Faixa de confiança na chave das rollups
+
+dashboard_rollups e archived_rollups ganham confidence_bucket, e
+/api/dashboard/confidence-distribution passa a ser respondido pelas
+rollups, inclusive para as triagens arquivadas, sem ler os arquivos
+Parquet. As linhas existentes ficam na faixa 0 (sem faixa) até o
+recálculo; depois desta migração rodar:
+
+    python -m scripts.archive_screenings --rebuild-rollups   (se houver arquivo)
+    python -m scripts.backfill_rollups
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+SCHEMA = "tea_screening"
+
+TABLES = ("dashboard_rollups", "archived_rollups")
+KEY_COLUMNS = ["day", "age_bucket", "gender", "jundice", "autism", "prediction"]
+
+
+def upgrade():
+    for table in TABLES:
+        op.add_column(
+            table,
+            sa.Column("confidence_bucket", sa.SmallInteger, nullable=False, server_default="0"),
+            schema=SCHEMA,
+        )
+        op.drop_constraint(f"{table}_pkey", table, schema=SCHEMA)
+        op.create_primary_key(f"{table}_pkey", table, KEY_COLUMNS + ["confidence_bucket"], schema=SCHEMA)
+
+
+def downgrade():
+    sums = ["screenings", "confidence_sum", "age_sum"] + [f"a{i}_sum" for i in range(1, 11)]
+    for table in TABLES:
+        # Junta as faixas de cada chave antes de voltar à chave antiga
+        op.execute(f"""
+            CREATE TEMP TABLE merged AS
+            SELECT {", ".join(KEY_COLUMNS)}, {", ".join(f"sum({column}) AS {column}" for column in sums)}
+            FROM {SCHEMA}.{table} GROUP BY {", ".join(KEY_COLUMNS)}
+        """)
+        op.execute(f"DELETE FROM {SCHEMA}.{table}")
+        op.drop_constraint(f"{table}_pkey", table, schema=SCHEMA)
+        op.drop_column(table, "confidence_bucket", schema=SCHEMA)
+        op.execute(f"INSERT INTO {SCHEMA}.{table} SELECT * FROM merged")
+        op.execute("DROP TABLE merged")
+        op.create_primary_key(f"{table}_pkey", table, KEY_COLUMNS, schema=SCHEMA)
@@ -0,0 +1,246 @@
+# model_registry.py
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from classifier_tea import TEAClassifier
+
+logger = logging.getLogger("tea.model_registry")
+
+# Artefato do modelo servido pela API. Para publicar uma nova versão sem
+# reiniciar, substitua o arquivo com um rename atômico (ou troque o symlink)
+MODEL_PATH = os.getenv("TEA_MODEL_PATH", "models/tea_model_optimized.pkl")
+
+# Intervalo (s) entre verificações do artefato para recarga automática; 0 desativa
+WATCH_INTERVAL = float(os.getenv("TEA_MODEL_WATCH_INTERVAL", "30"))
+
+# Modelo sombra: avaliado em uma fração das predições, fora do caminho da
+# requisição, apenas para comparação com o modelo ativo
+SHADOW_MODEL_PATH = os.getenv("TEA_SHADOW_MODEL_PATH") or None
+SHADOW_SAMPLE_RATE = float(os.getenv("TEA_SHADOW_SAMPLE_RATE", "0.1"))
+
+# Lotes sombra aguardando execução; acima disso as amostras são descartadas
+SHADOW_MAX_PENDING = int(os.getenv("TEA_SHADOW_MAX_PENDING", "32"))
+
+
+class ShadowStats:
+    """Concordância entre o modelo sombra e o ativo nas amostras avaliadas"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.samples = 0
+        self.agreements = 0
+        self.abs_diff_sum = 0.0
+        self.max_abs_diff = 0.0
+        self.dropped = 0
+        self.errors = 0
+
+    def record(self, primary, shadow):
+        diff = abs(primary['probability'] - shadow['probability'])
+        with self._lock:
+            self.samples += 1
+            self.agreements += primary['prediction'] == shadow['prediction']
+            self.abs_diff_sum += diff
+            self.max_abs_diff = max(self.max_abs_diff, diff)
+
+    def add(self, field, count=1):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + count)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "samples": self.samples,
+                "agreement_rate": round(self.agreements / self.samples, 4) if self.samples else None,
+                "mean_abs_diff": round(self.abs_diff_sum / self.samples, 6) if self.samples else None,
+                "max_abs_diff": round(self.max_abs_diff, 6),
+                "dropped": self.dropped,
+                "errors": self.errors,
+            }
+
+
+def describe(classifier, loaded_at):
+    if classifier is None:
+        return None
+    return {
+        "version": classifier.version,
+        "model_type": classifier.model_type,
+        "path": classifier.model_path,
+        "engine": classifier.engine,
+        "drift_monitor": classifier.drift_monitor is not None,
+        "loaded_at": loaded_at,
+    }
+
+
+class ModelRegistry:
+    """
+    Mantém o modelo ativo (e o sombra) do processo.
+
+    Novas versões são carregadas em segundo plano e publicadas trocando uma
+    única referência: requisições em andamento terminam com o modelo que
+    obtiveram, as seguintes já usam o novo, sem reinício nem requisição
+    perdida.
+    """
+
+    def __init__(self, path, shadow_path=None, sample_rate=0.0):
+        self.path = path
+        self.shadow_path = shadow_path
+        self.sample_rate = sample_rate
+
+        self._active = None
+        self._active_loaded_at = None
+        self._shadow = None
+        self._shadow_loaded_at = None
+        self._load_lock = threading.Lock()
+
+        self._stop = threading.Event()
+        self._watcher = None
+        self._shadow_executor = None
+        self._shadow_pending = 0
+        self._pending_lock = threading.Lock()
+        self.shadow_stats = ShadowStats()
+
+    def get(self):
+        """Modelo ativo, carregado na primeira chamada"""
+        active = self._active
+        if active is None:
+            with self._load_lock:
+                if self._active is None:
+                    self._active = TEAClassifier(self.path)
+                    self._active_loaded_at = time.time()
+                active = self._active
+        return active
+
+    def reload(self):
+        """
+        Recarrega o artefato de self.path e troca o modelo ativo se a versão
+        mudou. Retorna True quando houve troca.
+        """
+        with self._load_lock:
+            classifier = TEAClassifier(self.path)
+            previous = self._active
+            if previous is not None and previous.version == classifier.version:
+                return False
+            self._active = classifier
+            self._active_loaded_at = time.time()
+
+        logger.info(
+            "Modelo ativo trocado: %s -> %s",
+            previous.version if previous is not None else None, classifier.version,
+        )
+        return True
+
+    def start(self):
+        """Carrega os modelos e inicia a verificação do artefato e o executor sombra"""
+        self.get()
+        if self.shadow_path and self.sample_rate > 0:
+            self._shadow = TEAClassifier(self.shadow_path)
+            self._shadow_loaded_at = time.time()
+            self._shadow_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tea-shadow")
+        if WATCH_INTERVAL > 0:
+            self._stop.clear()
+            self._watcher = threading.Thread(target=self._watch, name="tea-model-watcher", daemon=True)
+            self._watcher.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._shadow_executor is not None:
+            self._shadow_executor.shutdown(wait=False, cancel_futures=True)
+
+    def _watch(self):
+        """Recarrega o modelo quando o arquivo do artefato muda"""
+        last_seen = self._stat()
+        while not self._stop.wait(WATCH_INTERVAL):
+            current = self._stat()
+            if current is None or current == last_seen:
+                continue
+            try:
+                self.reload()
+                last_seen = current
+            except Exception:
+                # Arquivo incompleto ou inválido: mantém o modelo atual e tenta de novo
+                logger.exception("Falha ao recarregar o modelo de %s", self.path)
+
+    def _stat(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+    def shadow(self, records, results):
+        """
+        Agenda o modelo sombra para uma amostra das predições já respondidas.
+        Não bloqueia: se a fila estiver cheia, a amostra é descartada.
+        """
+        if self._shadow_executor is None:
+            return
+        sampled = [
+            (record, result) for record, result in zip(records, results)
+            if 'error' not in result and random.random() < self.sample_rate
+        ]
+        if not sampled:
+            return
+
+        with self._pending_lock:
+            if self._shadow_pending >= SHADOW_MAX_PENDING:
+                self.shadow_stats.add("dropped", len(sampled))
+                return
+            self._shadow_pending += 1
+        try:
+            self._shadow_executor.submit(self._run_shadow, self._shadow, sampled)
+        except RuntimeError:
+            # Executor encerrado durante o shutdown
+            self._done_shadow()
+
+    def _run_shadow(self, shadow, sampled):
+        try:
+            shadow_results = shadow.predict_batch([record for record, _ in sampled])
+            for (record, primary), result in zip(sampled, shadow_results):
+                if 'error' in result:
+                    self.shadow_stats.add("errors")
+                    continue
+                self.shadow_stats.record(primary, result)
+                if primary['prediction'] != result['prediction']:
+                    logger.debug(
+                        "Divergência sombra %s vs ativo %s: %.4f vs %.4f",
+                        shadow.version, primary.get('model_version'),
+                        result['probability'], primary['probability'],
+                    )
+        except Exception:
+            logger.exception("Falha na avaliação do modelo sombra")
+            self.shadow_stats.add("errors", len(sampled))
+        finally:
+            self._done_shadow()
+
+    def _done_shadow(self):
+        with self._pending_lock:
+            self._shadow_pending -= 1
+
+    def status(self):
+        return {
+            "active": describe(self._active, self._active_loaded_at),
+            "shadow": describe(self._shadow, self._shadow_loaded_at),
+            "shadow_sample_rate": self.sample_rate if self._shadow is not None else 0.0,
+            "shadow_stats": self.shadow_stats.snapshot() if self._shadow is not None else None,
+            "watch_interval": WATCH_INTERVAL,
+        }
+
+
+registry = ModelRegistry(MODEL_PATH, SHADOW_MODEL_PATH, SHADOW_SAMPLE_RATE)
+
+
+def get_classifier():
+    """
+    Classificador ativo do processo, carregado na primeira chamada.
+
+    Importar a aplicação (scripts, Alembic, --reload) não carrega o modelo;
+    quem precisa de uma predição consistente guarda a referência retornada.
+    """
+    return registry.get()
@@ -0,0 +1,21 @@
+from fastapi import APIRouter, HTTPException
+
+from model_registry import get_classifier
+
+monitoring_router = APIRouter(prefix="/api/monitoring", tags=["monitoring"])
+
+
+@monitoring_router.get("/drift")
+def get_drift():
+    """
+    Desvio das entradas e das probabilidades do modelo ativo em relação ao
+    perfil de referência (PSI e KS por feature), na janela recente deste worker
+    """
+    classifier = get_classifier()
+    if classifier.drift_monitor is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Sem perfil de referência para o modelo {classifier.version} "
+                   "(gere com scripts.build_drift_profile) ou DRIFT_MONITOR=false",
+        )
+    return {"model_version": classifier.version, **classifier.drift_monitor.report()}
@@ -0,0 +1,194 @@
+# response_cache.py
+import asyncio
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from fastapi import Request, Response
+from fastapi.routing import APIRoute
+
+from instrumentation import CACHE_REQUESTS, METRICS_ENABLED
+
+# Backend do cache: 'memory' (LRU por processo), 'redis' ou 'off'
+CACHE_BACKEND = os.getenv("DASHBOARD_CACHE", "memory").lower()
+
+# Tempo máximo (s) que uma resposta fica em cache. É também o limite de
+# defasagem entre workers quando o backend é por processo
+CACHE_TTL = float(os.getenv("DASHBOARD_CACHE_TTL", "30"))
+
+CACHE_MAX_ENTRIES = int(os.getenv("DASHBOARD_CACHE_MAX_ENTRIES", "256"))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+
+class MemoryCache:
+    """
+    LRU em memória com TTL. A invalidação só incrementa a geração: entradas
+    de gerações anteriores deixam de ser encontradas e saem pelo LRU.
+    """
+
+    # Operações em memória: podem rodar direto no event loop
+    blocking = False
+
+    def __init__(self, ttl, max_entries):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def generation(self):
+        return self._generation
+
+    def get(self, key, generation):
+        with self._lock:
+            entry = self._entries.get((generation, key))
+            if entry is None:
+                return None
+            expires_at, body, etag = entry
+            if expires_at < time.monotonic():
+                del self._entries[(generation, key)]
+                return None
+            self._entries.move_to_end((generation, key))
+            return body, etag
+
+    def set(self, key, generation, body, etag):
+        with self._lock:
+            # Invalidado enquanto o handler rodava: a resposta pode ser anterior à escrita
+            if generation != self._generation:
+                return
+            self._entries[(generation, key)] = (time.monotonic() + self.ttl, body, etag)
+            self._entries.move_to_end((generation, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+
+
+class RedisCache:
+    """
+    Cache compartilhado entre workers em qualquer servidor compatível com o
+    protocolo Redis. Recebe o cliente pronto, então um substituto local com a
+    mesma interface (get/set/incr) pode ser usado no lugar.
+    """
+
+    PREFIX = "tea:dashboard:"
+
+    # redis-py é síncrono: no event loop as chamadas vão para uma thread
+    blocking = True
+
+    def __init__(self, client, ttl):
+        self.client = client
+        self.ttl = ttl
+
+    @classmethod
+    def from_url(cls, url, ttl):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("DASHBOARD_CACHE=redis requer o pacote 'redis' (pip install redis)")
+        return cls(redis.Redis.from_url(url), ttl)
+
+    def generation(self):
+        return int(self.client.get(self.PREFIX + "generation") or 0)
+
+    def _key(self, key, generation):
+        return f"{self.PREFIX}{generation}:{key}"
+
+    def get(self, key, generation):
+        value = self.client.get(self._key(key, generation))
+        if value is None:
+            return None
+        etag, body = value.split(b"\n", 1)
+        return body, etag.decode()
+
+    def set(self, key, generation, body, etag):
+        # Invalidado enquanto o handler rodava. Se a invalidação vier logo após
+        # esta leitura, a entrada fica na geração antiga e nunca é encontrada
+        if generation != self.generation():
+            return
+        self.client.set(self._key(key, generation), etag.encode() + b"\n" + body, ex=max(1, int(self.ttl)))
+
+    def invalidate(self):
+        self.client.incr(self.PREFIX + "generation")
+
+
+def create_cache():
+    if CACHE_BACKEND == "off":
+        return None
+    if CACHE_BACKEND == "redis":
+        return RedisCache.from_url(REDIS_URL, CACHE_TTL)
+    if CACHE_BACKEND == "memory":
+        return MemoryCache(CACHE_TTL, CACHE_MAX_ENTRIES)
+    raise ValueError(f"Backend de cache desconhecido: {CACHE_BACKEND}")
+
+
+cache = create_cache()
+
+
+def invalidate():
+    """Chamado após cada escrita de triagens"""
+    if cache is not None:
+        cache.invalidate()
+
+
+async def _call(fn, *args):
+    """Executa uma operação do cache sem bloquear o event loop"""
+    if cache.blocking:
+        return await asyncio.to_thread(fn, *args)
+    return fn(*args)
+
+
+async def invalidate_async():
+    """invalidate() para handlers async"""
+    if cache is not None:
+        await _call(cache.invalidate)
+
+
+def _etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+class CachedRoute(APIRoute):
+    """
+    Rota que serve GETs a partir do cache, chaveados por caminho e parâmetros
+    de query, com ETag e resposta 304 para If-None-Match. Em um acerto o
+    handler não roda, então nenhuma sessão de banco é aberta. A geração é lida
+    antes do handler: uma resposta calculada durante uma invalidação não é
+    guardada.
+    """
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def cached_handler(request: Request) -> Response:
+            if cache is None or request.method != "GET":
+                return await handler(request)
+
+            key = request.url.path + "?" + "&".join(sorted(str(request.query_params).split("&")))
+            generation = await _call(cache.generation)
+            entry = await _call(cache.get, key, generation)
+            if METRICS_ENABLED:
+                CACHE_REQUESTS.inc("miss" if entry is None else "hit")
+            if entry is None:
+                response = await handler(request)
+                if response.status_code != 200:
+                    return response
+                body = bytes(response.body)
+                etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+                await _call(cache.set, key, generation, body, etag)
+            else:
+                body, etag = entry
+
+            headers = {"ETag": etag, "Cache-Control": "no-cache"}
+            if _etag_matches(request.headers.get("if-none-match"), etag):
+                return Response(status_code=304, headers=headers)
+            return Response(content=body, media_type="application/json", headers=headers)
+
+        return cached_handler
@@ -0,0 +1,209 @@
+# rollups.py
+import os
+from bisect import bisect_right
+
+from sqlalchemy import Float, case, cast, delete, func, insert, select, text, union_all
+from sqlalchemy.dialects.postgresql import ARRAY, array, insert as pg_insert
+
+from database import session_timezone
+from schema import ArchivedRollup, DashboardRollup, Result, Screening
+
+# Com rollups desligadas o /predict não as atualiza e o dashboard lê as tabelas brutas.
+# Ao ligar em uma base existente, rodar antes: python -m scripts.backfill_rollups
+USE_ROLLUPS = os.getenv("DASHBOARD_ROLLUPS", "true").lower() == "true"
+
+AGE_RANGES = [
+    ("0-5", 0, 5),
+    ("6-12", 6, 12),
+    ("13-17", 13, 17),
+    ("18-25", 18, 25),
+    ("26-35", 26, 35),
+    ("36-50", 36, 50),
+    ("51+", 51, 150)
+]
+
+CONFIDENCE_RANGES = [
+    ("Muito Baixa", 0.0, 0.5),
+    ("Baixa", 0.5, 0.7),
+    ("Média", 0.7, 0.85),
+    ("Alta", 0.85, 0.95),
+    ("Muito Alta", 0.95, 1.0)
+]
+# Limites para o width_bucket: faixa i quando limite[i-1] <= confiança < limite[i];
+# 0 e len(limites) ficam fora das faixas
+CONFIDENCE_BOUNDS = [min_conf for _, min_conf, _ in CONFIDENCE_RANGES] + [CONFIDENCE_RANGES[-1][2]]
+
+KEY_COLUMNS = ["day", "age_bucket", "gender", "jundice", "autism", "prediction", "confidence_bucket"]
+SCORE_COLUMNS = [f"a{i}_score" for i in range(1, 11)]
+SUM_COLUMNS = ["screenings", "confidence_sum", "age_sum"] + [f"a{i}_sum" for i in range(1, 11)]
+
+
+def age_bucket(age):
+    """Faixa etária do dashboard para uma idade"""
+    for label, min_age, max_age in AGE_RANGES:
+        if min_age <= age <= max_age:
+            return label
+    return AGE_RANGES[-1][0]
+
+
+def age_bucket_expression(age_column):
+    """Mesma classificação de age_bucket, como expressão SQL"""
+    return case(
+        *[(age_column.between(min_age, max_age), label) for label, min_age, max_age in AGE_RANGES],
+        else_=AGE_RANGES[-1][0]
+    )
+
+
+def confidence_bucket(confidence):
+    """Faixa de confiança (1 a 5) como o width_bucket do PostgreSQL; 0 ou 6 fora das faixas"""
+    return bisect_right(CONFIDENCE_BOUNDS, confidence) if confidence is not None else 0
+
+
+def confidence_bucket_expression(confidence_column):
+    """Mesma classificação de confidence_bucket, como expressão SQL"""
+    # float8[] para comparar em ponto flutuante, como o bisect
+    bounds = cast(array(CONFIDENCE_BOUNDS), ARRAY(Float))
+    return func.coalesce(func.width_bucket(confidence_column, bounds), 0)
+
+
+def confidence_range(confidence):
+    """Nome da faixa de confiança do dashboard; None fora das faixas"""
+    bucket = confidence_bucket(confidence)
+    return CONFIDENCE_RANGES[bucket - 1][0] if 1 <= bucket <= len(CONFIDENCE_RANGES) else None
+
+
+def day(created_at):
+    """Dia da rollup de uma triagem: date(created_at) no fuso horário das sessões do banco"""
+    return created_at.astimezone(session_timezone()).date()
+
+
+def rollup_rows(entries):
+    """
+    Agrega as triagens de uma transação por chave da rollup.
+
+    `entries` é uma lista de (valores da triagem, predição, confiança), com os
+    valores no formato das colunas de Screening. O dia é o CURRENT_DATE da
+    transação, o mesmo que o server_default de created_at produz.
+    """
+    deltas = {}
+    for values, prediction, confidence in entries:
+        key = (
+            age_bucket(values["age"]), values["gender"], values["jundice"], values["autism"], prediction,
+            confidence_bucket(confidence),
+        )
+        delta = deltas.setdefault(key, dict.fromkeys(SUM_COLUMNS, 0))
+        delta["screenings"] += 1
+        delta["confidence_sum"] += confidence or 0
+        delta["age_sum"] += values["age"]
+        for i, column in enumerate(SCORE_COLUMNS, start=1):
+            delta[f"a{i}_sum"] += values[column]
+
+    # Ordem fixa das chaves evita deadlock entre transações concorrentes
+    return [
+        dict(zip(KEY_COLUMNS[1:], key), day=func.current_date(), **deltas[key])
+        for key in sorted(deltas)
+    ]
+
+
+def upsert_statement(entries):
+    """INSERT ... ON CONFLICT que soma os deltas às linhas existentes"""
+    stmt = pg_insert(DashboardRollup).values(rollup_rows(entries))
+    table = DashboardRollup.__table__
+    return stmt.on_conflict_do_update(
+        index_elements=KEY_COLUMNS,
+        set_={column: table.c[column] + stmt.excluded[column] for column in SUM_COLUMNS}
+    )
+
+
+def screening_values(screening):
+    """Valores das colunas de uma instância de Screening"""
+    return {
+        column: getattr(screening, column)
+        for column in SCORE_COLUMNS + ["age", "gender", "jundice", "autism"]
+    }
+
+
+def aggregate_select(*where):
+    """
+    Linhas da rollup calculadas a partir de screenings + results, com o dia
+    vindo de created_at. Os filtros opcionais restringem as triagens somadas.
+    """
+    key_expressions = [
+        func.date(Screening.created_at),
+        age_bucket_expression(Screening.age),
+        Screening.gender,
+        Screening.jundice,
+        Screening.autism,
+        Result.prediction,
+        confidence_bucket_expression(Result.confidence),
+    ]
+    return select(
+        *[expression.label(name) for expression, name in zip(key_expressions, KEY_COLUMNS)],
+        func.count(Screening.id).label("screenings"),
+        func.coalesce(func.sum(Result.confidence), 0).label("confidence_sum"),
+        func.sum(Screening.age).label("age_sum"),
+        *[func.sum(getattr(Screening, column)).label(f"a{i}_sum") for i, column in enumerate(SCORE_COLUMNS, start=1)]
+    ).join(
+        Result, Screening.id == Result.screening_id
+    ).where(*where).group_by(*key_expressions)
+
+
+def history_select():
+    """
+    Rollups de todo o histórico: as tabelas quentes mais os contadores das
+    triagens já movidas para o arquivo (archived_rollups)
+    """
+    table = ArchivedRollup.__table__
+    combined = union_all(
+        aggregate_select(),
+        select(*[table.c[column] for column in KEY_COLUMNS + SUM_COLUMNS]),
+    ).subquery()
+    keys = [combined.c[column] for column in KEY_COLUMNS]
+    return select(*keys, *[func.sum(combined.c[column]) for column in SUM_COLUMNS]).group_by(*keys)
+
+
+def upsert_from_screenings(screening_ids):
+    """
+    Soma às rollups as triagens já gravadas com os ids informados. Usado pela
+    gravação assíncrona (write_behind.py), em que created_at vem da aplicação
+    e o dia da rollup é o de created_at, como no recálculo.
+    """
+    return _accumulate(DashboardRollup, aggregate_select(Screening.id.in_(screening_ids)))
+
+
+def archive_statement(*where):
+    """
+    Soma a archived_rollups as triagens selecionadas pelos filtros, antes de
+    elas serem removidas das tabelas quentes (archive.py)
+    """
+    return _accumulate(ArchivedRollup, aggregate_select(*where))
+
+
+def _accumulate(model, source):
+    stmt = pg_insert(model).from_select(KEY_COLUMNS + SUM_COLUMNS, source)
+    table = model.__table__
+    return stmt.on_conflict_do_update(
+        index_elements=KEY_COLUMNS,
+        set_={column: table.c[column] + stmt.excluded[column] for column in SUM_COLUMNS}
+    )
+
+
+def backfill(db):
+    """
+    Recalcula todas as rollups a partir de screenings + results e dos
+    contadores das triagens arquivadas.
+
+    A tabela fica travada em modo EXCLUSIVE durante o recálculo: predições
+    concorrentes esperam e somam seus deltas depois, sem contagem dupla.
+    """
+    table = DashboardRollup.__table__
+    schema = db.connection().schema_for_object(table)
+    # Recálculo de manutenção: não fica sujeito ao statement_timeout da API
+    db.execute(text("SET LOCAL statement_timeout = 0"))
+    db.execute(text(f"LOCK TABLE {schema}.{table.name} IN EXCLUSIVE MODE"))
+    db.execute(delete(DashboardRollup))
+
+    source = history_select()
+    inserted = db.execute(insert(DashboardRollup).from_select(KEY_COLUMNS + SUM_COLUMNS, source)).rowcount
+    db.commit()
+    return inserted
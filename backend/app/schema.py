@@ -1,12 +1,16 @@
 # schema.py
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, Text, ForeignKey
+from sqlalchemy import Column, Integer, BigInteger, SmallInteger, String, Float, Date, DateTime, Boolean, Text, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database import Base
 
 class TrainingData(Base):
     __tablename__ = "training_data"
-    __table_args__ = {"schema": "tea_screening"}
+    __table_args__ = (
+        # Arquivo e linha de origem: cargas repetidas ou retomadas não duplicam linhas
+        Index("ux_training_data_source_row", "source", "source_row", unique=True),
+        {"schema": "tea_screening"},
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     a1_score = Column(Integer)
@@ -30,11 +34,20 @@ class TrainingData(Base):
     age_desc = Column(String(50))
     relation = Column(String(50))
     class_asd = Column(String(10))
+    source = Column(String(255))
+    source_row = Column(BigInteger)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
 class Screening(Base):
     __tablename__ = "screenings"
-    __table_args__ = {"schema": "tea_screening"}
+    __table_args__ = (
+        # Janelas de tempo e listagens ordenadas por data (cobre o dashboard sem ler a tabela)
+        Index("ix_screenings_created_at_id", "created_at", "id",
+              postgresql_include=["age", "gender", "jundice", "autism"]),
+        # Filtros por faixa etária e gênero
+        Index("ix_screenings_age_gender", "age", "gender", postgresql_include=["id"]),
+        {"schema": "tea_screening"},
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     a1_score = Column(Integer, nullable=False)
@@ -54,10 +67,19 @@ class Screening(Base):
     used_app_before = Column(String(10), nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+    # Traz id e created_at no próprio INSERT ... RETURNING
+    __mapper_args__ = {"eager_defaults": True}
+
 
 class Result(Base):
     __tablename__ = "results"
-    __table_args__ = {"schema": "tea_screening"}
+    __table_args__ = (
+        # Um resultado por triagem; cobre o JOIN com screenings
+        Index("ux_results_screening_id", "screening_id", unique=True,
+              postgresql_include=["prediction", "confidence"]),
+        Index("ix_results_prediction", "prediction", postgresql_include=["screening_id", "confidence"]),
+        {"schema": "tea_screening"},
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     # screening_id = Column(Integer, nullable=False)
@@ -65,6 +87,73 @@ class Result(Base):
     prediction = Column(String(50), nullable=False)
     confidence = Column(Float)
     model_version = Column(String(50))
+    # Diagnóstico confirmado (YES/NO) após avaliação especializada; rótulo do retreino
+    confirmed_class = Column(String(10))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
-    screening = relationship("Screening", backref="results")
\ No newline at end of file
+    screening = relationship("Screening", backref="results")
+
+    __mapper_args__ = {"eager_defaults": True}
+
+
+class RollupColumns:
+    """Chave (dia, perfil e faixa de confiança da triagem) e somas de uma linha de rollup"""
+
+    day = Column(Date, primary_key=True)
+    age_bucket = Column(String(10), primary_key=True)
+    gender = Column(String(50), primary_key=True)
+    jundice = Column(String(10), primary_key=True)
+    autism = Column(String(10), primary_key=True)
+    prediction = Column(String(50), primary_key=True)
+    # width_bucket da confiança com rollups.CONFIDENCE_BOUNDS; 0 ou 6 fora das faixas
+    confidence_bucket = Column(SmallInteger, primary_key=True, default=0)
+
+    screenings = Column(Integer, nullable=False, default=0)
+    confidence_sum = Column(Float, nullable=False, default=0)
+    age_sum = Column(BigInteger, nullable=False, default=0)
+    a1_sum = Column(Integer, nullable=False, default=0)
+    a2_sum = Column(Integer, nullable=False, default=0)
+    a3_sum = Column(Integer, nullable=False, default=0)
+    a4_sum = Column(Integer, nullable=False, default=0)
+    a5_sum = Column(Integer, nullable=False, default=0)
+    a6_sum = Column(Integer, nullable=False, default=0)
+    a7_sum = Column(Integer, nullable=False, default=0)
+    a8_sum = Column(Integer, nullable=False, default=0)
+    a9_sum = Column(Integer, nullable=False, default=0)
+    a10_sum = Column(Integer, nullable=False, default=0)
+
+
+class DashboardRollup(RollupColumns, Base):
+    """
+    Contadores agregados por dia e perfil da triagem, mantidos pelo /predict
+    na mesma transação do resultado (ver rollups.py)
+    """
+    __tablename__ = "dashboard_rollups"
+    __table_args__ = {"schema": "tea_screening"}
+
+
+class ArchivedRollup(RollupColumns, Base):
+    """
+    Contadores das triagens movidas para o arquivo (ver archive.py). O
+    recálculo das rollups soma estas linhas às das tabelas quentes.
+    """
+    __tablename__ = "archived_rollups"
+    __table_args__ = {"schema": "tea_screening"}
+
+
+class ArchiveSegment(Base):
+    """Arquivo Parquet com triagens removidas das tabelas quentes"""
+    __tablename__ = "archive_segments"
+    __table_args__ = (
+        Index("ix_archive_segments_created_at", "min_created_at", "max_created_at"),
+        {"schema": "tea_screening"},
+    )
+
+    id = Column(Integer, primary_key=True)
+    # Relativo a ARCHIVE_DIR
+    path = Column(String(500), nullable=False, unique=True)
+    month = Column(Date, nullable=False)
+    rows = Column(Integer, nullable=False)
+    min_created_at = Column(DateTime(timezone=True), nullable=False)
+    max_created_at = Column(DateTime(timezone=True), nullable=False)
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())
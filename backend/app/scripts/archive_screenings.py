@@ -0,0 +1,93 @@
+"""
+Move triagens antigas das tabelas quentes para arquivos Parquet.
+
+Cada mês completo anterior ao horizonte (ARCHIVE_HORIZON_DAYS) vira um
+arquivo compactado em ARCHIVE_DIR/screenings/month=AAAA-MM/, registrado em
+archive_segments; as linhas saem de screenings/results na mesma transação
+e seus contadores são somados a archived_rollups. O dashboard continua
+completo pelas rollups; /api/export lê os arquivos quando o período os
+alcança.
+
+Com --rebuild-rollups nada é arquivado: archived_rollups é recalculada a
+partir dos arquivos e, em seguida, as rollups do dashboard (necessário
+quando a chave das rollups muda, como na migração 0007).
+
+Triagens com diagnóstico confirmado (results.confirmed_class) não são
+arquivadas: continuam disponíveis para o retreino.
+
+Deve rodar periodicamente (por exemplo, uma vez por mês via cron); uma
+execução interrompida pode ser repetida.
+
+Uso (a partir de backend/app):
+    python -m scripts.archive_screenings
+    python -m scripts.archive_screenings --horizon-days 180 --dry-run
+    python -m scripts.archive_screenings --rebuild-rollups
+"""
+import argparse
+import sys
+import time
+
+from sqlalchemy import func, select
+
+import archive
+from database import SessionLocal, engine
+import rollups
+from schema import Screening
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--horizon-days', type=int, default=archive.ARCHIVE_HORIZON_DAYS,
+                        help='idade mínima (dias) das triagens arquivadas')
+    parser.add_argument('--dry-run', action='store_true', help='só lista os meses e as triagens a arquivar')
+    parser.add_argument('--rebuild-rollups', action='store_true',
+                        help='recalcula archived_rollups a partir dos arquivos e as rollups do dashboard')
+    args = parser.parse_args()
+
+    if not rollups.USE_ROLLUPS:
+        # Sem rollups os KPIs e distribuições leem só as tabelas quentes
+        sys.exit("O arquivamento requer DASHBOARD_ROLLUPS=true")
+
+    with engine.connect() as lock:
+        if not archive.try_lock(lock):
+            sys.exit("Outro arquivamento está em andamento")
+
+        if args.rebuild_rollups:
+            start = time.perf_counter()
+            with SessionLocal() as db:
+                archived = archive.rebuild_rollups(db)
+            with SessionLocal() as db:
+                rows = rollups.backfill(db)
+            print(f"{archived} linhas em archived_rollups e {rows} em dashboard_rollups "
+                  f"({time.perf_counter() - start:.1f}s)")
+            return
+
+        with SessionLocal() as db:
+            months = archive.months_to_archive(db, args.horizon_days)
+            if args.dry_run:
+                for month in months:
+                    start, end = archive.month_range(month)
+                    count = db.scalar(select(func.count()).select_from(Screening).where(
+                        Screening.created_at >= start, Screening.created_at < end
+                    ))
+                    print(f"{month:%Y-%m}: {count} triagens")
+                return
+            removed = archive.remove_orphans(db)
+            if removed:
+                print(f"{removed} arquivos órfãos removidos")
+
+        total = 0
+        start = time.perf_counter()
+        for month in months:
+            month_start = time.perf_counter()
+            # Uma sessão por mês: o isolamento REPEATABLE READ vale para a transação inteira
+            with SessionLocal() as db:
+                rows = archive.archive_month(db, month)
+            total += rows
+            print(f"{month:%Y-%m}: {rows} triagens arquivadas em {time.perf_counter() - month_start:.1f}s")
+
+    print(f"{total} triagens arquivadas em {len(months)} meses ({time.perf_counter() - start:.1f}s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,24 @@
+"""
+Recalcula a tabela dashboard_rollups a partir do histórico de triagens.
+
+Uso (a partir de backend/app):
+    python -m scripts.backfill_rollups
+"""
+import time
+
+from database import SessionLocal
+import rollups
+
+
+def main():
+    start = time.perf_counter()
+    db = SessionLocal()
+    try:
+        rows = rollups.backfill(db)
+    finally:
+        db.close()
+    print(f"{rows} linhas de rollup geradas em {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""
+Benchmark das explicações por predição (tree_explainer).
+
+Confere que base_value + soma das contribuições reproduz a probabilidade
+do sklearn em cada linha e imprime a latência mediana e o p99 por lote.
+
+Uso (a partir de backend/app):
+    python -m scripts.bench_explain
+    python -m scripts.bench_explain --batch-sizes 1 100 10000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from classifier_tea import TEAClassifier
+from scripts.bench_flat_forest import random_features
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default='models/tea_model_optimized.pkl')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 100, 10000])
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    classifier = TEAClassifier(args.model)
+    explainer = classifier.explainer
+    if explainer is None:
+        raise SystemExit("Explicações desativadas (TEA_EXPLANATIONS=false) ou modelo sem árvores")
+    print(f"{explainer.forest.n_trees} árvores, {len(explainer.delta)} nós, "
+          f"profundidade {explainer.forest.max_depth}, base_value {explainer.base_value:.4f}")
+
+    rng = np.random.default_rng(args.seed)
+    print(f"\n{'lote':>8} {'p50 (ms)':>10} {'p99 (ms)':>10} {'µs/linha':>9} {'máx |dif|':>10}")
+    for size in args.batch_sizes:
+        X = random_features(classifier, size, rng)
+        expected = classifier.model.predict_proba(classifier.scale(X))[:, 1]
+        difference = float(np.max(np.abs(
+            explainer.base_value + explainer.contributions(X).sum(axis=1) - expected
+        )))
+        if difference > 1e-9:
+            raise SystemExit(f"Contribuições não somam a probabilidade (dif {difference}) no lote de {size}")
+
+        repeats = max(3, min(1000, 200000 // max(size, 1)))
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            explainer.contributions(X)
+            timings.append(time.perf_counter() - start)
+        p50, p99 = np.percentile(timings, [50, 99]) * 1000
+        print(f"{size:>8} {p50:>10.3f} {p99:>10.3f} {p50 * 1000 / size:>9.1f} {difference:>10.1e}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""
+Benchmark da floresta achatada (flat_forest) contra o sklearn.
+
+Para cada tamanho de lote, confere que as probabilidades coincidem com
+scaler + predict_proba do sklearn e imprime as latências medianas.
+Opcionalmente grava os arrays exportados em um .npz.
+
+Uso (a partir de backend/app):
+    python -m scripts.bench_flat_forest --batch-sizes 1 100 100000
+    python -m scripts.bench_flat_forest --export models/tea_model_flat.npz
+"""
+import argparse
+import time
+
+import numpy as np
+
+from classifier_tea import TEAClassifier
+from flat_forest import FlatForest
+from lookup_engine import AGE_MIN, AGE_MAX
+
+
+def random_features(classifier, n, rng):
+    """Matriz de features (já codificadas) no domínio aceito pela API"""
+    columns = []
+    for name in classifier.feature_names:
+        if name == 'age':
+            columns.append(rng.integers(AGE_MIN, AGE_MAX + 1, n))
+        elif name.endswith('_encoded'):
+            encoder = classifier.label_encoders[name[:-len('_encoded')]]
+            columns.append(rng.integers(0, len(encoder.classes_), n))
+        else:
+            columns.append(rng.integers(0, 2, n))
+    return np.column_stack(columns).astype(np.float64)
+
+
+def median_ms(fn, X, repeats):
+    fn(X)
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn(X)
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings)) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default='models/tea_model_optimized.pkl')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 100, 100000])
+    parser.add_argument('--export', default=None, help='grava a floresta achatada neste .npz')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    classifier = TEAClassifier(args.model)
+    start = time.perf_counter()
+    forest = FlatForest.from_sklearn(classifier.model, classifier.scaler)
+    print(f"exportação: {forest.n_trees} árvores, {forest.left.shape[0]} nós, "
+          f"profundidade {forest.max_depth}, {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    if args.export:
+        forest.save(args.export)
+        forest = FlatForest.load(args.export)
+        print(f"gravado em {args.export}")
+
+    def sklearn_proba(X):
+        return classifier.model.predict_proba(classifier.scale(X))[:, 1]
+
+    rng = np.random.default_rng(args.seed)
+    print(f"\n{'lote':>8} {'sklearn (ms)':>13} {'flat (ms)':>10} {'ganho':>7} {'máx |dif|':>10}")
+    for size in args.batch_sizes:
+        X = random_features(classifier, size, rng)
+        difference = float(np.max(np.abs(forest.predict_proba(X) - sklearn_proba(X))))
+        if difference > 1e-12:
+            raise SystemExit(f"Divergência de {difference} no lote de {size}")
+
+        repeats = max(3, min(500, 200000 // max(size, 1)))
+        sklearn_ms = median_ms(sklearn_proba, X, repeats)
+        flat_ms = median_ms(forest.predict_proba, X, repeats)
+        print(f"{size:>8} {sklearn_ms:>13.3f} {flat_ms:>10.3f} {sklearn_ms / flat_ms:>6.1f}x {difference:>10.1e}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Micro-benchmark de TEAClassifier.predict.
+
+Compara o caminho antigo (DataFrame + LabelEncoder + predict e predict_proba
+separados) com o caminho atual e imprime as latências p50/p99.
+
+Uso (a partir de backend/app):
+    python -m scripts.bench_predict --iterations 2000
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+
+from classifier_tea import TEAClassifier
+
+
+def random_patient(rng):
+    patient = {f'A{i}_Score': rng.randint(0, 1) for i in range(1, 11)}
+    patient.update(
+        age=rng.randint(1, 100),
+        gender=rng.choice('mf'),
+        jundice=rng.choice(['yes', 'no']),
+        autism=rng.choice(['yes', 'no']),
+        used_app_before=rng.choice(['yes', 'no']),
+    )
+    return patient
+
+
+def legacy_predict(classifier, data_dict):
+    """Caminho de predição anterior, reproduzido para comparação"""
+    X = classifier.prepare_input(data_dict)
+    x_scaled = classifier.scaler.transform(X)
+    prediction = classifier.model.predict(x_scaled)[0]
+    probability = classifier.model.predict_proba(x_scaled)[0, 1]
+    return prediction, probability
+
+
+def measure(fn, patients, warmup=50):
+    for patient in patients[:warmup]:
+        fn(patient)
+
+    timings = np.empty(len(patients))
+    for i, patient in enumerate(patients):
+        start = time.perf_counter()
+        fn(patient)
+        timings[i] = time.perf_counter() - start
+    return timings * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default='models/tea_model_optimized.pkl')
+    parser.add_argument('--iterations', type=int, default=2000)
+    parser.add_argument('--engine', default='sklearn')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    patients = [random_patient(rng) for _ in range(args.iterations)]
+    classifier = TEAClassifier(args.model, engine=args.engine)
+
+    # As duas versões devem concordar antes de medir
+    for patient in patients[:200]:
+        _, legacy_probability = legacy_predict(classifier, patient)
+        assert classifier.predict(patient)['probability'] == float(legacy_probability)
+
+    print(f"{'caminho':<10} {'p50 (ms)':>10} {'p99 (ms)':>10} {'média (ms)':>12}")
+    for label, fn in [
+        ('antes', lambda p: legacy_predict(classifier, p)),
+        ('depois', classifier.predict),
+    ]:
+        timings = measure(fn, patients)
+        print(f"{label:<10} {np.percentile(timings, 50):>10.3f} "
+              f"{np.percentile(timings, 99):>10.3f} {timings.mean():>12.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,259 @@
+"""
+Suíte de benchmarks: micro-benchmarks do classificador e carga HTTP na API.
+
+Etapas:
+
+1. micro: latência de TEAClassifier.prepare_input e TEAClassifier.predict
+   (mesmos pacientes aleatórios de scripts.bench_predict);
+2. carga: para cada endpoint (/predict, /stats, /recent-screenings e todos
+   os /api/dashboard/*), `--concurrency` clientes com conexão keep-alive
+   fazem requisições durante `--duration` segundos;
+3. com --sizes, o banco configurado é completado com triagens sintéticas
+   até cada tamanho (scripts.synthetic_data) antes de repetir a carga, com
+   rollups recalculadas e ANALYZE. Como isso grava no banco da API, exige
+   --yes; use um banco de teste.
+
+O relatório (JSON) traz vazão e p50/p95/p99 por etapa. Com --baseline, é
+comparado com um relatório anterior: p99 acima ou vazão abaixo da
+tolerância contam como regressão e o script termina com código 1.
+
+Uso (a partir de backend/app):
+    python -m scripts.bench_suite --output bench.json
+    python -m scripts.bench_suite --sizes 10000 1000000 10000000 --yes --output bench.json
+    python -m scripts.bench_suite --baseline bench.json --tolerance 0.2
+"""
+import argparse
+import http.client
+import json
+import platform
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from scripts.bench_predict import measure, random_patient
+
+
+def summarize(timings_ms, seconds, errors=0):
+    """Vazão e percentis de uma lista de latências (ms)"""
+    timings = np.asarray(timings_ms)
+    if not len(timings):
+        return {"requests": 0, "errors": errors, "rps": 0.0, "p50_ms": None, "p95_ms": None, "p99_ms": None}
+    p50, p95, p99 = np.percentile(timings, [50, 95, 99])
+    return {
+        "requests": int(len(timings)),
+        "errors": errors,
+        "rps": round(len(timings) / seconds, 1),
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3),
+    }
+
+
+def micro_benchmarks(model, iterations, seed):
+    from classifier_tea import TEAClassifier
+
+    rng = random.Random(seed)
+    patients = [random_patient(rng) for _ in range(iterations)]
+    classifier = TEAClassifier(model)
+
+    report = {}
+    for name, fn in [("prepare_input", classifier.prepare_input), ("predict", classifier.predict)]:
+        timings = measure(fn, patients)
+        report[name] = summarize(timings, timings.sum() / 1000)
+    return report
+
+
+def http_targets(seed):
+    """(nome, método, caminho, gerador de corpo) de cada endpoint medido"""
+    from dashboard_endpoints import dashboard_router
+
+    rng = random.Random(seed)
+    targets = [
+        ("POST /predict", "POST", "/predict", lambda: json.dumps(random_patient(rng))),
+        ("GET /stats", "GET", "/stats", None),
+        ("GET /recent-screenings", "GET", "/recent-screenings?limit=20", None),
+    ]
+    for route in dashboard_router.routes:
+        targets.append((f"GET {route.path}", "GET", route.path, None))
+    return targets
+
+
+def load_test(url, method, path, body, concurrency, duration):
+    """Requisições em laço por `concurrency` threads durante `duration` segundos"""
+    parts = urlsplit(url)
+    timings = [[] for _ in range(concurrency)]
+    errors = [0] * concurrency
+    headers = {"Content-Type": "application/json"} if body else {}
+    barrier = threading.Barrier(concurrency + 1)
+    deadline = None
+
+    def worker(index):
+        connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+        barrier.wait()
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                connection.request(method, path, body=body() if body else None, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                ok = response.status < 400
+            except (OSError, http.client.HTTPException):
+                # Reabre a conexão e segue; a requisição conta como erro
+                connection.close()
+                connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+                ok = False
+            if ok:
+                timings[index].append((time.perf_counter() - start) * 1000)
+            else:
+                errors[index] += 1
+        connection.close()
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    deadline = time.perf_counter() + duration
+    start = time.perf_counter()
+    barrier.wait()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return summarize([t for worker_timings in timings for t in worker_timings], elapsed, sum(errors))
+
+
+def run_http(args, targets):
+    report = {}
+    for name, method, path, body in targets:
+        result = load_test(args.url, method, path, body, args.concurrency, args.duration)
+        report[name] = result
+        print(f"  {name:<44} {result['rps']:>9.1f} req/s  p50 {result['p50_ms'] or 0:>8.2f}  "
+              f"p95 {result['p95_ms'] or 0:>8.2f}  p99 {result['p99_ms'] or 0:>8.2f} ms  "
+              f"{result['errors']} erros", file=sys.stderr)
+    return report
+
+
+def grow_database(size, days):
+    """Completa tea_screening.screenings com triagens sintéticas até `size`"""
+    from sqlalchemy import func, select, text
+    from sqlalchemy.orm import Session
+
+    from database import engine
+    import rollups
+    from schema import Screening
+    from scripts import synthetic_data
+
+    with Session(engine) as db:
+        existing = db.scalar(select(func.count()).select_from(Screening))
+    if existing < size:
+        def progress(last, elapsed):
+            print(f"  {last:,} triagens ({elapsed:.0f}s)", file=sys.stderr)
+
+        synthetic_data.seed(engine, Screening.__table__.schema, size, days, progress=progress, first_row=existing + 1)
+        with Session(engine) as db:
+            rollups.backfill(db)
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text(f"ANALYZE {Screening.__table__.schema}.screenings"))
+            conn.execute(text(f"ANALYZE {Screening.__table__.schema}.results"))
+    return max(existing, size)
+
+
+def compare(report, baseline, tolerance):
+    """Lista (etapa, métrica, base, atual) das piores que a base além da tolerância"""
+    regressions = []
+    sections = [(("micro",), baseline.get("micro", {}), report.get("micro", {}))]
+    for size, endpoints in baseline.get("http", {}).items():
+        sections.append((("http", size), endpoints, report.get("http", {}).get(size, {})))
+
+    for prefix, base_section, current_section in sections:
+        for name, base in base_section.items():
+            current = current_section.get(name)
+            if current is None or not base["requests"] or not current["requests"]:
+                continue
+            label = " ".join(prefix + (name,))
+            if current["p99_ms"] > base["p99_ms"] * (1 + tolerance):
+                regressions.append((label, "p99_ms", base["p99_ms"], current["p99_ms"]))
+            if current["rps"] < base["rps"] * (1 - tolerance):
+                regressions.append((label, "rps", base["rps"], current["rps"]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000", help="API a ser medida")
+    parser.add_argument("--concurrency", type=int, default=8, help="clientes simultâneos por endpoint")
+    parser.add_argument("--duration", type=float, default=10.0, help="segundos de carga por endpoint")
+    parser.add_argument("--sizes", type=int, nargs="*", default=[], help="tamanhos da base a medir (triagens)")
+    parser.add_argument("--days", type=int, default=365, help="período coberto pelas triagens geradas")
+    parser.add_argument("--yes", action="store_true", help="confirma a gravação de triagens sintéticas no banco")
+    parser.add_argument("--settle", type=float, default=None,
+                        help="espera (s) após gerar dados, para o cache do dashboard expirar "
+                             "(padrão: DASHBOARD_CACHE_TTL)")
+    parser.add_argument("--model", default="models/tea_model_optimized.pkl")
+    parser.add_argument("--iterations", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--skip-micro", action="store_true")
+    parser.add_argument("--skip-http", action="store_true")
+    parser.add_argument("--output", help="arquivo onde gravar o relatório")
+    parser.add_argument("--baseline", help="relatório anterior para comparação")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="piora relativa aceita (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    if args.sizes and not args.yes:
+        parser.error("--sizes grava triagens sintéticas no banco configurado; confirme com --yes")
+
+    report = {
+        "meta": {
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "url": args.url,
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+        },
+        "micro": {},
+        "http": {},
+    }
+
+    if not args.skip_micro:
+        print("micro-benchmarks", file=sys.stderr)
+        report["micro"] = micro_benchmarks(args.model, args.iterations, args.seed)
+
+    if not args.skip_http:
+        targets = http_targets(args.seed)
+        if not args.sizes:
+            print("carga na base atual", file=sys.stderr)
+            report["http"]["current"] = run_http(args, targets)
+        for size in sorted(args.sizes):
+            print(f"base com {size:,} triagens", file=sys.stderr)
+            rows = grow_database(size, args.days)
+            if args.settle is None:
+                import response_cache
+                settle = response_cache.CACHE_TTL
+            else:
+                settle = args.settle
+            time.sleep(settle)
+            report["meta"].setdefault("rows", {})[str(size)] = rows
+            report["http"][str(size)] = run_http(args, targets)
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    print(output)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance)
+        for label, metric, base, current in regressions:
+            print(f"REGRESSÃO {label}: {metric} {base} -> {current}", file=sys.stderr)
+        print(f"{len(regressions)} regressão(ões) acima de {args.tolerance:.0%}", file=sys.stderr)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Escalabilidade da busca de hiperparâmetros com o número de processos.
+
+Executa a mesma busca (training.search) com 1, 2, 4, ... processos até o
+número de núcleos, imprime o tempo, o ganho sobre a primeira medição e a
+eficiência por núcleo, e confere que a melhor combinação não muda.
+O cache de features dos folds é preparado antes das medições.
+
+Uso (a partir de backend/app):
+    python -m scripts.bench_training --csv "/data/Autism Screening.csv"
+    python -m scripts.bench_training --csv "/data/Autism Screening.csv" --replicate 20 --jobs 1 4 8
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+import training
+from scripts.train_model import load_frame
+
+
+def default_jobs():
+    cores = os.cpu_count() or 1
+    jobs = [1]
+    while jobs[-1] * 2 <= cores:
+        jobs.append(jobs[-1] * 2)
+    if jobs[-1] != cores:
+        jobs.append(cores)
+    return jobs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--csv', help='lê os exemplos de um CSV em vez do banco')
+    parser.add_argument('--replicate', type=int, default=1, help='repete o dataset N vezes (com ruído na idade)')
+    parser.add_argument('--jobs', type=int, nargs='+', default=None)
+    parser.add_argument('--folds', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    frame = load_frame(args)
+    X, y, _ = training.encode(frame)
+    if args.replicate > 1:
+        rng = np.random.default_rng(args.seed)
+        X = np.tile(X, (args.replicate, 1))
+        y = np.tile(y, args.replicate)
+        age = training.FEATURE_NAMES.index('age')
+        X[:, age] = np.clip(X[:, age] + rng.integers(-2, 3, len(X)), 1, 100)
+
+    candidates = len(training.parameter_grid())
+    print(f"{len(y)} exemplos, {candidates} combinações x {args.folds} folds = {candidates * args.folds} ajustes")
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        training.fold_features(X, y, args.folds, args.seed, cache_dir)
+
+        print(f"\n{'processos':>9} {'tempo (s)':>10} {'ganho':>7} {'eficiência':>11}")
+        baseline = first_jobs = best = None
+        for n_jobs in args.jobs or default_jobs():
+            start = time.perf_counter()
+            results = training.search(X, y, n_splits=args.folds, n_jobs=n_jobs, seed=args.seed, cache_dir=cache_dir)
+            elapsed = time.perf_counter() - start
+
+            if best is None:
+                best = results[0]["params"]
+            elif results[0]["params"] != best:
+                raise SystemExit(f"Melhor combinação mudou com {n_jobs} processos: {results[0]['params']} != {best}")
+            baseline = baseline or elapsed
+            first_jobs = first_jobs or n_jobs
+            speedup = baseline / elapsed
+            print(f"{n_jobs:>9} {elapsed:>10.2f} {speedup:>6.2f}x {speedup * first_jobs / n_jobs:>10.0%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+Gera o perfil de referência do monitor de desvio para um artefato existente.
+
+O perfil (modelo.profile.json, ao lado do .pkl) guarda os histogramas das
+features dos dados de treino, na codificação do modelo, e das
+probabilidades fora do fold: uma validação cruzada com os mesmos
+hiperparâmetros do modelo, para que a referência reflita o comportamento
+em dados novos e não o ajuste aos exemplos de treino. Artefatos gerados
+por scripts.train_model já saem com o perfil.
+
+Uso (a partir de backend/app):
+    python -m scripts.build_drift_profile
+    python -m scripts.build_drift_profile --csv "/data/Autism Screening.csv"
+    python -m scripts.build_drift_profile --model models/versions/tea_model_<versão>.pkl --bins 20
+"""
+import argparse
+import os
+import random
+import time
+
+import numpy as np
+
+from classifier_tea import TEAClassifier
+import drift_monitor
+from scripts.train_model import load_frame
+
+
+def features(classifier, frame):
+    """Matriz de features do frame de treino, com os LabelEncoders do artefato"""
+    columns = []
+    for name, column in zip(classifier.feature_names, classifier.encoded_columns):
+        if column is not None:
+            columns.append([classifier.encode_category(column, value) for value in frame[column]])
+        else:
+            columns.append(frame[name.lower()].to_numpy())
+    return np.column_stack(columns).astype(np.float64)
+
+
+def out_of_fold(classifier, X, y, folds, seed):
+    from sklearn.base import clone
+    from sklearn.model_selection import StratifiedKFold, cross_val_predict
+
+    splitter = StratifiedKFold(n_splits=folds, shuffle=True, random_state=seed)
+    return cross_val_predict(clone(classifier.model), classifier.scale(X), y, cv=splitter, method="predict_proba")[:, 1]
+
+
+def observe_overhead(monitor, X, probabilities, iterations=20000):
+    """Tempo médio (µs) de DriftMonitor.observe para uma triagem"""
+    rows = X.tolist()
+    picks = [random.randrange(len(rows)) for _ in range(iterations)]
+    start = time.perf_counter()
+    for i in picks:
+        monitor.observe(rows[i], probabilities[i])
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default=os.getenv('TEA_MODEL_PATH', 'models/tea_model_optimized.pkl'))
+    parser.add_argument('--csv', help='usa um CSV em vez de training_data + triagens confirmadas')
+    parser.add_argument('--folds', type=int, default=5)
+    parser.add_argument('--bins', type=int, default=10, help='faixas por feature contínua e das probabilidades')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    classifier = TEAClassifier(args.model)
+    frame = load_frame(args)
+    if frame.empty:
+        raise SystemExit("Nenhum exemplo rotulado; carregue training_data antes (scripts.populate_training_data)")
+
+    X = features(classifier, frame)
+    y = (frame["class_asd"].str.upper() == "YES").to_numpy(dtype=np.int64)
+    probabilities = out_of_fold(classifier, X, y, args.folds, args.seed)
+
+    profile = drift_monitor.build_profile(
+        X, probabilities, classifier.feature_names, y, bins=args.bins,
+        source=os.path.basename(args.csv) if args.csv else "training_data",
+    )
+    profile["model_version"] = classifier.version
+    path = drift_monitor.save_profile(profile, args.model)
+    print(f"perfil de {len(X)} exemplos ({classifier.version}) gravado em {path}")
+
+    monitor = drift_monitor.DriftMonitor(profile, classifier.feature_names, classifier.threshold)
+    print(f"DriftMonitor.observe: {observe_overhead(monitor, X, probabilities):.1f} µs por triagem")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+"""
+Cria as partições mensais futuras de screenings (quando particionada).
+
+Deve rodar periodicamente (por exemplo, uma vez por mês via cron), antes
+que chegue o primeiro mês sem partição.
+
+Uso (a partir de backend/app):
+    python -m scripts.ensure_partitions --months-ahead 3
+"""
+import argparse
+
+from sqlalchemy import text
+
+from database import engine
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--months-ahead', type=int, default=3)
+    args = parser.parse_args()
+
+    with engine.begin() as conn:
+        partitioned = conn.execute(text(
+            "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table "
+            "WHERE partrelid = to_regclass('tea_screening.screenings'))"
+        )).scalar()
+        if not partitioned:
+            print("tea_screening.screenings não é particionada; nada a fazer")
+            return
+
+        created = conn.execute(
+            text("SELECT tea_screening.ensure_screening_partitions(current_date, :months)"),
+            {"months": args.months_ahead}
+        ).scalar()
+    print(f"{created} partições criadas")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,183 @@
+"""
+Carrega um CSV no formato de "Autism Screening.csv" na tabela training_data.
+
+O arquivo é lido em blocos; cada bloco é validado e normalizado como a
+entrada do classificador (TEAClassifier.prepare_input: `austim` -> `autism`,
+gênero m/f -> male/female), enviado por COPY para uma tabela temporária e
+inserido com ON CONFLICT DO NOTHING na mesma transação. Cada linha guarda o
+arquivo (`--source`) e o número da linha de origem, então:
+
+- uma carga interrompida continua do último bloco gravado;
+- repetir a carga do mesmo arquivo não duplica linhas.
+
+Linhas inválidas são contadas e, com --rejects, gravadas em um CSV.
+
+Uso (a partir de backend/app):
+    python -m scripts.populate_training_data "../../data/Autism Screening.csv"
+    python -m scripts.populate_training_data dataset_v2.csv --chunk-size 200000 --rejects rejeitadas.csv
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+import pandas as pd
+
+from classifier_tea import TEAClassifier
+from database import engine
+from schema import TrainingData
+
+TABLE = f"{TrainingData.__table__.schema}.{TrainingData.__tablename__}"
+STAGE = "training_data_stage"
+
+# Nomes do CSV original -> colunas de training_data (os demais só vão para minúsculas)
+CSV_COLUMNS = {
+    'austim': 'autism',
+    'contry_of_res': 'country_of_res',
+    'class/asd': 'class_asd',
+}
+SCORE_COLUMNS = [f"a{i}_score" for i in range(1, 11)]
+YES_NO_COLUMNS = ["jundice", "autism", "used_app_before"]
+REQUIRED_COLUMNS = SCORE_COLUMNS + ["age", "gender", "class_asd"] + YES_NO_COLUMNS
+# Opcionais: ausentes ou '?' viram NULL
+TEXT_COLUMNS = ["ethnicity", "country_of_res", "age_desc", "relation"]
+
+COPY_COLUMNS = (
+    SCORE_COLUMNS
+    + ["age", "gender", "ethnicity", "jundice", "autism", "country_of_res",
+       "used_app_before", "result", "age_desc", "relation", "class_asd", "source", "source_row"]
+)
+
+GENDERS = TEAClassifier.CATEGORY_ALIASES['gender']
+
+
+def normalize(chunk, first_row, source):
+    """
+    Retorna (linhas válidas nas colunas de COPY_COLUMNS, linhas rejeitadas).
+    `first_row` é o número (a partir de 1) da primeira linha de dados do bloco.
+    """
+    df = chunk.rename(columns=lambda name: CSV_COLUMNS.get(name.strip().lower(), name.strip().lower()))
+    df = df.apply(lambda column: column.str.strip().str.strip("'"))
+    df.index = pd.RangeIndex(first_row, first_row + len(df))
+
+    missing = [column for column in REQUIRED_COLUMNS if column not in df.columns]
+    if missing:
+        raise SystemExit(f"Colunas obrigatórias ausentes: {', '.join(missing)}")
+
+    numeric = df[SCORE_COLUMNS + ["age"]].apply(pd.to_numeric, errors="coerce")
+    gender = df["gender"].str.lower()
+    class_asd = df["class_asd"].str.upper()
+
+    # Mesmos limites da API (PatientInput)
+    valid = numeric[SCORE_COLUMNS].isin([0, 1]).all(axis=1)
+    valid &= numeric["age"].between(1, 100) & (numeric["age"] % 1 == 0)
+    valid &= gender.isin(GENDERS)
+    valid &= class_asd.isin(["YES", "NO"])
+    for column in YES_NO_COLUMNS:
+        valid &= df[column].str.lower().isin(["yes", "no"])
+
+    rows = df[valid]
+    out = pd.DataFrame(index=rows.index)
+    for column in SCORE_COLUMNS + ["age"]:
+        out[column] = numeric.loc[valid, column].astype("int64")
+    out["gender"] = gender[valid].map(GENDERS)
+    for column in YES_NO_COLUMNS:
+        out[column] = rows[column].str.lower()
+    for column in TEXT_COLUMNS:
+        out[column] = rows[column].replace({"?": None, "": None}) if column in rows else None
+    out["result"] = pd.to_numeric(rows["result"], errors="coerce").astype("Int64") if "result" in rows else None
+    out["class_asd"] = class_asd[valid]
+    out["source"] = source
+    out["source_row"] = out.index
+
+    return out[COPY_COLUMNS], chunk[~valid.to_numpy()].assign(source_row=df.index[~valid])
+
+
+def last_loaded_row(cursor, source):
+    cursor.execute(f"SELECT coalesce(max(source_row), 0) FROM {TABLE} WHERE source = %s", (source,))
+    return cursor.fetchone()[0]
+
+
+def load_chunk(connection, rows):
+    """COPY para a tabela temporária e INSERT idempotente, em uma transação"""
+    buffer = io.StringIO()
+    rows.to_csv(buffer, index=False, header=False)
+    buffer.seek(0)
+
+    columns = ", ".join(COPY_COLUMNS)
+    with connection.cursor() as cursor:
+        # Carga de manutenção: não fica sujeita ao statement_timeout da API
+        cursor.execute("SET LOCAL statement_timeout = 0")
+        cursor.copy_expert(f"COPY {STAGE} ({columns}) FROM STDIN WITH (FORMAT csv)", buffer)
+        cursor.execute(
+            f"INSERT INTO {TABLE} ({columns}) SELECT {columns} FROM {STAGE} "
+            f"ON CONFLICT (source, source_row) DO NOTHING"
+        )
+        inserted = cursor.rowcount
+    connection.commit()
+    return inserted
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('path')
+    parser.add_argument('--source', help='Identificador do arquivo (padrão: nome do arquivo)')
+    parser.add_argument('--chunk-size', type=int, default=100_000)
+    parser.add_argument('--rejects', help='CSV onde gravar as linhas inválidas')
+    args = parser.parse_args()
+
+    source = args.source or os.path.basename(args.path)
+    connection = engine.raw_connection()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE TEMP TABLE {STAGE} ON COMMIT DELETE ROWS AS "
+                f"SELECT {', '.join(COPY_COLUMNS)} FROM {TABLE} WITH NO DATA"
+            )
+            done = last_loaded_row(cursor, source)
+        connection.commit()
+        if done:
+            print(f"{source}: retomando após a linha {done}")
+
+        start = time.perf_counter()
+        read = skipped = inserted = rejected = 0
+        reader = pd.read_csv(
+            args.path, chunksize=args.chunk_size, dtype=str,
+            keep_default_na=False, skipinitialspace=True,
+        )
+        for chunk in reader:
+            first_row = read + 1
+            read += len(chunk)
+            # Linhas já gravadas por uma execução anterior
+            already = min(max(done - first_row + 1, 0), len(chunk))
+            skipped += already
+            chunk = chunk.iloc[already:]
+            if chunk.empty:
+                continue
+
+            rows, invalid = normalize(chunk, first_row + already, source)
+            rejected += len(invalid)
+            if args.rejects and not invalid.empty:
+                invalid.to_csv(args.rejects, mode='a', index=False, header=not os.path.exists(args.rejects))
+            if not rows.empty:
+                inserted += load_chunk(connection, rows)
+
+            elapsed = time.perf_counter() - start
+            print(
+                f"{read} linhas lidas | {inserted} inseridas | {rejected} rejeitadas | "
+                f"{(read - skipped) / elapsed:,.0f} linhas/s",
+                file=sys.stderr,
+            )
+    finally:
+        connection.close()
+
+    elapsed = time.perf_counter() - start
+    print(
+        f"{source}: {read} linhas lidas, {skipped} já carregadas, {inserted} inseridas, "
+        f"{rejected} rejeitadas em {elapsed:.2f}s ({(read - skipped) / max(elapsed, 1e-9):,.0f} linhas/s)"
+    )
+
+
+if __name__ == '__main__':
+    main()
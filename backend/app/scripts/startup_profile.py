@@ -0,0 +1,86 @@
+"""
+Mede o custo de inicialização de cada worker da API.
+
+Sobe N processos novos (como `uvicorn --workers N`), cada um importa a
+aplicação e carrega o modelo pelo registro. Com todos carregados ao mesmo
+tempo, lê RSS, PSS e memória compartilhada de /proc/self/smaps_rollup (Linux).
+
+Uso (a partir de backend/app):
+    python -m scripts.startup_profile --workers 4
+    python -m scripts.startup_profile --workers 4 --engine lookup --lookup-cache-dir models/cache
+"""
+import argparse
+import multiprocessing
+import os
+import time
+
+
+def memory_kb():
+    """RSS, PSS e páginas compartilhadas do processo atual (kB)"""
+    fields = {}
+    try:
+        with open('/proc/self/smaps_rollup') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == 'kB':
+                    fields[parts[0].rstrip(':')] = int(parts[1])
+    except FileNotFoundError:
+        import resource
+        return {'rss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}
+    return {
+        'rss': fields.get('Rss', 0),
+        'pss': fields.get('Pss', 0),
+        'shared': fields.get('Shared_Clean', 0) + fields.get('Shared_Dirty', 0),
+    }
+
+
+def worker(barrier, results):
+    start = time.perf_counter()
+    import app  # noqa: F401
+    imported = time.perf_counter()
+
+    from model_registry import get_classifier
+    get_classifier()
+    loaded = time.perf_counter()
+
+    # Memória medida com todos os workers vivos, para o PSS dividir as páginas
+    barrier.wait()
+    results.put({
+        'pid': os.getpid(),
+        'import_s': imported - start,
+        'load_s': loaded - imported,
+        **memory_kb(),
+    })
+    barrier.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--engine', default=None, help='TEA_INFERENCE_ENGINE dos workers')
+    parser.add_argument('--lookup-cache-dir', default=None, help='TEA_LOOKUP_CACHE_DIR dos workers')
+    args = parser.parse_args()
+
+    if args.engine:
+        os.environ['TEA_INFERENCE_ENGINE'] = args.engine
+    if args.lookup_cache_dir:
+        os.environ['TEA_LOOKUP_CACHE_DIR'] = args.lookup_cache_dir
+
+    ctx = multiprocessing.get_context('spawn')
+    barrier = ctx.Barrier(args.workers)
+    results = ctx.Queue()
+    processes = [ctx.Process(target=worker, args=(barrier, results)) for _ in range(args.workers)]
+    for process in processes:
+        process.start()
+    rows = sorted((results.get() for _ in processes), key=lambda row: row['pid'])
+    for process in processes:
+        process.join()
+
+    print(f"{'pid':>8} {'import (s)':>11} {'modelo (s)':>11} {'RSS (MB)':>9} {'PSS (MB)':>9} {'compart. (MB)':>14}")
+    for row in rows:
+        print(f"{row['pid']:>8} {row['import_s']:>11.3f} {row['load_s']:>11.3f} {row['rss'] / 1024:>9.1f} "
+              f"{row.get('pss', 0) / 1024:>9.1f} {row.get('shared', 0) / 1024:>14.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""
+Triagens sintéticas para benchmarks e verificação de planos.
+
+As triagens ficam espalhadas uniformemente nos últimos `days` dias, com um
+resultado para cada uma. A geração roda no próprio PostgreSQL, em blocos de
+até `chunk` linhas por transação.
+"""
+import time
+
+from sqlalchemy import text
+
+SEED_SQL = """
+WITH inserted AS (
+    INSERT INTO {schema}.screenings
+        (a1_score, a2_score, a3_score, a4_score, a5_score, a6_score, a7_score, a8_score, a9_score, a10_score,
+         age, gender, jundice, autism, used_app_before, created_at)
+    SELECT (random() < .5)::int, (random() < .5)::int, (random() < .5)::int, (random() < .5)::int,
+           (random() < .5)::int, (random() < .5)::int, (random() < .5)::int, (random() < .5)::int,
+           (random() < .5)::int, (random() < .5)::int,
+           1 + (random() * 99)::int,
+           CASE WHEN random() < .5 THEN 'm' ELSE 'f' END,
+           CASE WHEN random() < .1 THEN 'yes' ELSE 'no' END,
+           CASE WHEN random() < .1 THEN 'yes' ELSE 'no' END,
+           'no',
+           now() - (g * (:days * interval '1 day') / :total)
+    FROM generate_series(:first, :last) g
+    RETURNING id, created_at
+)
+INSERT INTO {schema}.results (screening_id, prediction, confidence, model_version, created_at)
+SELECT id, CASE WHEN random() < .2 THEN 'TEA' ELSE 'Sem TEA' END, random(), 'synthetic', created_at
+FROM inserted
+"""
+
+
+def seed(bind, schema, rows, days, chunk=1_000_000, progress=None, first_row=1):
+    """
+    Insere as triagens sintéticas de número `first_row` a `rows` (e seus
+    resultados) em `schema`. Começar depois de 1 completa uma base menor
+    até `rows` com a mesma distribuição de datas.
+    """
+    start = time.perf_counter()
+    statement = text(SEED_SQL.format(schema=schema))
+    for first in range(first_row, rows + 1, chunk):
+        last = min(first + chunk - 1, rows)
+        with bind.begin() as conn:
+            conn.execute(text("SET LOCAL statement_timeout = 0"))
+            conn.execute(statement, {"first": first, "last": last, "total": rows, "days": days})
+        if progress:
+            progress(last, time.perf_counter() - start)
+    return time.perf_counter() - start
@@ -0,0 +1,89 @@
+"""
+Retreina o modelo a partir de training_data e das triagens confirmadas.
+
+Busca hiperparâmetros e limiar por validação cruzada em todos os núcleos,
+ajusta o modelo final e grava um artefato versionado no formato lido pelo
+TEAClassifier (model, scaler, threshold, feature_names, label_encoders,
+model_type), com as métricas em um .json e o perfil de referência do
+monitor de desvio em um .profile.json ao lado. Com --publish o artefato
+substitui o de TEA_MODEL_PATH por rename atômico e os workers da API o
+recarregam sem reinício.
+
+Uso (a partir de backend/app):
+    python -m scripts.train_model
+    python -m scripts.train_model --n-jobs 8 --beta 2 --publish
+    python -m scripts.train_model --csv "/data/Autism Screening.csv"
+"""
+import argparse
+import json
+import os
+
+import drift_monitor
+import training
+
+
+def load_frame(args):
+    if args.csv:
+        # Mesma validação e normalização da carga em training_data
+        import pandas as pd
+        from scripts.populate_training_data import normalize
+
+        raw = pd.read_csv(args.csv, dtype=str, keep_default_na=False, skipinitialspace=True)
+        frame, _ = normalize(raw, 1, os.path.basename(args.csv))
+        return frame
+
+    from database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        return training.load_training_frame(db)
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--csv', help='treina a partir de um CSV em vez do banco')
+    parser.add_argument('--n-jobs', type=int, default=-1, help='processos da busca (-1: todos os núcleos)')
+    parser.add_argument('--folds', type=int, default=5)
+    parser.add_argument('--beta', type=float, default=1.0, help='F-beta usado na escolha do limiar (>1 favorece o recall)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--cache-dir', default='models/cache/folds', help='cache das features de cada fold')
+    parser.add_argument('--output-dir', default='models/versions')
+    parser.add_argument('--publish', action='store_true', help='substitui o artefato servido (TEA_MODEL_PATH)')
+    args = parser.parse_args()
+
+    frame = load_frame(args)
+    if frame.empty:
+        raise SystemExit("Nenhum exemplo rotulado; carregue training_data antes (scripts.populate_training_data)")
+    print(f"{len(frame)} exemplos")
+
+    model_data, report, profile = training.train(
+        frame, n_jobs=args.n_jobs, n_splits=args.folds, seed=args.seed,
+        beta=args.beta, cache_dir=args.cache_dir,
+    )
+    path, version = training.save_artifact(model_data, args.output_dir)
+    report["version"] = version
+    with open(os.path.splitext(path)[0] + ".json", "w") as f:
+        json.dump(report, f, indent=4, default=str)
+    profile["model_version"] = version
+    drift_monitor.save_profile(profile, path)
+
+    metrics = report["cv_metrics"]
+    print(f"busca: {report['candidates']} combinações x {args.folds} folds em {report['search_seconds']:.1f}s")
+    print(f"melhor: {report['params']}")
+    print(
+        f"validação cruzada: f1={metrics['f1_score']:.4f} precisão={metrics['precision']:.4f} "
+        f"recall={metrics['recall']:.4f} roc_auc={metrics['roc_auc']:.4f} limiar={metrics['threshold']:.4f}"
+    )
+    print(f"artefato {version}: {path}")
+
+    if args.publish:
+        from model_registry import MODEL_PATH
+
+        training.publish(path, MODEL_PATH)
+        print(f"publicado em {MODEL_PATH}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""
+Fixtures dos testes.
+
+Os testes com PostgreSQL rodam contra o banco de DATABASE_URL, em um schema
+temporário (tea_test) com as tabelas e índices de schema.py, criado no
+início da sessão e removido ao final; o schema tea_screening não é tocado.
+Sem DATABASE_URL só rodam os testes que não usam o banco.
+"""
+import os
+
+import pytest
+
+SCRATCH_SCHEMA = "tea_test"
+
+# Módulos que importam database.py, que exige DATABASE_URL já na importação
+DATABASE_MODULES = [
+    "test_archive.py",
+    "test_dashboard_plans.py",
+    "test_dashboard_sql.py",
+    "test_recent_screenings.py",
+    "test_response_cache.py",
+    "test_write_behind.py",
+]
+
+if not os.getenv("DATABASE_URL"):
+    collect_ignore = DATABASE_MODULES
+
+# Entrada válida de /predict
+PATIENT = {
+    **{f"A{q}_Score": 1 for q in range(1, 11)},
+    "age": 30, "gender": "m", "jundice": "no", "autism": "no", "used_app_before": "no",
+}
+
+
+def pytest_report_header(config):
+    if not os.getenv("DATABASE_URL"):
+        return "DATABASE_URL não definida: testes com PostgreSQL ignorados"
+
+
+@pytest.fixture(scope="session")
+def scratch():
+    """Engine com o schema tea_screening traduzido para o schema temporário"""
+    if not os.getenv("DATABASE_URL"):
+        pytest.skip("DATABASE_URL não definida")
+    from sqlalchemy import text
+
+    from database import Base, engine
+    import schema  # noqa: F401 (registra as tabelas em Base.metadata)
+
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {SCRATCH_SCHEMA} CASCADE"))
+        conn.execute(text(f"CREATE SCHEMA {SCRATCH_SCHEMA}"))
+    scratch = engine.execution_options(schema_translate_map={"tea_screening": SCRATCH_SCHEMA})
+    Base.metadata.create_all(bind=scratch)
+    yield scratch
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP SCHEMA {SCRATCH_SCHEMA} CASCADE"))
+
+
+@pytest.fixture
+def db(scratch):
+    """Sessão no schema temporário, com todas as tabelas vazias"""
+    from sqlalchemy import text
+    from sqlalchemy.orm import Session
+
+    from database import Base
+
+    tables = ", ".join(f"{SCRATCH_SCHEMA}.{table.name}" for table in Base.metadata.sorted_tables)
+    with scratch.begin() as conn:
+        conn.execute(text(f"TRUNCATE {tables} RESTART IDENTITY CASCADE"))
+    with Session(bind=scratch) as session:
+        yield session
+
+
+@pytest.fixture(scope="session")
+def api(scratch):
+    """
+    Aplicação com as sessões no schema temporário. Um único TestClient na
+    sessão de testes: o encerramento da aplicação desliga o executor do modelo
+    do processo
+    """
+    from fastapi.testclient import TestClient
+    from sqlalchemy.ext.asyncio import AsyncSession
+    from sqlalchemy.orm import Session
+
+    from app import app
+    from database import async_engine, get_async_db, get_db
+
+    scratch_async = async_engine.execution_options(schema_translate_map={"tea_screening": SCRATCH_SCHEMA})
+
+    def scratch_db():
+        with Session(bind=scratch) as session:
+            yield session
+
+    async def scratch_async_db():
+        async with AsyncSession(scratch_async, expire_on_commit=False) as session:
+            yield session
+
+    app.dependency_overrides[get_db] = scratch_db
+    app.dependency_overrides[get_async_db] = scratch_async_db
+    try:
+        with TestClient(app) as client:
+            yield client
+    finally:
+        app.dependency_overrides.clear()
+
+
+@pytest.fixture(params=[True, False], ids=["rollups", "tabelas"])
+def use_rollups(request, monkeypatch):
+    """Roda o teste com o dashboard lendo as rollups e as tabelas brutas"""
+    import rollups
+
+    monkeypatch.setattr(rollups, "USE_ROLLUPS", request.param)
+    return request.param
@@ -0,0 +1,116 @@
+"""Arquivamento em Parquet (archive.py) e leituras do arquivo"""
+from datetime import date, datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+import archive
+import database
+import export_endpoints
+from schema import ArchivedRollup, Result, Screening
+
+pytest.importorskip("pyarrow")
+
+MONTH = date(2024, 3, 1)
+
+
+@pytest.fixture(autouse=True)
+def archive_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(archive, "ARCHIVE_DIR", str(tmp_path))
+    return tmp_path
+
+
+@pytest.fixture
+def local_db(db, scratch, monkeypatch):
+    """Sessão com o banco em America/Sao_Paulo (UTC-3)"""
+    monkeypatch.setattr(database, "_session_timezone", ZoneInfo("America/Sao_Paulo"))
+    with scratch.connect() as conn:
+        conn.execute(text("SET TIME ZONE 'America/Sao_Paulo'"))
+        conn.commit()
+        try:
+            with Session(bind=conn) as session:
+                yield session
+        finally:
+            conn.rollback()
+            conn.execute(text("RESET TIME ZONE"))
+            conn.commit()
+
+
+def add_screening(db, created_at, prediction="TEA", confidence=0.9, with_result=True):
+    screening = Screening(
+        **{f"a{q}_score": q % 2 for q in range(1, 11)},
+        age=30, gender="m", jundice="no", autism="no", used_app_before="no",
+        created_at=created_at,
+    )
+    db.add(screening)
+    db.flush()
+    if with_result:
+        db.add(Result(screening_id=screening.id, prediction=prediction, confidence=confidence,
+                      model_version="test", created_at=created_at))
+    db.commit()
+    return screening.id
+
+
+def exported(db, start_date=None, end_date=None):
+    """screening_id das linhas exportadas do arquivo e das tabelas quentes"""
+    start, end = export_endpoints.archive_range(start_date, end_date)
+    archived = [
+        row[0]
+        for rows in archive.export_partitions(db, export_endpoints.FIELDS, start=start, end=end)
+        for row in rows
+    ]
+    hot = [row.screening_id for row in db.execute(export_endpoints.export_query(start_date, end_date))]
+    return archived, hot
+
+
+def test_archive_keeps_screenings_without_result_but_export_skips_them(db):
+    created_at = datetime(2024, 3, 10, 12, tzinfo=timezone.utc)
+    with_result = add_screening(db, created_at)
+    add_screening(db, created_at + timedelta(hours=1), with_result=False)
+
+    assert archive.archive_month(db, MONTH) == 2
+    assert db.query(Screening).count() == 0
+
+    archived, hot = exported(db)
+    assert (archived, hot) == ([with_result], [])
+
+
+def test_months_and_export_dates_follow_the_session_time_zone(local_db):
+    db = local_db
+    # 31/03 23:30 e 29/02 23:00 no horário local, já no dia seguinte em UTC
+    end_of_march = add_screening(db, datetime(2024, 4, 1, 2, 30, tzinfo=timezone.utc))
+    end_of_february = add_screening(db, datetime(2024, 3, 1, 2, 0, tzinfo=timezone.utc))
+
+    assert archive.months_to_archive(db)[:2] == [date(2024, 2, 1), date(2024, 3, 1)]
+    assert archive.archive_month(db, MONTH) == 1
+    assert db.query(ArchivedRollup.day).all() == [(date(2024, 3, 31),)]
+
+    # O mesmo dia pedido encontra a triagem no arquivo e nas tabelas quentes
+    assert exported(db, date(2024, 3, 31), date(2024, 3, 31)) == ([end_of_march], [])
+    assert exported(db, date(2024, 2, 29), date(2024, 2, 29)) == ([], [end_of_february])
+    assert exported(db, date(2024, 4, 1)) == ([], [])
+
+
+def test_rollups_survive_archiving_and_rebuild_from_files(db, monkeypatch):
+    import dashboard_endpoints
+    import rollups
+
+    monkeypatch.setattr(rollups, "USE_ROLLUPS", True)
+    for i, confidence in enumerate([0.1, 0.5, 0.7, 0.84, 0.85, 0.99, 1.0, None]):
+        add_screening(db, datetime(2024, 3, 2 + i, 12, tzinfo=timezone.utc),
+                      prediction="TEA" if i % 2 else "Sem TEA", confidence=confidence)
+    rollups.backfill(db)
+    before = dashboard_endpoints.get_confidence_distribution(db=db)
+    assert [bucket["count"] for bucket in before] == [1, 1, 2, 1, 1]
+
+    archive.archive_month(db, MONTH)
+    archived = sorted(tuple(row) for row in db.execute(rollups.history_select()))
+    assert dashboard_endpoints.get_confidence_distribution(db=db) == before
+
+    # Recalculada a partir dos arquivos, archived_rollups volta igual
+    assert archive.rebuild_rollups(db) == len(archived)
+    rollups.backfill(db)
+    assert sorted(tuple(row) for row in db.execute(rollups.history_select())) == archived
+    assert dashboard_endpoints.get_confidence_distribution(db=db) == before
@@ -0,0 +1,78 @@
+"""
+Backends do cache (MemoryCache, RedisCache) atrás de uma CachedRoute
+isolada, sem banco
+"""
+import threading
+
+import pytest
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+
+import response_cache
+
+
+class FakeRedis:
+    """Cliente Redis em memória que registra a thread de cada chamada"""
+
+    def __init__(self):
+        self.values = {}
+        self.threads = set()
+
+    def get(self, key):
+        self.threads.add(threading.get_ident())
+        return self.values.get(key)
+
+    def set(self, key, value, ex=None):
+        self.threads.add(threading.get_ident())
+        self.values[key] = value
+
+    def incr(self, key):
+        self.threads.add(threading.get_ident())
+        self.values[key] = int(self.values.get(key) or 0) + 1
+
+
+def invalidating_app(invalidate_on):
+    """Aplicação com uma rota em cache cujo handler invalida o cache na chamada indicada"""
+    router = APIRouter(route_class=response_cache.CachedRoute)
+    calls = []
+
+    @router.get("/count")
+    async def count():
+        calls.append(threading.get_ident())
+        if len(calls) == invalidate_on:
+            # Escrita concluída enquanto o handler ainda calculava a resposta
+            await response_cache.invalidate_async()
+        return {"calls": len(calls)}
+
+    app = FastAPI()
+    app.include_router(router)
+    return app, calls
+
+
+@pytest.mark.parametrize("backend", ["memory", "redis"])
+def test_response_computed_during_invalidation_is_not_stored(backend, monkeypatch):
+    if backend == "memory":
+        cache = response_cache.MemoryCache(ttl=60, max_entries=16)
+    else:
+        cache = response_cache.RedisCache(FakeRedis(), ttl=60)
+    monkeypatch.setattr(response_cache, "cache", cache)
+    app, _ = invalidating_app(invalidate_on=1)
+
+    with TestClient(app) as client:
+        assert client.get("/count").json() == {"calls": 1}
+        # A primeira resposta não foi guardada: a segunda roda o handler
+        assert client.get("/count").json() == {"calls": 2}
+        assert client.get("/count").json() == {"calls": 2}
+
+
+def test_redis_calls_run_off_the_event_loop(monkeypatch):
+    redis = FakeRedis()
+    monkeypatch.setattr(response_cache, "cache", response_cache.RedisCache(redis, ttl=60))
+    app, calls = invalidating_app(invalidate_on=2)
+
+    with TestClient(app) as client:
+        client.get("/count")
+        client.get("/count")
+        client.get("/count")
+
+    assert redis.threads and not redis.threads & set(calls)
@@ -0,0 +1,142 @@
+"""
+Planos (EXPLAIN) das consultas do dashboard e de /recent-screenings.
+
+O schema temporário recebe EXPLAIN_TEST_ROWS triagens sintéticas; cada
+endpoint roda capturando o SQL gerado e o plano de cada consulta é
+inspecionado:
+
+- acessos seletivos (janela do /timeline, primeira página e página
+  intermediária de /recent-screenings) não podem fazer Seq Scan em
+  screenings/results, com ou sem rollups;
+- com rollups ligadas, os endpoints agregados não podem tocar as tabelas
+  brutas.
+
+Agregações do histórico inteiro sem rollups leem todas as linhas por
+definição e não são verificadas.
+"""
+import os
+import re
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from database import engine
+import dashboard_endpoints
+import rollups
+from scripts import synthetic_data
+from tests.conftest import SCRATCH_SCHEMA
+
+# Base grande o bastante para os custos do planejador se parecerem com os de produção
+ROWS = int(os.getenv("EXPLAIN_TEST_ROWS", "200000"))
+DAYS = 365
+
+RAW_TABLE = re.compile(r"^(screenings|results)(_.+)?$")
+
+# Tabelas que cada endpoint seletivo precisa ler por índice
+SELECTIVE = {
+    "timeline": {"screenings"},
+    "recent-screenings": {"screenings", "results"},
+    "recent-screenings-page": {"screenings", "results"},
+}
+# Endpoints que continuam lendo tabelas brutas com rollups ligadas
+RAW_WITH_ROLLUPS = {"recent-screenings", "recent-screenings-page"}
+
+
+def _recent_page(db):
+    import app
+
+    # Página no meio do histórico: o custo deve ser o mesmo da primeira
+    middle = app.encode_cursor(datetime.now(timezone.utc) - timedelta(days=DAYS / 2), 0)
+    return app.get_recent_screenings(limit=10, cursor=middle, db=db)
+
+
+def _recent(db):
+    import app
+
+    return app.get_recent_screenings(limit=10, db=db)
+
+
+ENDPOINTS = {
+    "kpis": lambda db: dashboard_endpoints.get_kpis(db=db),
+    "age-distribution": lambda db: dashboard_endpoints.get_age_distribution(db=db),
+    "gender-distribution": lambda db: dashboard_endpoints.get_gender_distribution(db=db),
+    "confidence-distribution": lambda db: dashboard_endpoints.get_confidence_distribution(db=db),
+    "timeline": lambda db: dashboard_endpoints.get_timeline(days=30, db=db),
+    "risk-factors": lambda db: dashboard_endpoints.get_risk_factors(db=db),
+    "score-analysis": lambda db: dashboard_endpoints.get_score_analysis(db=db),
+    "recent-screenings": _recent,
+    "recent-screenings-page": _recent_page,
+}
+
+CASES = [
+    (use_rollups, name)
+    for use_rollups in (True, False)
+    for name in ENDPOINTS
+    if name in SELECTIVE or (use_rollups and name not in RAW_WITH_ROLLUPS)
+]
+
+
+@pytest.fixture(scope="module")
+def seeded(scratch):
+    tables = ", ".join(f"{SCRATCH_SCHEMA}.{name}" for name in ("screenings", "results", "dashboard_rollups"))
+    with scratch.begin() as conn:
+        conn.execute(text(f"TRUNCATE {tables} RESTART IDENTITY CASCADE"))
+    synthetic_data.seed(engine, SCRATCH_SCHEMA, ROWS, DAYS)
+    with Session(bind=scratch) as db:
+        rollups.backfill(db)
+    with scratch.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for name in ("screenings", "results", "dashboard_rollups"):
+            conn.execute(text(f"VACUUM ANALYZE {SCRATCH_SCHEMA}.{name}"))
+    return scratch
+
+
+def scan_nodes(plan, nodes):
+    """Lista (tabela, tipo de nó) das leituras de screenings/results no plano"""
+    relation = plan.get("Relation Name")
+    if relation and RAW_TABLE.match(relation):
+        nodes.append((RAW_TABLE.match(relation).group(1), plan["Node Type"]))
+    for child in plan.get("Plans", []):
+        scan_nodes(child, nodes)
+    return nodes
+
+
+def capture_statements(scratch, fn):
+    statements = []
+
+    def listener(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        with Session(bind=scratch) as db:
+            fn(db)
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+    return statements
+
+
+def raw_scans(scratch, fn):
+    nodes = []
+    for statement, parameters in capture_statements(scratch, fn):
+        with scratch.connect() as conn:
+            cursor = conn.connection.cursor()
+            cursor.execute("EXPLAIN (FORMAT JSON) " + statement, parameters)
+            scan_nodes(cursor.fetchone()[0][0]["Plan"], nodes)
+    return nodes
+
+
+@pytest.mark.parametrize(
+    "use_rollups, name", CASES,
+    ids=[f"{'rollups' if use_rollups else 'tabelas'}-{name}" for use_rollups, name in CASES],
+)
+def test_dashboard_query_plan(seeded, monkeypatch, use_rollups, name):
+    monkeypatch.setattr(rollups, "USE_ROLLUPS", use_rollups)
+    nodes = raw_scans(seeded, ENDPOINTS[name])
+
+    if name in SELECTIVE:
+        sequential = [(table, node) for table, node in nodes if table in SELECTIVE[name] and node == "Seq Scan"]
+        assert not sequential, f"{name} lê sem índice: {sequential}"
+    else:
+        assert not nodes, f"{name} lê tabelas brutas com rollups ligadas: {nodes}"
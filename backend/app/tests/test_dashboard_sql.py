@@ -0,0 +1,160 @@
+"""
+/confidence-distribution e /score-analysis calculados no banco (width_bucket
+e somas filtradas) contra a aritmética em Python da implementação original,
+que lia todas as linhas.
+"""
+import math
+import random
+from datetime import date, datetime, time, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+import dashboard_endpoints
+import dashboard_queries
+import rollups
+from schema import Result, Screening
+
+CONFIDENCE_RANGES = [
+    ("Muito Baixa", 0, 0.5),
+    ("Baixa", 0.5, 0.7),
+    ("Média", 0.7, 0.85),
+    ("Alta", 0.85, 0.95),
+    ("Muito Alta", 0.95, 1.0)
+]
+
+# Limites das faixas, o valor imediatamente abaixo de cada um e 1.0, que
+# fica fora de todas as faixas
+EDGE_CONFIDENCES = [
+    value
+    for bound in (0.5, 0.7, 0.85, 0.95, 1.0)
+    for value in (bound, math.nextafter(bound, 0))
+] + [0.0]
+
+
+def seed(db, rows=400, seed=6):
+    generator = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    confidences = EDGE_CONFIDENCES * 3 + [generator.random() for _ in range(rows - 3 * len(EDGE_CONFIDENCES))]
+    for i, confidence in enumerate(confidences):
+        screening = Screening(
+            **{f"a{q}_score": generator.randint(0, 1) for q in range(1, 11)},
+            age=generator.randint(1, 99),
+            gender=generator.choice(["m", "f"]),
+            jundice=generator.choice(["yes", "no"]),
+            autism=generator.choice(["yes", "no"]),
+            used_app_before="no",
+            created_at=now - timedelta(days=generator.randint(0, 60)),
+        )
+        db.add(screening)
+        db.flush()
+        db.add(Result(
+            screening_id=screening.id,
+            prediction="TEA" if i % 3 == 0 else "Sem TEA",
+            confidence=confidence,
+            model_version="test",
+        ))
+    db.commit()
+    rollups.backfill(db)
+
+
+def expected_confidence_distribution(db):
+    results = db.query(Result.confidence, Result.prediction).all()
+    distribution = []
+    for label, min_conf, max_conf in CONFIDENCE_RANGES:
+        count = sum(1 for r in results if min_conf <= float(r.confidence) < max_conf)
+        positive = sum(1 for r in results if min_conf <= float(r.confidence) < max_conf and r.prediction == "TEA")
+        distribution.append({"range": label, "count": count, "positive": positive, "negative": count - positive})
+    return distribution
+
+
+def expected_score_analysis(db):
+    screenings = db.query(
+        *[getattr(Screening, f"a{i}_score") for i in range(1, 11)], Result.prediction
+    ).join(Result, Screening.id == Result.screening_id).all()
+    questions = []
+    for i in range(1, 11):
+        attr_name = f"a{i}_score"
+        positive_scores = [getattr(s, attr_name) for s in screenings if s.prediction == "TEA"]
+        negative_scores = [getattr(s, attr_name) for s in screenings if s.prediction == "Sem TEA"]
+        questions.append({
+            "question": f"A{i}",
+            "positive_avg": sum(positive_scores) / len(positive_scores) if positive_scores else 0,
+            "negative_avg": sum(negative_scores) / len(negative_scores) if negative_scores else 0,
+            "total_avg": sum(positive_scores + negative_scores) / len(screenings) if screenings else 0
+        })
+    return questions
+
+
+def test_confidence_distribution_matches_python_buckets(db, use_rollups):
+    seed(db)
+    distribution = dashboard_endpoints.get_confidence_distribution(db=db)
+    assert distribution == expected_confidence_distribution(db)
+    # 1.0 não entra em nenhuma faixa
+    assert sum(bucket["count"] for bucket in distribution) == 400 - 3
+
+
+def test_confidence_distribution_edges(db, use_rollups):
+    seed(db, rows=3 * len(EDGE_CONFIDENCES))
+    counts = [bucket["count"] for bucket in dashboard_endpoints.get_confidence_distribution(db=db)]
+    # Cada faixa recebe o seu limite inferior e o valor logo abaixo do limite seguinte
+    assert counts == [6, 6, 6, 6, 6]
+
+
+def test_score_analysis_matches_python_averages(db, use_rollups):
+    seed(db)
+    assert dashboard_endpoints.get_score_analysis(db=db) == expected_score_analysis(db)
+
+
+@pytest.mark.parametrize("endpoint", ["get_confidence_distribution", "get_score_analysis"])
+def test_empty_tables(db, use_rollups, endpoint):
+    expected = {
+        "get_confidence_distribution": expected_confidence_distribution,
+        "get_score_analysis": expected_score_analysis,
+    }[endpoint](db)
+    assert getattr(dashboard_endpoints, endpoint)(db=db) == expected
+
+
+@pytest.fixture
+def shifted_db(db, scratch):
+    """
+    Sessão com o banco em um fuso cuja data difere da data local da
+    aplicação neste momento (UTC+14 ou UTC-12)
+    """
+    zone = next(name for name in ("Etc/GMT-14", "Etc/GMT+12") if datetime.now(ZoneInfo(name)).date() != date.today())
+    with scratch.connect() as conn:
+        conn.execute(text(f"SET TIME ZONE '{zone}'"))
+        conn.commit()
+        try:
+            with Session(bind=conn) as session:
+                yield session, ZoneInfo(zone)
+        finally:
+            conn.rollback()
+            conn.execute(text("RESET TIME ZONE"))
+            conn.commit()
+
+
+def test_kpi_window_uses_the_database_day(shifted_db, use_rollups):
+    db, zone = shifted_db
+    now = datetime.now(zone)
+    if use_rollups:
+        # Meio-dia de 7 e de 8 dias atrás na data do banco
+        noon = datetime.combine(now.date(), time(12), zone)
+        instants = [noon - timedelta(days=7), noon - timedelta(days=8)]
+    else:
+        instants = [now - timedelta(days=7, minutes=-30), now - timedelta(days=7, minutes=30)]
+    for created_at in instants:
+        screening = Screening(
+            **{f"a{q}_score": 0 for q in range(1, 11)},
+            age=30, gender="m", jundice="no", autism="no", used_app_before="no",
+            created_at=created_at,
+        )
+        db.add(screening)
+        db.flush()
+        db.add(Result(screening_id=screening.id, prediction="TEA", confidence=0.9, model_version="test"))
+    db.commit()
+    rollups.backfill(db)
+
+    assert dashboard_queries.kpi_summary(db)["recent_screenings_7d"] == 1
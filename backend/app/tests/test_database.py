@@ -0,0 +1,52 @@
+"""Configuração das engines em database.py"""
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+# Roda em outro processo: database.py lê a configuração na importação
+PGBOUNCER_PROBE = """
+import asyncio, json
+from sqlalchemy import exc, text
+import database
+
+def sync_settings():
+    with database.engine.connect() as conn:
+        settings = conn.execute(text("SELECT current_setting('statement_timeout'), current_setting('search_path')")).one()
+        try:
+            conn.execute(text("SELECT pg_sleep(1)"))
+            cancelled = False
+        except exc.OperationalError:
+            cancelled = True
+    return list(settings) + [cancelled]
+
+async def async_settings():
+    async with database.AsyncSessionLocal() as db:
+        settings = (await db.execute(text("SELECT current_setting('statement_timeout'), current_setting('search_path')"))).one()
+    await database.async_engine.dispose()
+    return list(settings)
+
+print(json.dumps({
+    "connect_args": database._connect_args,
+    "sync": sync_settings(),
+    "async": asyncio.run(async_settings()),
+}))
+"""
+
+
+@pytest.mark.skipif(not os.getenv("DATABASE_URL"), reason="DATABASE_URL não definida")
+def test_pgbouncer_mode_applies_settings_per_transaction():
+    env = dict(os.environ, DB_PGBOUNCER="true", DB_STATEMENT_TIMEOUT_MS="200")
+    output = subprocess.run(
+        [sys.executable, "-c", PGBOUNCER_PROBE],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    probe = json.loads(output.strip().splitlines()[-1])
+
+    # Nenhum parâmetro de inicialização; timeout e search_path valem na transação
+    assert probe["connect_args"] == {}
+    assert probe["sync"] == ["200ms", "tea_screening", True]
+    assert probe["async"] == ["200ms", "tea_screening"]
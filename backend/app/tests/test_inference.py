@@ -0,0 +1,39 @@
+"""Admissão das predições (inference.admission)"""
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+import inference
+from tests.conftest import PATIENT
+
+SLOTS = 4
+
+
+@pytest.fixture
+def slots(monkeypatch):
+    monkeypatch.setattr(inference, "_slots", asyncio.Semaphore(SLOTS))
+    monkeypatch.setattr(inference, "ADMISSION_TIMEOUT", 0.01)
+
+
+def test_full_admission_returns_503_with_retry_after(api, slots, monkeypatch):
+    monkeypatch.setattr(inference, "_slots", asyncio.Semaphore(0))
+    response = api.post("/predict", json=PATIENT)
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+
+def test_timeouts_racing_releases_do_not_leak_slots(slots):
+    async def hold(delay):
+        try:
+            async with inference.admission():
+                await asyncio.sleep(delay)
+        except HTTPException as error:
+            assert error.status_code == 503
+
+    async def main():
+        # Liberações no mesmo instante em que as esperas expiram
+        await asyncio.gather(*(hold(0.01 * (i % 3)) for i in range(200)))
+
+    asyncio.run(main())
+    assert inference.available_slots() == SLOTS
@@ -0,0 +1,31 @@
+"""Contagem de consultas por requisição (instrumentation.query_count_middleware)"""
+import pytest
+
+import instrumentation
+
+
+def request_count(route):
+    series = instrumentation.REQUEST_SECONDS._series
+    return sum(sum(counts) for key, (counts, _) in series.items() if key[1] == route)
+
+
+def test_regular_response_reports_its_queries(api, db):
+    response = api.get("/stats")
+    assert response.status_code == 200
+    assert int(response.headers["X-DB-Query-Count"]) > 0
+
+
+@pytest.mark.skipif(not instrumentation.METRICS_ENABLED, reason="TEA_METRICS=false")
+def test_streaming_queries_are_attributed_to_the_route(api, db):
+    queries = instrumentation.DB_QUERIES._values.get(("/api/export",), 0)
+    requests = request_count("/api/export")
+
+    with api.stream("GET", "/api/export?format=ndjson") as response:
+        assert response.status_code == 200
+        # As consultas do corpo ainda não rodaram quando os headers saem
+        assert "X-DB-Query-Count" not in response.headers
+        assert "Server-Timing" not in response.headers
+        response.read()
+
+    assert instrumentation.DB_QUERIES._values.get(("/api/export",), 0) > queries
+    assert request_count("/api/export") == requests + 1
@@ -0,0 +1,33 @@
+"""Conferência da tabela de inferência (lookup_engine.verify)"""
+import numpy as np
+import pytest
+
+from classifier_tea import TEAClassifier
+
+FILLED = 5000
+
+
+@pytest.fixture
+def table():
+    return TEAClassifier(engine="lookup-lazy").lookup_table
+
+
+def fill(table):
+    keys = np.random.default_rng(1).choice(table.size, size=FILLED, replace=False)
+    table.lookup_matrix(table.unpack(keys))
+
+
+@pytest.mark.parametrize("sample_size", [None, 200])
+def test_verify_accepts_a_correct_table(table, sample_size):
+    fill(table)
+    assert table.verify(sample_size=sample_size) == 0
+
+
+@pytest.mark.parametrize("sample_size", [None, 200])
+def test_verify_catches_a_wrong_scoring_path(table, sample_size, monkeypatch):
+    # Tabela preenchida por um caminho de lote errado: a conferência não pode
+    # reutilizá-lo, senão nunca encontra divergência
+    score = table._score
+    monkeypatch.setattr(table, "_score", lambda keys: np.nextafter(score(keys), 2.0))
+    fill(table)
+    assert table.verify(sample_size=sample_size) == (sample_size or FILLED)
@@ -0,0 +1,41 @@
+"""Paginação e filtros de /recent-screenings"""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from schema import Result, Screening
+
+
+@pytest.fixture
+def screenings(db):
+    now = datetime.now(timezone.utc)
+    for i in range(5):
+        screening = Screening(
+            **{f"a{q}_score": 0 for q in range(1, 11)},
+            age=20 + i, gender="f", jundice="no", autism="no", used_app_before="no",
+            created_at=now - timedelta(minutes=i),
+        )
+        db.add(screening)
+        db.flush()
+        db.add(Result(screening_id=screening.id, prediction="TEA", confidence=0.9, model_version="test"))
+    db.commit()
+
+
+def test_without_paginate_the_response_is_a_list(api, screenings):
+    response = api.get("/recent-screenings?limit=3")
+    assert response.status_code == 200
+    assert [item["age"] for item in response.json()] == [20, 21, 22]
+
+
+def test_pages_follow_next_cursor(api, screenings):
+    first = api.get("/recent-screenings?limit=3&paginate=true").json()
+    assert [item["age"] for item in first["items"]] == [20, 21, 22]
+
+    second = api.get(f"/recent-screenings?limit=3&cursor={first['next_cursor']}").json()
+    assert [item["age"] for item in second["items"]] == [23, 24]
+    assert second["next_cursor"] is None
+
+
+@pytest.mark.parametrize("query", ["min_age=30&max_age=20", "start_date=2026-02-01&end_date=2026-01-01"])
+def test_inverted_ranges_are_rejected(api, db, query):
+    assert api.get(f"/recent-screenings?{query}").status_code == 422
@@ -0,0 +1,79 @@
+"""Cache das respostas do dashboard (response_cache.py) pela API"""
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+import response_cache
+import write_behind
+from tests.conftest import PATIENT
+from tests.test_write_behind import RESULT, SCREENING
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = response_cache.MemoryCache(ttl=60, max_entries=16)
+    monkeypatch.setattr(response_cache, "cache", cache)
+    return cache
+
+
+@pytest.fixture
+def client(api, db, cache, monkeypatch):
+    monkeypatch.setattr(write_behind, "queue", None)
+    return api
+
+
+def test_matching_etag_returns_304(client):
+    first = client.get("/api/dashboard/kpis")
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+
+    second = client.get("/api/dashboard/kpis", headers={"If-None-Match": etag})
+    assert second.status_code == 304
+    assert second.headers["ETag"] == etag
+    assert second.headers["X-DB-Query-Count"] == "0"
+    assert second.content == b""
+
+    other = client.get("/api/dashboard/kpis", headers={"If-None-Match": '"outro"'})
+    assert other.status_code == 200
+    assert other.json() == first.json()
+
+
+def test_key_ignores_query_parameter_order(client, cache):
+    first = client.get("/api/dashboard/timeline?fmt=json&days=7")
+    second = client.get("/api/dashboard/timeline?days=7&fmt=json")
+    assert first.headers["ETag"] == second.headers["ETag"]
+    assert [key for _, key in cache._entries] == ["/api/dashboard/timeline?days=7&fmt=json"]
+
+    client.get("/api/dashboard/timeline?days=8&fmt=json")
+    assert len(cache._entries) == 2
+
+
+def test_predict_invalidates(client):
+    before = client.get("/api/dashboard/kpis")
+    assert before.json()["total_screenings"] == 0
+
+    assert client.post("/predict", json=PATIENT).status_code == 200
+
+    after = client.get("/api/dashboard/kpis", headers={"If-None-Match": before.headers["ETag"]})
+    assert after.status_code == 200
+    assert after.json()["total_screenings"] == 1
+    assert after.headers["ETag"] != before.headers["ETag"]
+
+
+def test_write_behind_flush_invalidates(client, scratch, tmp_path, monkeypatch):
+    monkeypatch.setattr(write_behind, "SessionLocal", sessionmaker(bind=scratch))
+    queue = write_behind.WriteBehindQueue(str(tmp_path), max_pending=100, batch_size=10)
+
+    before = client.get("/api/dashboard/kpis")
+    queue.submit(SCREENING, RESULT)
+    # Aceita e ainda não gravada: o cache continua válido
+    assert client.get("/api/dashboard/kpis", headers={"If-None-Match": before.headers["ETag"]}).status_code == 304
+
+    # stop() grava o lote pendente antes de encerrar a thread
+    queue.start()
+    queue.stop()
+    assert queue.stats()["written"] == 1
+
+    after = client.get("/api/dashboard/kpis", headers={"If-None-Match": before.headers["ETag"]})
+    assert after.status_code == 200
+    assert after.json()["total_screenings"] == 1
+
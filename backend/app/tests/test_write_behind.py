@@ -0,0 +1,50 @@
+"""Reserva de ids da gravação assíncrona (write_behind.py)"""
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.orm import sessionmaker
+
+import write_behind
+from schema import Result, Screening
+
+SCREENING = {
+    **{f"a{q}_score": 1 for q in range(1, 11)},
+    "age": 30, "gender": "m", "jundice": "no", "autism": "no", "used_app_before": "no",
+}
+RESULT = {"prediction": "TEA", "confidence": 0.9, "model_version": "test"}
+
+
+@pytest.fixture
+def queue(db, scratch, tmp_path, monkeypatch):
+    monkeypatch.setattr(write_behind, "SessionLocal", sessionmaker(bind=scratch))
+    monkeypatch.setattr(write_behind, "FSYNC", False)
+    queue = write_behind.WriteBehindQueue(str(tmp_path), max_pending=100, batch_size=10)
+    yield queue
+    queue.stop()
+
+
+def test_refill_reserves_ids_from_the_sequences(queue, monkeypatch):
+    monkeypatch.setattr(write_behind, "ID_RESERVE", 10)
+    queue._refill_ids()
+    assert list(queue._ids) == [(i, i) for i in range(1, 11)]
+
+
+def test_empty_reserve_falls_back_to_nextval(queue, db):
+    # Sem start(): a reserva está vazia
+    first, _ = queue.submit(SCREENING, RESULT)
+    second, _ = queue.submit(SCREENING, RESULT)
+    assert (first, second) == (1, 2)
+
+    queue._write(queue._rotate()[1])
+    assert db.query(Screening.id, Result.id).join(Result).order_by(Screening.id).all() == [(1, 1), (2, 2)]
+
+
+def test_empty_reserve_without_database_is_rejected(queue, monkeypatch):
+    def unavailable(count):
+        raise ConnectionError("banco fora do ar")
+
+    monkeypatch.setattr(queue, "_reserve", unavailable)
+    with pytest.raises(HTTPException) as raised:
+        queue.submit(SCREENING, RESULT)
+    assert raised.value.status_code == 503
+    assert queue.stats()["rejected"] == 1
+    assert queue.stats()["pending"] == 0
@@ -0,0 +1,269 @@
+# training.py
+import hashlib
+import io
+import itertools
+import os
+import time
+
+import joblib
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import (
+    accuracy_score, average_precision_score, f1_score, precision_recall_curve,
+    precision_score, recall_score, roc_auc_score,
+)
+from sklearn.model_selection import StratifiedKFold
+from sklearn.preprocessing import LabelEncoder, StandardScaler
+
+from classifier_tea import TEAClassifier
+import drift_monitor
+
+MODEL_TYPE = "optimized"
+
+# Mesmas features do artefato servido hoje (nomes dos campos da API)
+FEATURE_NAMES = [f"A{i}_Score" for i in range(1, 11)] + ["age", "gender_encoded"]
+
+# Colunas com LabelEncoder no artefato (as mesmas de TEAClassifier.prepare_input)
+CATEGORICAL_COLUMNS = ["gender", "jundice"]
+
+PARAM_GRID = {
+    "n_estimators": [100, 300],
+    "max_depth": [None, 8, 16],
+    "min_samples_leaf": [1, 3],
+    "max_features": ["sqrt", 0.5],
+    "class_weight": [None, "balanced"],
+}
+
+
+def load_training_frame(db):
+    """
+    Exemplos rotulados: toda a tabela training_data e as triagens com
+    diagnóstico confirmado (results.confirmed_class), nas colunas de
+    training_data.
+    """
+    import pandas as pd
+    from sqlalchemy import literal, select, union_all
+
+    from schema import Result, Screening, TrainingData
+
+    scores = [f"a{i}_score" for i in range(1, 11)]
+    gender_labels = TEAClassifier.CATEGORY_ALIASES['gender']
+    training = select(
+        *[getattr(TrainingData, column) for column in scores],
+        TrainingData.age, TrainingData.gender, TrainingData.jundice,
+        TrainingData.class_asd.label("class_asd"),
+        literal("training_data").label("origin"),
+    ).where(TrainingData.class_asd.isnot(None))
+    confirmed = select(
+        *[getattr(Screening, column) for column in scores],
+        Screening.age, Screening.gender, Screening.jundice,
+        Result.confirmed_class.label("class_asd"),
+        literal("screenings").label("origin"),
+    ).join(Result, Screening.id == Result.screening_id).where(Result.confirmed_class.isnot(None))
+
+    rows = db.execute(union_all(training, confirmed)).all()
+    frame = pd.DataFrame(rows, columns=scores + ["age", "gender", "jundice", "class_asd", "origin"])
+    # Triagens guardam o gênero como m/f; o LabelEncoder usa male/female
+    frame["gender"] = frame["gender"].replace(gender_labels)
+    return frame
+
+
+def encode(frame, feature_names=FEATURE_NAMES):
+    """Matriz de features, rótulos e LabelEncoders no formato do artefato"""
+    label_encoders = {column: LabelEncoder().fit(frame[column].astype(str)) for column in CATEGORICAL_COLUMNS}
+    columns = []
+    for name in feature_names:
+        if name.endswith("_encoded"):
+            column = name[:-len("_encoded")]
+            columns.append(label_encoders[column].transform(frame[column].astype(str)))
+        else:
+            columns.append(frame[name.lower()].to_numpy())
+    X = np.column_stack(columns).astype(np.float64)
+    y = (frame["class_asd"].str.upper() == "YES").to_numpy(dtype=np.int64)
+    return X, y, label_encoders
+
+
+def fold_features(X, y, n_splits, seed, cache_dir=None):
+    """
+    Divisões estratificadas com o scaler ajustado só no treino de cada fold.
+
+    Com `cache_dir`, os arrays de cada fold ficam em arquivos .npy por hash
+    dos dados e são abertos com mmap: execuções seguintes (e os processos do
+    pool) reaproveitam as mesmas páginas em vez de recalcular e copiar.
+    """
+    key = hashlib.sha256(
+        X.tobytes() + y.tobytes() + f"{X.shape}:{n_splits}:{seed}".encode()
+    ).hexdigest()[:16]
+    directory = os.path.join(cache_dir, key) if cache_dir else None
+    names = ("X_train", "y_train", "X_test", "test_index")
+
+    if directory and os.path.exists(os.path.join(directory, "done")):
+        return [
+            {name: np.load(os.path.join(directory, f"{i}_{name}.npy"), mmap_mode="r") for name in names}
+            for i in range(n_splits)
+        ]
+
+    folds = []
+    splitter = StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=seed)
+    for train_index, test_index in splitter.split(X, y):
+        scaler = StandardScaler().fit(X[train_index])
+        folds.append({
+            "X_train": scaler.transform(X[train_index]),
+            "y_train": y[train_index],
+            "X_test": scaler.transform(X[test_index]),
+            "test_index": test_index,
+        })
+
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        for i, fold in enumerate(folds):
+            for name in names:
+                np.save(os.path.join(directory, f"{i}_{name}.npy"), fold[name])
+        open(os.path.join(directory, "done"), "w").close()
+    return folds
+
+
+def parameter_grid(grid=PARAM_GRID):
+    keys = sorted(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[key] for key in keys))]
+
+
+def _fit_fold(params, fold, seed):
+    model = RandomForestClassifier(random_state=seed, n_jobs=1, **params)
+    model.fit(fold["X_train"], fold["y_train"])
+    return model.predict_proba(fold["X_test"])[:, 1]
+
+
+def best_threshold(y, probabilities, beta=1.0):
+    """Limiar (predição = probabilidade >= limiar) que maximiza o F-beta"""
+    precision, recall, thresholds = precision_recall_curve(y, probabilities)
+    precision, recall = precision[:-1], recall[:-1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        fbeta = np.nan_to_num((1 + beta ** 2) * precision * recall / (beta ** 2 * precision + recall))
+    best = int(np.argmax(fbeta))
+    return float(thresholds[best]), float(fbeta[best])
+
+
+def evaluate(y, probabilities, threshold):
+    predictions = (probabilities >= threshold).astype(np.int64)
+    return {
+        "accuracy": accuracy_score(y, predictions),
+        "precision": precision_score(y, predictions, zero_division=0),
+        "recall": recall_score(y, predictions),
+        "f1_score": f1_score(y, predictions),
+        "roc_auc": roc_auc_score(y, probabilities),
+        "average_precision": average_precision_score(y, probabilities),
+        "threshold": threshold,
+    }
+
+
+def search(X, y, grid=PARAM_GRID, n_splits=5, n_jobs=-1, seed=42, beta=1.0, cache_dir=None):
+    """
+    Busca de hiperparâmetros e limiar por validação cruzada.
+
+    Cada par (combinação, fold) é um ajuste independente executado em um
+    pool de processos; as árvores de cada floresta rodam em sequência para
+    não disputar os núcleos. Para cada combinação, as probabilidades fora do
+    fold são reunidas e o limiar escolhido pelo F-beta. Retorna as
+    combinações ordenadas da melhor para a pior, cada uma com as suas
+    probabilidades fora do fold.
+    """
+    folds = fold_features(X, y, n_splits, seed, cache_dir)
+    candidates = parameter_grid(grid)
+
+    fold_probabilities = Parallel(n_jobs=n_jobs)(
+        delayed(_fit_fold)(params, fold, seed)
+        for params in candidates for fold in folds
+    )
+
+    results = []
+    for c, params in enumerate(candidates):
+        oof = np.empty(len(y), dtype=np.float64)
+        for f, fold in enumerate(folds):
+            oof[fold["test_index"]] = fold_probabilities[c * len(folds) + f]
+        threshold, score = best_threshold(y, oof, beta)
+        results.append({
+            "params": params, "score": score, "metrics": evaluate(y, oof, threshold), "probabilities": oof,
+        })
+
+    # Empates resolvidos pela ordem da grade, para o resultado não depender de n_jobs
+    results.sort(key=lambda result: -result["score"])
+    return results
+
+
+def train(frame, n_jobs=-1, n_splits=5, seed=42, beta=1.0, cache_dir=None, grid=PARAM_GRID):
+    """
+    Busca, ajuste final em todos os dados, o dicionário do artefato e o
+    perfil de referência do monitor de desvio (probabilidades fora do fold
+    da melhor combinação)
+    """
+    X, y, label_encoders = encode(frame)
+
+    start = time.perf_counter()
+    results = search(X, y, grid, n_splits, n_jobs, seed, beta, cache_dir)
+    search_seconds = time.perf_counter() - start
+    best = results[0]
+
+    scaler = StandardScaler().fit(X)
+    model = RandomForestClassifier(random_state=seed, n_jobs=n_jobs, **best["params"])
+    model.fit(scaler.transform(X), y)
+    # O classificador fixa n_jobs=1 ao carregar; o artefato não guarda o paralelismo do treino
+    model.n_jobs = None
+
+    model_data = {
+        "model": model,
+        "scaler": scaler,
+        "threshold": best["metrics"]["threshold"],
+        "feature_names": list(FEATURE_NAMES),
+        "label_encoders": label_encoders,
+        "model_type": MODEL_TYPE,
+    }
+    report = {
+        "params": best["params"],
+        "cv_metrics": best["metrics"],
+        "samples": int(len(y)),
+        "positives": int(y.sum()),
+        "folds": n_splits,
+        "candidates": len(results),
+        "search_seconds": round(search_seconds, 3),
+    }
+    profile = drift_monitor.build_profile(X, best["probabilities"], FEATURE_NAMES, y, source="training")
+    return model_data, report, profile
+
+
+def save_artifact(model_data, directory):
+    """
+    Grava o artefato com o nome da sua versão (o mesmo hash que o
+    TEAClassifier calcula ao carregá-lo). Retorna (caminho, versão).
+    """
+    buffer = io.BytesIO()
+    joblib.dump(model_data, buffer)
+    artifact = buffer.getvalue()
+    version = hashlib.sha256(artifact).hexdigest()[:16]
+
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"tea_model_{version}.pkl")
+    with open(path, "wb") as f:
+        f.write(artifact)
+    return path, version
+
+
+def _replace(path, target):
+    tmp = os.path.join(os.path.dirname(os.path.abspath(target)), f".{os.path.basename(target)}.tmp")
+    with open(path, "rb") as src, open(tmp, "wb") as dst:
+        dst.write(src.read())
+        dst.flush()
+        os.fsync(dst.fileno())
+    os.replace(tmp, target)
+
+
+def publish(path, target):
+    """
+    Substitui o artefato servido com um rename atômico (a API recarrega
+    sozinha). O perfil de referência vai antes, para a recarga já encontrá-lo
+    """
+    profile = drift_monitor.profile_path(path)
+    if os.path.exists(profile):
+        _replace(profile, drift_monitor.profile_path(target))
+    _replace(path, target)
@@ -0,0 +1,64 @@
+# tree_explainer.py
+import numpy as np
+
+from flat_forest import CHUNK_SIZE
+
+
+class TreeExplainer:
+    """
+    Contribuição de cada feature para a probabilidade da floresta (método de
+    Saabas), sobre os arrays de uma FlatForest.
+
+    Cada nó guarda, pré-calculados, quanto a probabilidade muda ao chegar
+    nele vindo do pai (`delta`) e qual feature decidiu esse passo
+    (`split_feature`). Explicar uma linha é percorrer todas as árvores
+    juntas, como em FlatForest.predict_proba, somando os deltas do caminho
+    por feature. Para cada linha vale:
+
+        base_value + soma das contribuições == probabilidade da floresta
+
+    com base_value = média das probabilidades nas raízes.
+    """
+
+    def __init__(self, forest, n_features):
+        self.forest = forest
+        self.n_features = int(n_features)
+
+        nodes = np.arange(len(forest.value))
+        internal = forest.left != nodes
+        parent = nodes.copy()
+        parent[forest.left[internal]] = nodes[internal]
+        parent[forest.right[internal]] = nodes[internal]
+
+        # Nas raízes parent == nó, então delta é zero
+        self.split_feature = forest.feature[parent]
+        self.delta = forest.value - forest.value[parent]
+        self.base_value = float(forest.value[forest.roots].mean())
+
+    def contributions(self, X):
+        """Matriz (linhas, features) de contribuições para X (features originais)"""
+        forest = self.forest
+        X = np.atleast_2d(np.asarray(X, dtype=np.float64))
+        contributions = np.empty((X.shape[0], self.n_features), dtype=np.float64)
+
+        for start in range(0, X.shape[0], CHUNK_SIZE):
+            chunk = X[start:start + CHUNK_SIZE]
+            rows = np.arange(chunk.shape[0])[:, None]
+            # Índice (linha, feature) achatado, para acumular com um único bincount
+            offsets = rows * self.n_features
+            totals = np.zeros(chunk.shape[0] * self.n_features, dtype=np.float64)
+            nodes = np.repeat(forest.roots[None, :], chunk.shape[0], axis=0)
+            for _ in range(forest.max_depth):
+                go_left = chunk[rows, forest.feature[nodes]] <= forest.threshold[nodes]
+                children = np.where(go_left, forest.left[nodes], forest.right[nodes])
+                # Folhas apontam para si mesmas: o delta só conta no passo que chega nelas
+                moved = children != nodes
+                nodes = children
+                totals += np.bincount(
+                    (offsets + self.split_feature[nodes]).ravel(),
+                    weights=(self.delta[nodes] * moved).ravel(),
+                    minlength=totals.size,
+                )
+            contributions[start:start + CHUNK_SIZE] = totals.reshape(chunk.shape[0], -1) / forest.n_trees
+
+        return contributions
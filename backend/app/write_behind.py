@@ -0,0 +1,364 @@
+# write_behind.py
+import fcntl
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+from fastapi import HTTPException
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from database import SessionLocal
+import response_cache
+import rollups
+from schema import Result, Screening
+
+logger = logging.getLogger("tea.write_behind")
+
+# Com a gravação assíncrona o /predict responde logo após a inferência; as
+# linhas vão para um log local e são gravadas no banco em lotes
+WRITE_BEHIND = os.getenv("PREDICT_WRITE_BEHIND", "false").lower() == "true"
+
+# Diretório do log de spill (um arquivo por lote pendente, por worker)
+SPILL_DIR = os.getenv("WRITE_BEHIND_SPILL_DIR", "spill")
+
+# Triagens aceitas e ainda não gravadas por worker; acima disso o /predict responde 503
+MAX_PENDING = int(os.getenv("WRITE_BEHIND_MAX_PENDING", "10000"))
+
+# Linhas por INSERT multi-linha e intervalo (s) máximo entre gravações
+BATCH_SIZE = int(os.getenv("WRITE_BEHIND_BATCH_SIZE", "1000"))
+FLUSH_INTERVAL = float(os.getenv("WRITE_BEHIND_FLUSH_INTERVAL", "0.2"))
+
+# Espera (s) antes de tentar de novo um lote que falhou
+RETRY_INTERVAL = float(os.getenv("WRITE_BEHIND_RETRY_INTERVAL", "2.0"))
+
+# fsync de cada linha do log antes de responder; sem ele uma queda do
+# sistema operacional (não do processo) pode perder as últimas triagens
+FSYNC = os.getenv("WRITE_BEHIND_FSYNC", "true").lower() == "true"
+
+# Pares de ids (screening, result) reservados das sequences com antecedência,
+# para que a resposta traga o id sem esperar o banco. Ids reservados e não
+# usados se perdem quando o worker encerra: cada reinício deixa uma lacuna
+# de até esse tamanho nos ids. Com a reserva vazia o id vem direto das
+# sequences, na própria requisição
+ID_RESERVE = int(os.getenv("WRITE_BEHIND_ID_RESERVE", "200"))
+
+
+def _encode(entry):
+    return (json.dumps(entry, default=datetime.isoformat, separators=(",", ":")) + "\n").encode()
+
+
+def _decode(line):
+    entry = json.loads(line)
+    for row in entry.values():
+        row["created_at"] = datetime.fromisoformat(row["created_at"])
+    return entry
+
+
+def _sequence(connection, model):
+    table = model.__table__
+    return f"{connection.schema_for_object(table)}.{table.name}_id_seq"
+
+
+def _chunks(rows, size):
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+class SpillSegment:
+    """
+    Arquivo append-only com triagens ainda não gravadas no banco.
+
+    O arquivo fica travado (flock) enquanto pertence a um processo vivo;
+    arquivos destravados no diretório são de workers que morreram e são
+    regravados na inicialização.
+    """
+
+    def __init__(self, file, path):
+        self.file = file
+        self.path = path
+
+    @classmethod
+    def create(cls, directory):
+        name = os.path.join(directory, f"{os.getpid()}-{time.time_ns()}")
+        file = open(name + ".tmp", "ab")
+        # Trava antes de o arquivo aparecer com o nome que a recuperação procura
+        fcntl.flock(file, fcntl.LOCK_EX)
+        os.rename(name + ".tmp", name + ".log")
+        return cls(file, name + ".log")
+
+    @classmethod
+    def claim(cls, path):
+        """Trava um segmento órfão; None se outro processo o usa ou já o removeu"""
+        try:
+            file = open(path, "rb")
+        except FileNotFoundError:
+            return None
+        try:
+            fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            file.close()
+            return None
+        if os.fstat(file.fileno()).st_nlink == 0:
+            file.close()
+            return None
+        return cls(file, path)
+
+    def append(self, line):
+        self.file.write(line)
+        self.file.flush()
+        if FSYNC:
+            os.fsync(self.file.fileno())
+
+    def read(self):
+        entries = []
+        for line in self.file:
+            # Linha incompleta: a queda ocorreu durante a escrita, antes da resposta
+            if not line.endswith(b"\n"):
+                break
+            try:
+                entries.append(_decode(line))
+            except ValueError:
+                logger.warning("Linha inválida ignorada em %s", self.path)
+        return entries
+
+    def remove(self):
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+        self.file.close()
+
+    def close(self):
+        self.file.close()
+
+
+class WriteBehindQueue:
+    """
+    Fila limitada de triagens a gravar, esvaziada por uma thread em lotes.
+
+    Cada triagem aceita é anexada ao segmento atual do log antes da resposta.
+    A cada ciclo a thread troca de segmento e grava o anterior inteiro em uma
+    transação (INSERT multi-linha com ON CONFLICT DO NOTHING, então regravar
+    um segmento após uma queda não duplica linhas); só depois o arquivo é
+    removido. Se o banco falhar, o lote é mantido e tentado de novo.
+    """
+
+    def __init__(self, spill_dir, max_pending, batch_size):
+        self.spill_dir = spill_dir
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+
+        self._lock = threading.Lock()
+        self._segment = None
+        self._entries = []
+        self._pending = 0
+        self._ids = deque()
+
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+        self.written = 0
+        self.recovered = 0
+        self.failures = 0
+        self.rejected = 0
+        self.last_flush_ms = None
+
+    def start(self):
+        os.makedirs(self.spill_dir, exist_ok=True)
+        try:
+            self._refill_ids()
+        except Exception:
+            # Sem banco na inicialização: a thread tenta de novo
+            logger.exception("Falha ao reservar ids")
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="tea-write-behind", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Grava o que estiver pendente e encerra a thread"""
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def submit(self, screening, result):
+        """
+        Registra a triagem no log e a enfileira para gravação. Retorna o id do
+        resultado e o created_at que as linhas terão no banco.
+        """
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._reject("Fila de gravação cheia, tente novamente")
+            ids = self._ids.popleft() if self._ids else None
+
+        if ids is None:
+            # Reserva esgotada (pico maior que a reposição, ou banco fora do
+            # ar desde a inicialização): um par de ids na própria requisição
+            self._wakeup.set()
+            try:
+                ids = self._reserve(1)[0]
+            except Exception:
+                logger.warning("Falha ao obter ids das sequences", exc_info=True)
+                with self._lock:
+                    self._reject("Banco indisponível, tente novamente")
+
+        screening_id, result_id = ids
+        with self._lock:
+            if self._segment is None:
+                self._segment = SpillSegment.create(self.spill_dir)
+
+            created_at = datetime.now(timezone.utc)
+            entry = {
+                "screening": {**screening, "id": screening_id, "created_at": created_at},
+                "result": {**result, "id": result_id, "screening_id": screening_id, "created_at": created_at},
+            }
+            self._segment.append(_encode(entry))
+            self._entries.append(entry)
+            self._pending += 1
+
+            if len(self._entries) >= self.batch_size or len(self._ids) < ID_RESERVE // 2:
+                self._wakeup.set()
+        return result_id, created_at
+
+    def _reject(self, detail):
+        self.rejected += 1
+        raise HTTPException(status_code=503, detail=detail, headers={"Retry-After": "1"})
+
+    def _rotate(self):
+        """Fecha o segmento atual para gravação; os próximos vão para um novo"""
+        with self._lock:
+            if self._segment is None:
+                return None
+            batch = (self._segment, self._entries, True)
+            self._segment = None
+            self._entries = []
+            return batch
+
+    def _recover(self):
+        """Segmentos deixados por processos encerrados sem gravar tudo"""
+        batches = []
+        paths = sorted(glob.glob(os.path.join(self.spill_dir, "*.log")))
+        paths += glob.glob(os.path.join(self.spill_dir, "*.tmp"))
+        for path in paths:
+            segment = SpillSegment.claim(path)
+            if segment is None:
+                continue
+            entries = segment.read()
+            logger.info("Recuperando %d triagens de %s", len(entries), path)
+            batches.append((segment, entries, False))
+        return batches
+
+    def _reserve(self, count):
+        """`count` pares de ids (screening, result) obtidos das sequences"""
+        with SessionLocal() as db:
+            connection = db.connection()
+            rows = db.execute(
+                text("SELECT nextval(:screenings), nextval(:results) FROM generate_series(1, :count)"),
+                {"screenings": _sequence(connection, Screening), "results": _sequence(connection, Result),
+                 "count": count}
+            ).all()
+        return [tuple(row) for row in rows]
+
+    def _refill_ids(self):
+        missing = ID_RESERVE - len(self._ids)
+        if missing < ID_RESERVE // 2:
+            return
+        self._ids.extend(self._reserve(missing))
+
+    def _write(self, entries):
+        screenings = [entry["screening"] for entry in entries]
+        results = [entry["result"] for entry in entries]
+        with SessionLocal() as db:
+            inserted = []
+            for chunk in _chunks(screenings, self.batch_size):
+                inserted += db.scalars(
+                    pg_insert(Screening).values(chunk).on_conflict_do_nothing().returning(Screening.id)
+                ).all()
+            for chunk in _chunks(results, self.batch_size):
+                db.execute(pg_insert(Result).values(chunk).on_conflict_do_nothing())
+            # Só as triagens inseridas agora entram nas rollups
+            if rollups.USE_ROLLUPS:
+                for chunk in _chunks(inserted, self.batch_size):
+                    db.execute(rollups.upsert_from_screenings(chunk))
+            db.commit()
+
+    def _run(self):
+        backlog = self._recover()
+        while True:
+            stopping = self._stop.is_set()
+            try:
+                self._refill_ids()
+            except Exception:
+                logger.warning("Falha ao reservar ids", exc_info=True)
+
+            batch = self._rotate()
+            if batch is not None:
+                backlog.append(batch)
+
+            while backlog:
+                segment, entries, live = backlog[0]
+                start = time.perf_counter()
+                try:
+                    if entries:
+                        self._write(entries)
+                except Exception:
+                    self.failures += 1
+                    logger.exception("Falha ao gravar %d triagens; nova tentativa em %.1fs",
+                                     len(entries), RETRY_INTERVAL)
+                    break
+                backlog.pop(0)
+                segment.remove()
+                self.last_flush_ms = round((time.perf_counter() - start) * 1000, 3)
+                if live:
+                    self.written += len(entries)
+                    with self._lock:
+                        self._pending -= len(entries)
+                else:
+                    self.recovered += len(entries)
+                if entries:
+                    response_cache.invalidate()
+
+            if stopping:
+                break
+            if backlog:
+                self._stop.wait(RETRY_INTERVAL)
+            else:
+                self._wakeup.wait(FLUSH_INTERVAL)
+                self._wakeup.clear()
+
+        # Banco indisponível no encerramento: os arquivos ficam para a próxima inicialização
+        for segment, entries, _ in backlog:
+            logger.warning("%d triagens mantidas em %s", len(entries), segment.path)
+            segment.close()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "pending": self._pending,
+                "reserved_ids": len(self._ids),
+                "written": self.written,
+                "recovered": self.recovered,
+                "failures": self.failures,
+                "rejected": self.rejected,
+                "last_flush_ms": self.last_flush_ms,
+            }
+
+
+queue = WriteBehindQueue(SPILL_DIR, MAX_PENDING, BATCH_SIZE) if WRITE_BEHIND else None
+
+
+def start():
+    if queue is not None:
+        queue.start()
+
+
+def stop():
+    if queue is not None:
+        queue.stop()
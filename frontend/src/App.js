@@ -18,6 +18,20 @@ const questions = [
   { id: 10, text: "Acho fácil saber o que falar em uma conversa" }
 ];
 
+const FEATURE_LABELS = { age: 'Idade', gender: 'Gênero', jundice: 'Icterícia ao nascer' };
+
+// Features que mais moveram a probabilidade, em ordem de impacto
+function topContributions(explanation, count = 5) {
+  if (!explanation) return [];
+  return Object.entries(explanation.contributions)
+    .map(([name, value]) => {
+      const question = name.match(/^A(\d+)_Score$/);
+      return { name, value, label: question ? `Pergunta ${question[1]}` : (FEATURE_LABELS[name] || name) };
+    })
+    .sort((a, b) => Math.abs(b.value) - Math.abs(a.value))
+    .slice(0, count);
+}
+
 function KPICard({ title, value, subtitle, icon: Icon, color }) {
   return React.createElement('div', { className: 'kpi-card' },
     React.createElement('div', { className: 'kpi-content' },
@@ -31,17 +45,100 @@ function KPICard({ title, value, subtitle, icon: Icon, color }) {
   );
 }
 
+// Soma uma triagem a um item de distribuição (total/positivos/negativos/taxa)
+function addScreening(item, positive) {
+  const total = item.total + 1;
+  const positiveCount = item.positive + (positive ? 1 : 0);
+  return { ...item, total, positive: positiveCount, negative: total - positiveCount, positive_rate: positiveCount / total };
+}
+
+// Atualiza o item com `key` igual a `value`, criando-o a partir de `empty` se não existir
+function upsertItem(items, key, value, empty, positive) {
+  if (!items.some((item) => item[key] === value)) {
+    items = [...items, { ...empty, [key]: value, total: 0, positive: 0, negative: 0, positive_rate: 0 }];
+  }
+  return items.map((item) => (item[key] === value ? addScreening(item, positive) : item));
+}
+
+// Aplica os deltas do stream (uma entrada por triagem) aos dados do dashboard
+function applyDeltas(data, deltas) {
+  let { kpis, ageDistribution, genderDistribution, timeline, riskFactors, scoreAnalysis } = data;
+  for (const delta of deltas) {
+    const positive = delta.prediction === 'TEA';
+    const negative = delta.prediction === 'Sem TEA';
+    const total = kpis.total_screenings;
+    const positiveCases = kpis.positive_cases;
+    const negativeCases = kpis.negative_cases;
+
+    scoreAnalysis = scoreAnalysis.map((question, i) => {
+      const score = delta.scores[i];
+      return {
+        ...question,
+        positive_avg: positive ? (question.positive_avg * positiveCases + score) / (positiveCases + 1) : question.positive_avg,
+        negative_avg: negative ? (question.negative_avg * negativeCases + score) / (negativeCases + 1) : question.negative_avg,
+        total_avg: (question.total_avg * total + score) / (total + 1)
+      };
+    });
+
+    kpis = {
+      ...kpis,
+      total_screenings: total + 1,
+      total_results: kpis.total_results + 1,
+      positive_cases: positiveCases + (positive ? 1 : 0),
+      negative_cases: negativeCases + (negative ? 1 : 0),
+      positive_rate: (positiveCases + (positive ? 1 : 0)) / (total + 1),
+      avg_age: Math.round(((kpis.avg_age * total + delta.age) / (total + 1)) * 10) / 10,
+      avg_confidence: Math.round(((kpis.avg_confidence * total + delta.confidence) / (total + 1)) * 1000) / 1000,
+      recent_screenings_7d: kpis.recent_screenings_7d + 1
+    };
+
+    ageDistribution = ageDistribution.map((item) => (item.range === delta.age_bucket ? addScreening(item, positive) : item));
+    genderDistribution = upsertItem(genderDistribution, 'gender', delta.gender === 'm' ? 'Masculino' : 'Feminino', {}, positive);
+    timeline = upsertItem(timeline, 'date', delta.day, {}, positive).slice(-31);
+    riskFactors = {
+      jundice: upsertItem(riskFactors.jundice, 'value', delta.jundice === 'yes' ? 'Sim' : 'Não', { factor: 'Icterícia' }, positive),
+      family_history: upsertItem(riskFactors.family_history, 'value', delta.autism === 'yes' ? 'Sim' : 'Não', { factor: 'Histórico Familiar' }, positive)
+    };
+  }
+  return { kpis, ageDistribution, genderDistribution, timeline, riskFactors, scoreAnalysis };
+}
+
 function Dashboard() {
-  const [kpis, setKpis] = useState(null);
-  const [ageDistribution, setAgeDistribution] = useState([]);
-  const [genderDistribution, setGenderDistribution] = useState([]);
-  const [timeline, setTimeline] = useState([]);
-  const [riskFactors, setRiskFactors] = useState(null);
-  const [scoreAnalysis, setScoreAnalysis] = useState([]);
+  const [data, setData] = useState(null);
   const [loading, setLoading] = useState(true);
+  const { kpis, ageDistribution = [], genderDistribution = [], timeline = [], riskFactors, scoreAnalysis = [] } = data || {};
 
   useEffect(() => {
-    fetchDashboardData();
+    // Snapshot ao conectar e deltas a cada predição; o EventSource reconecta sozinho
+    const source = new EventSource('http://localhost:8000/api/dashboard/stream');
+    let connected = false;
+
+    source.addEventListener('snapshot', (event) => {
+      const snapshot = JSON.parse(event.data);
+      connected = true;
+      setData({
+        kpis: snapshot.kpis,
+        ageDistribution: snapshot.age_distribution,
+        genderDistribution: snapshot.gender_distribution,
+        timeline: snapshot.timeline,
+        riskFactors: snapshot.risk_factors,
+        scoreAnalysis: snapshot.score_analysis
+      });
+      setLoading(false);
+    });
+    source.addEventListener('delta', (event) => {
+      const deltas = JSON.parse(event.data);
+      setData((current) => (current ? applyDeltas(current, deltas) : current));
+    });
+    source.onerror = () => {
+      // Stream indisponível: carrega uma vez pelos endpoints do dashboard
+      if (!connected) {
+        source.close();
+        fetchDashboardData();
+      }
+    };
+
+    return () => source.close();
   }, []);
 
   const fetchDashboardData = async () => {
@@ -56,12 +153,14 @@ function Dashboard() {
         fetch('http://localhost:8000/api/dashboard/score-analysis')
       ]);
 
-      setKpis(await kpisRes.json());
-      setAgeDistribution(await ageRes.json());
-      setGenderDistribution(await genderRes.json());
-      setTimeline(await timelineRes.json());
-      setRiskFactors(await riskRes.json());
-      setScoreAnalysis(await scoreRes.json());
+      setData({
+        kpis: await kpisRes.json(),
+        ageDistribution: await ageRes.json(),
+        genderDistribution: await genderRes.json(),
+        timeline: await timelineRes.json(),
+        riskFactors: await riskRes.json(),
+        scoreAnalysis: await scoreRes.json()
+      });
     } catch (error) {
       console.error('Erro ao carregar dados:', error);
     } finally {
@@ -310,7 +409,7 @@ function ScreeningForm() {
         used_app_before: formData.used_app_before
       };
 
-      const response = await fetch('http://localhost:8000/predict', {
+      const response = await fetch('http://localhost:8000/predict?explain=true', {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify(payload)
@@ -554,6 +653,22 @@ function ScreeningForm() {
                 <p>{result.recommendation}</p>
               </div>
 
+              {result.explanation && (
+                <div className="info-section">
+                  <h3>Respostas que mais pesaram</h3>
+                  <ul className="contribution-list">
+                    {topContributions(result.explanation).map(item => (
+                      <li key={item.name}>
+                        <span>{item.label}</span>
+                        <span className={item.value >= 0 ? 'contribution-up' : 'contribution-down'}>
+                          {item.value >= 0 ? '+' : ''}{(item.value * 100).toFixed(1)} p.p.
+                        </span>
+                      </li>
+                    ))}
+                  </ul>
+                </div>
+              )}
+
               <div className="info-box">
                 <h3>Informações Importantes</h3>
                 <ul>